@@ -1,57 +1,286 @@
 """
 Lanceur combiné: Système de détection + Dashboard Web
+Pour que le conducteur soit protégé au plus vite : chaque partie démarre dès que possible, sans attente fixe
+
+Deux modes :
+- un seul processus (défaut) : le serveur Flask tourne sur un thread, la
+  détection sur le thread principal (fenêtre OpenCV). Un seul interpréteur
+  et un seul chargement des modules ; le serveur, la caméra et FaceMesh
+  démarrent en même temps et le navigateur s'ouvre dès que le serveur
+  répond.
+- --supervise : serveur et détection dans deux processus surveillés. Chacun
+  est déclaré prêt par une vraie sonde (le serveur répond sur /api/cache,
+  la détection a publié son instant "prêt à alerter" dans perf_data.json).
+  Un processus qui s'arrête anormalement est relancé.
+
+Dans les deux modes, une détection arrêtée sur erreur (caméra introuvable,
+flux perdu, exception) est relancée, avec un délai qui double à chaque
+échec rapproché (RESTART_DELAY à RESTART_MAX_DELAY). ESC ou Ctrl+C
+arrêtent tout.
+
+Usage :
+    python app.py
+    python app.py --headless --no-browser
+    python app.py --supervise
 """
 
-import subprocess
 import time
-import webbrowser
+LAUNCH_START = time.perf_counter()   # origine du temps "prêt à alerter"
+
+import argparse
+import json
+import logging
+import subprocess
 import sys
-import os
-
-print("="*60)
-print("🚀 Lancement du Système Anti-Somnolence avec Dashboard")
-print("="*60)
-
-# Lancer le dashboard web en arrière-plan (sans fenêtre)
-print("\n📊 Démarrage du dashboard web...")
-
-# Lancer le serveur Flask en arrière-plan (afficher les erreurs pour debug)
-dashboard_process = subprocess.Popen(
-    [sys.executable, "dashboard_server.py"],
-    stdout=subprocess.DEVNULL,
-    stderr=None  # Afficher les erreurs dans le terminal
-)
-
-# Attendre que le serveur démarre
-time.sleep(3)
-
-# Ouvrir le navigateur
-print("🌐 Ouverture du navigateur...")
-webbrowser.open('http://localhost:5000')
-
-print("\n✅ Dashboard ouvert dans le navigateur")
-print("📹 Le système de détection va maintenant démarrer...")
-print("\nAppuyez sur 'q' dans la fenêtre vidéo pour quitter\n")
-
-time.sleep(2)
-
-# Lancer le système de détection (bloquant)
-try:
-    detection_process = subprocess.run(
-        [sys.executable, "main.py"],
-        check=False
-    )
-except KeyboardInterrupt:
-    print("\n⚠️  Interruption par l'utilisateur")
-except Exception as e:
-    print(f"\n❌ Erreur lors de l'exécution: {e}")
-finally:
-    # Arrêter le dashboard (toujours exécuté)
-    print("\n🛑 Arrêt du dashboard...")
+import threading
+import traceback
+import urllib.request
+import webbrowser
+from datetime import datetime
+
+
+DASHBOARD_PORT = 5000
+PROBE_INTERVAL = 0.05           # période des sondes de disponibilité (secondes)
+DASHBOARD_READY_TIMEOUT = 20.0  # serveur toujours muet après 20 s -> relancé (mode --supervise)
+DETECTOR_READY_TIMEOUT = 60.0   # détection pas prête après 60 s -> relancée (mode --supervise)
+RESTART_DELAY = 1.0             # premier délai avant relance, doublé à chaque échec rapproché
+RESTART_MAX_DELAY = 30.0
+STABLE_RUN_SECONDS = 60.0       # une exécution plus longue remet le délai à RESTART_DELAY
+PERF_FILE = "perf_data.json"    # contient l'instant "prêt à alerter" de la détection
+
+
+def dashboard_url(port=DASHBOARD_PORT):
+    return f"http://localhost:{port}"
+
+
+def probe_http(url, timeout=0.5):
+    """Sonde du serveur : True s'il répond 200"""
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return response.status == 200
+    except OSError:
+        return False
+
+
+def detector_ready_probe(launched_at):
+    """Sonde de la détection : instant "prêt à alerter" publié après launched_at"""
+    def probe():
+        try:
+            with open(PERF_FILE, "r", encoding="utf-8") as f:
+                ready_at = (json.load(f).get("startup") or {}).get("ready_at")
+        except (OSError, ValueError):
+            return False
+        return ready_at is not None and datetime.fromisoformat(ready_at) >= launched_at
+    return probe
+
+
+def wait_until(probe, timeout, interval=PROBE_INTERVAL):
+    """Appelle probe() jusqu'à ce qu'il réponde True (False après timeout)"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if probe():
+            return True
+        time.sleep(interval)
+    return False
+
+
+class RestartPolicy:
+    """Délai avant relance : doublé à chaque arrêt anormal, remis à zéro après une longue exécution"""
+
+    def __init__(self):
+        self.delay = RESTART_DELAY
+        self.restarts = 0
+
+    def next_delay(self, run_seconds):
+        if run_seconds >= STABLE_RUN_SECONDS:
+            self.delay = RESTART_DELAY
+        delay = self.delay
+        self.delay = min(self.delay * 2, RESTART_MAX_DELAY)
+        self.restarts += 1
+        return delay
+
+
+# -----------------------
+# UN SEUL PROCESSUS
+# -----------------------
+
+def run_single(display_args, open_browser, port):
+    url = dashboard_url(port)
+    servers = []
+
+    def start_dashboard():
+        # Import de Flask et ouverture du port en parallèle du démarrage de la détection
+        try:
+            import dashboard_server
+            # Console partagée avec la détection : pas de ligne par requête HTTP
+            logging.getLogger("werkzeug").setLevel(logging.WARNING)
+            servers.append(dashboard_server.start_server_thread(port=port))
+        except Exception as e:
+            print(f"❌ Dashboard indisponible ({e}) : la détection continue sans lui")
+            return
+        if wait_until(lambda: probe_http(url + "/api/cache"), DASHBOARD_READY_TIMEOUT):
+            print(f"📊 Dashboard prêt {time.perf_counter() - LAUNCH_START:.2f}s après le lancement : {url}")
+            if open_browser:
+                webbrowser.open(url)
+        else:
+            print(f"⚠️  Le dashboard ne répond pas sur {url}")
+
+    threading.Thread(target=start_dashboard, name="dashboard-start", daemon=True).start()
+
+    import main as detection
+
+    policy = RestartPolicy()
+    process_start = LAUNCH_START
     try:
-        dashboard_process.terminate()
-        dashboard_process.wait(timeout=5)
-    except:
-        dashboard_process.kill()
-    
+        while True:
+            run_start = time.perf_counter()
+            try:
+                code = detection.main(*display_args, process_start=process_start,
+                                      dashboard_url=url)
+            except Exception:
+                traceback.print_exc()
+                code = 1
+            if code == 0:
+                break
+            delay = policy.next_delay(time.perf_counter() - run_start)
+            print(f"🔁 Détection arrêtée sur erreur, relance dans {delay:.0f}s "
+                  f"(relance n°{policy.restarts})")
+            time.sleep(delay)
+            # Après une relance, "prêt à alerter" est compté depuis la relance
+            process_start = time.perf_counter()
+    except KeyboardInterrupt:
+        print("\n⚠️  Interruption par l'utilisateur")
+    finally:
+        print("\n🛑 Arrêt du dashboard...")
+        for server in servers:
+            server.shutdown()
+
+
+# -----------------------
+# DEUX PROCESSUS SURVEILLÉS
+# -----------------------
+
+class SupervisedProcess:
+    """Processus enfant avec sonde de disponibilité et relance automatique"""
+
+    def __init__(self, name, command, make_probe, ready_timeout, quiet=False):
+        self.name = name
+        self.command = command
+        self.make_probe = make_probe     # make_probe(date de lancement) -> probe()
+        self.ready_timeout = ready_timeout
+        self.quiet = quiet
+        self.policy = RestartPolicy()
+        self.process = None
+        self.restart_at = None
+
+    def start(self):
+        self.launched_at = datetime.now()
+        self.started = time.perf_counter()
+        self.probe = self.make_probe(self.launched_at)
+        self.ready = False
+        self.restart_at = None
+        self.process = subprocess.Popen(
+            self.command,
+            stdout=subprocess.DEVNULL if self.quiet else None,
+            stderr=None  # Afficher les erreurs dans le terminal
+        )
+
+    def schedule_restart(self, reason):
+        delay = self.policy.next_delay(time.perf_counter() - self.started)
+        print(f"🔁 {self.name} : {reason}, relance dans {delay:.0f}s (relance n°{self.policy.restarts})")
+        self.restart_at = time.monotonic() + delay
+
+    def stop(self, timeout=5):
+        if self.process is None or self.process.poll() is not None:
+            return
+        try:
+            self.process.terminate()
+            self.process.wait(timeout=timeout)
+        except Exception:
+            self.process.kill()
+
+
+def run_supervised(display_flags, open_browser, port):
+    url = dashboard_url(port)
+    dashboard = SupervisedProcess(
+        "Dashboard", [sys.executable, "dashboard_server.py", "--port", str(port)],
+        lambda launched_at: lambda: probe_http(url + "/api/cache"),
+        DASHBOARD_READY_TIMEOUT, quiet=True)
+    detector = SupervisedProcess(
+        "Détection", [sys.executable, "main.py", "--dashboard-url", url] + display_flags,
+        detector_ready_probe, DETECTOR_READY_TIMEOUT)
+    children = (dashboard, detector)
+
+    # Les deux démarrent en même temps : rien n'attend l'autre
+    for child in children:
+        child.start()
+    browser_opened = not open_browser
+
+    try:
+        while True:
+            for child in children:
+                if child.restart_at is not None:
+                    if time.monotonic() >= child.restart_at:
+                        child.start()
+                    continue
+
+                code = child.process.poll()
+                if code is None:
+                    if child.ready:
+                        continue
+                    if child.probe():
+                        child.ready = True
+                        print(f"✅ {child.name} prêt {time.perf_counter() - child.started:.2f}s "
+                              f"après son lancement")
+                        if child is dashboard and not browser_opened:
+                            webbrowser.open(url)
+                            browser_opened = True
+                    elif time.perf_counter() - child.started > child.ready_timeout:
+                        child.stop()
+                        child.schedule_restart(f"pas prêt après {child.ready_timeout:.0f}s")
+                elif child is detector and code == 0:
+                    # Arrêt demandé (ESC) : on arrête tout
+                    return
+                else:
+                    child.schedule_restart(f"arrêté (code {code})")
+            time.sleep(PROBE_INTERVAL)
+    except KeyboardInterrupt:
+        print("\n⚠️  Interruption par l'utilisateur")
+    finally:
+        print("\n🛑 Arrêt du dashboard...")
+        for child in reversed(children):
+            child.stop()
+
+
+if __name__ == "__main__":
+    from cli_args import positive_fps
+
+    parser = argparse.ArgumentParser(description="Détection de somnolence + dashboard web")
+    parser.add_argument("--supervise", action="store_true",
+                        help="Serveur et détection dans deux processus surveillés et relancés")
+    parser.add_argument("--no-browser", action="store_true", help="Ne pas ouvrir le navigateur")
+    parser.add_argument("--port", type=int, default=DASHBOARD_PORT)
+    display = parser.add_mutually_exclusive_group()
+    display.add_argument("--headless", action="store_true",
+                         help="Détection sans fenêtre (arrêt avec Ctrl+C)")
+    display.add_argument("--preview", nargs="?", type=positive_fps, const=10.0, metavar="FPS",
+                         help="HUD sur un thread séparé, à FPS images/s")
+    args = parser.parse_args()
+
+    print("="*60)
+    print("🚀 Lancement du Système Anti-Somnolence avec Dashboard")
+    print("="*60)
+
+    if args.headless:
+        display_args, display_flags = ("headless",), ["--headless"]
+    elif args.preview is not None:
+        display_args, display_flags = ("preview", args.preview), ["--preview", str(args.preview)]
+    else:
+        display_args, display_flags = (), []
+
+    if args.supervise:
+        run_supervised(display_flags, not args.no_browser, args.port)
+    else:
+        run_single(display_args, not args.no_browser, args.port)
+
     print("✅ Système arrêté proprement")
@@ -0,0 +1,506 @@
+"""
+Sorties audio des alertes : bips, sirène et voix sur un seul thread
+Pour que les alertes sortent à l'heure et dans le bon ordre, sans créer un thread par bip
+
+Toutes les demandes (bip, motif de bips, phrase, sirène) passent par une
+file unique servie par un thread audio permanent :
+- les sons programmés (motifs de bips) attendent leur heure dans une file
+  triée par date ;
+- parmi les sons dus, la priorité décide : phrases critiques, puis
+  phrases, puis bips ;
+- un son qui n'a pas pu sortir à temps (file encombrée pendant une phrase)
+  est abandonné au lieu d'être joué en retard ; une phrase déjà en file
+  n'est pas ajoutée une seconde fois, et une phrase critique remplace les
+  phrases normales en attente ;
+- la sirène joue par tranches courtes quand rien d'autre n'est dû, elle
+  s'arrête donc en moins d'une tranche.
+Le délai entre la demande et le début de la lecture est mesuré.
+
+Sortie : winsound sous Windows, sinon paplay / pw-play / aplay (Linux,
+WAV envoyé sur l'entrée standard du lecteur), sinon aucune (les alertes restent visibles et exportées). La synthèse
+vocale (pyttsx3) est initialisée sur le thread audio, et désactivée si
+elle n'est pas disponible.
+
+Les phrases sont synthétisées une seule fois en WAV : les phrases connues
+(VOICE_PHRASES) pendant que le thread audio n'a rien à jouer, les autres à
+leur première demande. Les WAV sont gardés en mémoire et dans TTS_CACHE_DIR
+(clé : phrase, moteur, voix, débit, volume), ils sont donc relus
+directement aux lancements suivants. Une alerte vocale est alors jouée
+depuis ce tampon, sans repasser par la synthèse.
+"""
+
+import hashlib
+import heapq
+import io
+import itertools
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import wave
+from collections import deque
+
+import numpy as np
+
+
+PRIORITY_CRITICAL = 0      # phrases du mode sirène
+PRIORITY_VOICE = 1
+PRIORITY_BEEP = 2
+
+VOICE_MAX_AGE = 3.0        # phrase pas encore commencée après 3 s -> abandonnée
+CRITICAL_MAX_AGE = 6.0
+BEEP_MAX_AGE = 0.3         # bip en retard de plus de 300 ms -> abandonné
+SIREN_CHUNK_MS = 500       # durée d'une tranche de sirène (délai d'arrêt max)
+
+VOICE_RATE = 180
+VOICE_VOLUME = 1.0
+TTS_CACHE_DIR = "tts_cache"  # WAV des phrases déjà synthétisées
+SAMPLE_RATE = 22050
+TONE_VOLUME = 0.6
+LATENCY_SAMPLES = 200      # dernières mesures gardées par type de son
+# (lecteur, options, arguments pour lire le WAV sur l'entrée standard)
+LINUX_PLAYERS = (("paplay", [], []), ("pw-play", [], ["-"]), ("aplay", ["-q"], ["-"]))
+
+
+def tone_pcm(frequency, duration_ms, sample_rate=SAMPLE_RATE, volume=TONE_VOLUME):
+    """Sinusoïde PCM 16 bits mono (attaque et relâche de 5 ms pour éviter les clics)"""
+    n = int(sample_rate * duration_ms / 1000)
+    t = np.arange(n) / sample_rate
+    signal = np.sin(2 * np.pi * frequency * t) * volume
+    fade = min(int(sample_rate * 0.005), n // 2)
+    if fade:
+        ramp = np.linspace(0.0, 1.0, fade)
+        signal[:fade] *= ramp
+        signal[-fade:] *= ramp[::-1]
+    return (signal * 32767).astype("<i2").tobytes()
+
+
+def write_wav(path, pcm, sample_rate=SAMPLE_RATE, channels=1, sample_width=2):
+    """Écrit un WAV (path : chemin ou fichier ouvert en binaire)"""
+    with wave.open(path, "wb") as f:
+        f.setnchannels(channels)
+        f.setsampwidth(sample_width)
+        f.setframerate(sample_rate)
+        f.writeframes(pcm)
+
+
+def wav_bytes(pcm, sample_rate=SAMPLE_RATE):
+    """WAV complet en mémoire"""
+    buffer = io.BytesIO()
+    write_wav(buffer, pcm, sample_rate)
+    return buffer.getvalue()
+
+
+# -----------------------
+# SORTIES AUDIO
+# -----------------------
+
+class WinsoundBackend:
+    """Windows : bips du haut-parleur et fichiers WAV (bloquant, appelé depuis le thread audio)"""
+    name = "winsound"
+    plays_wav = True
+
+    def __init__(self):
+        import winsound
+        self.winsound = winsound
+
+    def play_tone(self, frequency, duration_ms):
+        self.winsound.Beep(int(frequency), int(duration_ms))
+
+    def play_wav(self, path, data=None):
+        # Depuis le tampon en mémoire quand il est fourni (aucune lecture disque)
+        if data is not None:
+            self.winsound.PlaySound(data, self.winsound.SND_MEMORY)
+        else:
+            self.winsound.PlaySound(path, self.winsound.SND_FILENAME)
+
+    def stop(self):
+        self.winsound.PlaySound(None, self.winsound.SND_PURGE)
+
+
+class CommandBackend:
+    """Linux : lecture des WAV par un lecteur en ligne de commande (paplay, pw-play, aplay)
+
+    Les WAV en mémoire (bips, phrases du cache) sont envoyés sur l'entrée
+    standard du lecteur : aucun fichier lu ni écrit par son joué.
+    """
+    plays_wav = True
+
+    def __init__(self, command, options, stdin_args=("-",)):
+        self.name = command
+        self.command = [shutil.which(command)] + list(options)
+        self.stdin_args = list(stdin_args)
+        self.tones = {}           # (fréquence, durée ms) -> octets WAV
+        self.process = None
+        self.lock = threading.Lock()
+
+    def play_tone(self, frequency, duration_ms):
+        key = (int(frequency), int(duration_ms))
+        data = self.tones.get(key)
+        if data is None:
+            data = self.tones[key] = wav_bytes(tone_pcm(*key))
+        self.play_wav(None, data)
+
+    def play_wav(self, path, data=None):
+        if data is None:
+            command, stdin = self.command + [path], subprocess.DEVNULL
+        else:
+            command, stdin = self.command + self.stdin_args, subprocess.PIPE
+        with self.lock:
+            self.process = subprocess.Popen(command, stdin=stdin, stdout=subprocess.DEVNULL,
+                                            stderr=subprocess.DEVNULL)
+            process = self.process
+        # Lecteur arrêté par stop() : communicate ignore le tube fermé
+        process.communicate(data)
+
+    def stop(self):
+        with self.lock:
+            if self.process is not None and self.process.poll() is None:
+                self.process.kill()
+
+
+class NullBackend:
+    """Aucune sortie audio disponible"""
+    name = "aucune"
+    plays_wav = False
+
+    def play_tone(self, frequency, duration_ms):
+        pass
+
+    def play_wav(self, path, data=None):
+        pass
+
+    def stop(self):
+        pass
+
+
+def create_backend():
+    """Meilleure sortie disponible sur cette machine"""
+    if sys.platform == "win32":
+        try:
+            return WinsoundBackend()
+        except ImportError:
+            pass
+    for command, options, stdin_args in LINUX_PLAYERS:
+        if shutil.which(command):
+            return CommandBackend(command, options, stdin_args)
+    print("🔇 Aucune sortie audio trouvée (winsound, paplay, pw-play, aplay) : bips désactivés")
+    return NullBackend()
+
+
+# -----------------------
+# SYSTÈME D'ALERTE SONORE
+# -----------------------
+
+class _Sound:
+    __slots__ = ("kind", "priority", "due", "max_age", "payload", "cancelled")
+
+    def __init__(self, kind, priority, due, max_age, payload):
+        self.kind = kind          # "beep" ou "voice"
+        self.priority = priority
+        self.due = due            # date prévue (perf_counter)
+        self.max_age = max_age
+        self.payload = payload    # (fréquence, durée ms) ou texte
+        self.cancelled = False
+
+
+class AlertSystem:
+    """Bips, sirène et messages vocaux servis par un thread audio unique"""
+
+    def __init__(self, backend=None, voice=True, phrases=(), cache_dir=TTS_CACHE_DIR):
+        self.backend = backend or create_backend()
+        self.voice_enabled = voice
+        self.engine = None
+
+        # Phrases pré-synthétisées (utilisées seulement par le thread audio)
+        self.cache_dir = cache_dir if self.backend.plays_wav else None
+        self.voice_key = ""       # moteur, voix, débit, volume (clé du cache disque)
+        self.clips = {}           # texte -> (chemin WAV, octets WAV)
+        self.to_render = list(dict.fromkeys(phrases))
+        self.cache_stats = {"loaded": 0, "synthesized": 0, "hits": 0, "misses": 0}
+
+        self.condition = threading.Condition()
+        self.timed = []           # (date, n, son) : sons programmés
+        self.ready = []           # (priorité, n, son) : sons dus
+        self.counter = itertools.count()
+        self.queued_phrases = {}  # texte -> son en attente
+        self.siren_frequency = None
+        self.playing = None       # type du son en cours de lecture ("siren", "voice"...)
+        self.closed = False
+        self.voice_ready = threading.Event()   # synthèse initialisée, cache disque relu
+
+        # Compteurs
+        self.played = {"beep": 0, "voice": 0, "siren": 0}
+        self.dropped = 0          # sons abandonnés (trop en retard)
+        self.merged = 0           # phrases déjà en file ou remplacées
+        self.latencies = {"beep": deque(maxlen=LATENCY_SAMPLES),
+                          "voice": deque(maxlen=LATENCY_SAMPLES)}
+
+        self.thread = threading.Thread(target=self._run, name="audio-alerts", daemon=True)
+        self.thread.start()
+
+    # ----- demandes (depuis la boucle de détection) -----
+
+    def _push(self, sound):
+        # Appelé avec self.condition verrouillé
+        if sound.due > time.perf_counter():
+            heapq.heappush(self.timed, (sound.due, next(self.counter), sound))
+        else:
+            heapq.heappush(self.ready, (sound.priority, next(self.counter), sound))
+        self.condition.notify()
+
+    def beep(self, frequency=2000, duration=200):
+        """Bip immédiat (non bloquant)"""
+        self.beep_pattern([(0.0, frequency, duration)])
+
+    def beep_pattern(self, pattern):
+        """Motif de bips [(décalage s, fréquence Hz, durée ms), ...] joué à partir de maintenant"""
+        now = time.perf_counter()
+        with self.condition:
+            for offset, frequency, duration in pattern:
+                self._push(_Sound("beep", PRIORITY_BEEP, now + offset, BEEP_MAX_AGE,
+                                  (frequency, duration)))
+
+    def start_continuous_beep(self, frequency=2500):
+        """Démarre la sirène continue (piiiiiiii)"""
+        with self.condition:
+            self.siren_frequency = frequency
+            self.condition.notify()
+
+    def stop_continuous_beep(self):
+        """Arrête la sirène continue (une phrase en cours de lecture continue)"""
+        with self.condition:
+            if self.siren_frequency is None:
+                return
+            self.siren_frequency = None
+            # Sous le verrou : le thread audio ne peut pas passer au son suivant
+            # entre la vérification et l'arrêt
+            if self.playing == "siren":
+                self.backend.stop()
+
+    def say_async(self, text, force=False, critical=False):
+        """Met une phrase en file (non bloquant).
+
+        critical : passe devant les autres sons et remplace les phrases
+        normales en attente. force est gardé pour compatibilité : une phrase
+        n'est plus jamais ignorée parce qu'une autre est en cours, elle attend
+        son tour (et est abandonnée si elle devient trop ancienne).
+        """
+        if not self.voice_enabled:
+            return False
+        with self.condition:
+            if text in self.queued_phrases:
+                self.merged += 1
+                return False
+            if critical:
+                for queued in self.queued_phrases.values():
+                    if queued.priority != PRIORITY_CRITICAL:
+                        queued.cancelled = True
+                        self.merged += 1
+                self.queued_phrases = {t: s for t, s in self.queued_phrases.items()
+                                       if not s.cancelled}
+            sound = _Sound("voice", PRIORITY_CRITICAL if critical else PRIORITY_VOICE,
+                           time.perf_counter(), CRITICAL_MAX_AGE if critical else VOICE_MAX_AGE, text)
+            self.queued_phrases[text] = sound
+            self._push(sound)
+        return True
+
+    def on_event(self, event):
+        """Abonné du DrowsinessEngine : bips, voix et sirène"""
+        kind = event["kind"]
+        if kind == "beep":
+            self.beep(event["frequency"], event["duration"])
+        elif kind == "voice":
+            self.say_async(event["text"], critical=event.get("critical", False))
+        elif kind == "siren_start":
+            self.start_continuous_beep(event["frequency"])
+        elif kind == "siren_stop":
+            self.stop_continuous_beep()
+
+    # ----- thread audio -----
+
+    def _init_voice(self):
+        # pyttsx3 doit être utilisé depuis le thread qui l'a créé
+        if not self.voice_enabled:
+            self.to_render = []
+            return
+        try:
+            import pyttsx3
+            self.engine = pyttsx3.init()
+            self.engine.setProperty('rate', VOICE_RATE)
+            self.engine.setProperty('volume', VOICE_VOLUME)
+        except Exception as e:
+            print(f"⚠️ Synthèse vocale indisponible ({e}) : alertes vocales désactivées")
+            self.engine = None
+            self.voice_enabled = False
+            self.to_render = []
+            return
+
+        if self.cache_dir is None:
+            self.to_render = []
+            return
+        self.voice_key = "|".join(str(v) for v in (
+            getattr(self.engine, "driver_name", ""), self.engine.getProperty('voice'),
+            VOICE_RATE, VOICE_VOLUME))
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Phrases déjà sur disque : chargées tout de suite, les autres le seront au repos
+        remaining = []
+        for text in self.to_render:
+            if self._clip(text, synthesize=False) is None:
+                remaining.append(text)
+        self.to_render = remaining
+        self.cache_stats["loaded"] = len(self.clips)
+
+    def _clip_path(self, text):
+        digest = hashlib.sha1(f"{self.voice_key}|{text}".encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest[:20] + ".wav")
+
+    def _clip(self, text, synthesize=True):
+        """WAV de la phrase : mémoire, sinon disque, sinon synthèse (None si impossible)"""
+        clip = self.clips.get(text)
+        if clip is not None or self.cache_dir is None or self.engine is None:
+            return clip
+        path = self._clip_path(text)
+        if not os.path.exists(path):
+            if not synthesize or not self._synthesize(text, path):
+                return None
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            with wave.open(path, "rb"):
+                pass
+        except (OSError, wave.Error, EOFError) as e:
+            print(f"⚠️ Cache vocal inutilisable ({e}) : synthèse à chaque alerte")
+            self.cache_dir = None
+            self.to_render = []
+            return None
+        self.clips[text] = (path, data)
+        return self.clips[text]
+
+    def _synthesize(self, text, path):
+        if self.engine is None:
+            return False
+        temp_path = path + ".tmp.wav"
+        self.engine.save_to_file(text, temp_path)
+        self.engine.runAndWait()
+        if not os.path.exists(temp_path) or os.path.getsize(temp_path) <= 44:
+            print("⚠️ Le moteur vocal n'écrit pas de WAV : synthèse à chaque alerte")
+            self.cache_dir = None
+            self.to_render = []
+            return False
+        os.replace(temp_path, path)
+        self.cache_stats["synthesized"] += 1
+        return True
+
+    def _speak(self, sound):
+        text = sound.payload
+        clip = self.clips.get(text)
+        if clip is not None:
+            self.cache_stats["hits"] += 1
+        elif self.cache_dir is not None:
+            self.cache_stats["misses"] += 1
+            clip = self._clip(text)
+        self.latencies["voice"].append(time.perf_counter() - sound.due)
+        if clip is not None:
+            self.backend.play_wav(*clip)
+        else:
+            self.engine.say(text)
+            self.engine.runAndWait()
+
+    def _next_sound(self):
+        """Prochain son à jouer (bloque jusqu'à ce qu'il y en ait un), None à la fermeture"""
+        with self.condition:
+            self.playing = None
+            while not self.closed:
+                now = time.perf_counter()
+                while self.timed and self.timed[0][0] <= now:
+                    _, n, sound = heapq.heappop(self.timed)
+                    heapq.heappush(self.ready, (sound.priority, n, sound))
+                while self.ready:
+                    _, _, sound = heapq.heappop(self.ready)
+                    if sound.kind == "voice":
+                        self.queued_phrases.pop(sound.payload, None)
+                    if sound.cancelled:
+                        continue
+                    if now - sound.due > sound.max_age:
+                        self.dropped += 1
+                        continue
+                    self.playing = sound.kind
+                    return sound
+                if self.siren_frequency is not None:
+                    self.playing = "siren"
+                    return _Sound("siren", PRIORITY_BEEP, now, 0.0,
+                                  (self.siren_frequency, SIREN_CHUNK_MS))
+                if self.to_render:
+                    # Rien à jouer : on en profite pour synthétiser une phrase connue
+                    return _Sound("render", PRIORITY_BEEP, now, 0.0, self.to_render.pop(0))
+                timeout = self.timed[0][0] - now if self.timed else None
+                self.condition.wait(timeout)
+        return None
+
+    def wait_ready(self, timeout=None):
+        """Attend l'initialisation du thread audio (True si prêt avant timeout)"""
+        return self.voice_ready.wait(timeout)
+
+    def _run(self):
+        try:
+            self._init_voice()
+        finally:
+            self.voice_ready.set()
+        while True:
+            sound = self._next_sound()
+            if sound is None:
+                return
+            try:
+                if sound.kind == "render":
+                    self._clip(sound.payload)
+                    continue
+                if sound.kind == "voice":
+                    if self.engine is None:
+                        continue
+                    self._speak(sound)
+                else:
+                    if sound.kind == "beep":
+                        self.latencies["beep"].append(time.perf_counter() - sound.due)
+                    self.backend.play_tone(*sound.payload)
+                self.played[sound.kind] += 1
+            except Exception as e:
+                print(f"Erreur audio ({sound.kind}): {e}")
+
+    # ----- statistiques / arrêt -----
+
+    def get_stats(self):
+        """Sons joués, abandonnés, et délai demande -> lecture (ms) par type"""
+        latency = {}
+        for kind, values in self.latencies.items():
+            if values:
+                ms = np.array(values) * 1000.0
+                latency[kind] = {
+                    "mean": round(float(ms.mean()), 1),
+                    "p95": round(float(np.percentile(ms, 95)), 1),
+                    "max": round(float(ms.max()), 1),
+                    "samples": len(ms)
+                }
+        with self.condition:
+            pending = len(self.ready) + len(self.timed)
+        return {
+            "backend": self.backend.name,
+            "voice": self.voice_enabled,
+            "played": dict(self.played),
+            "dropped": self.dropped,
+            "merged": self.merged,
+            "pending": pending,
+            "tts_cache": {"phrases": len(self.clips), **self.cache_stats},
+            "latency_ms": latency
+        }
+
+    def close(self, timeout=1.0):
+        """Arrête le thread audio (les sons en attente sont abandonnés)"""
+        with self.condition:
+            self.closed = True
+            self.siren_frequency = None
+            self.condition.notify()
+        self.backend.stop()
+        self.thread.join(timeout)
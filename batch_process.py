@@ -0,0 +1,248 @@
+"""
+Mode batch (hors ligne) : analyse de vidéos enregistrées
+Pour auditer des heures d'enregistrements dashcam sans caméra ni affichage
+
+Applique la même logique que main.py (DrowsinessEngine : EAR, PERCLOS,
+pose de tête, alertes) mais sans son ni fenêtre, aussi vite que possible,
+en répartissant les fichiers sur un pool de processus (un FaceMesh par
+worker).
+
+Usage :
+    python batch_process.py videos/ autre_video.mp4 --workers 4 --output batch_reports
+"""
+
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import cv2
+
+from drowsiness_engine import DrowsinessEngine
+from face_roi import RoiFaceMesh, create_face_mesh
+from landmark_recording import LandmarkRecorder, RECORDING_SUFFIX
+
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".m4v", ".wmv", ".mpg", ".mpeg")
+DEFAULT_OUTPUT_DIR = "batch_reports"
+
+# FaceMesh du worker courant (créé une seule fois par processus)
+_face_mesh = None
+
+
+def _init_worker(use_roi=True):
+    """Initialise un FaceMesh par processus du pool"""
+    global _face_mesh
+    _face_mesh = RoiFaceMesh(create_face_mesh, enabled=use_roi)
+
+
+def collect_videos(inputs, extensions=VIDEO_EXTENSIONS):
+    """Liste les fichiers vidéo à partir de fichiers et/ou dossiers (récursif)"""
+    videos = []
+    for path in inputs:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    if name.lower().endswith(extensions):
+                        videos.append(os.path.join(root, name))
+        elif os.path.isfile(path):
+            videos.append(path)
+        else:
+            print(f"⚠️ Ignoré (introuvable): {path}")
+    return videos
+
+
+def _collect_alerts(alerts):
+    """Abonné du DrowsinessEngine : déclenchements d'alertes avec le temps de la vidéo.
+
+    Les bips et messages vocaux répétés n'ont pas de sens hors ligne et
+    sont ignorés.
+    """
+    def on_event(event):
+        if event["kind"] == "alert":
+            alerts.append({
+                "video_time": round(event["time"], 3),
+                "type": event["type"],
+                "level": event["level"],
+                "duration": round(event["duration"], 1)
+            })
+    return on_event
+
+
+def _frame_timestamp(cap, frame_index, fps):
+    """Horodatage de la frame d'après la vidéo (secondes), repli sur l'index / fps"""
+    pos_msec = cap.get(cv2.CAP_PROP_POS_MSEC)
+    if pos_msec > 0 or frame_index == 0:
+        return pos_msec / 1000.0
+    return frame_index / fps
+
+
+def process_video(path, output_dir, report_name=None, save_landmarks=False):
+    """Analyse une vidéo et écrit ses rapports, retourne le résumé"""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        return {"file": path, "error": "Impossible d'ouvrir la vidéo"}
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    engine = DrowsinessEngine(perclos_extra_windows=())
+    alerts = []
+    engine.subscribe(_collect_alerts(alerts))
+    _face_mesh.reset()
+    base = report_name or os.path.splitext(os.path.basename(path))[0]
+    metrics_path = os.path.join(output_dir, f"{base}_metrics.csv")
+    report_path = os.path.join(output_dir, f"{base}_report.json")
+    recorder = None
+    if save_landmarks:
+        recording_path = os.path.join(output_dir, f"{base}_landmarks{RECORDING_SUFFIX}")
+        recorder = LandmarkRecorder(recording_path,
+                                    int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                                    int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+
+    frames = 0
+    face_frames = 0
+    ear_sum = 0.0
+    perclos_sum = 0.0
+    timestamp = 0.0
+    started = time.perf_counter()
+
+    with open(metrics_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["video_time", "face", "ear", "perclos", "pitch", "yaw",
+                         "eyes_closed_duration", "head_down_duration",
+                         "head_movements", "head_drowsy", "alert_level"])
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            timestamp = _frame_timestamp(cap, frames, fps)
+            frames += 1
+
+            h, w = frame.shape[:2]
+            points = _face_mesh.process(frame)
+            if recorder is not None:
+                recorder.record(timestamp, points)
+
+            m, _ = engine.process(timestamp, points, w, h)
+            if m["face"]:
+                face_frames += 1
+                ear_sum += m["ear"]
+                perclos_sum += m["perclos"]
+                writer.writerow([f"{timestamp:.3f}", 1, f"{m['ear']:.4f}",
+                                 f"{m['perclos'] * 100:.1f}", f"{m['pitch']:.1f}",
+                                 f"{m['yaw']:.1f}", f"{m['closed_duration']:.2f}",
+                                 f"{m['head_down_duration']:.2f}", m["head_movements"],
+                                 int(m["head_drowsy"]), m["alert_level"]])
+            else:
+                writer.writerow([f"{timestamp:.3f}", 0, "", "", "", "", "", "", "", "", 0])
+
+    cap.release()
+    if recorder is not None:
+        recorder.close()
+    elapsed = time.perf_counter() - started
+
+    alerts_by_level = {1: 0, 2: 0, 3: 0}
+    for alert in alerts:
+        alerts_by_level[alert["level"]] += 1
+
+    report = {
+        "file": path,
+        "processed_at": datetime.now().isoformat(),
+        "frames": frames,
+        "face_frames": face_frames,
+        "video_duration_seconds": round(timestamp, 1),
+        "processing_seconds": round(elapsed, 1),
+        "speed_factor": round(timestamp / elapsed, 2) if elapsed > 0 else 0.0,
+        "average_ear": round(ear_sum / face_frames, 3) if face_frames else 0.0,
+        "average_perclos": round(perclos_sum / face_frames * 100, 1) if face_frames else 0.0,
+        "total_alerts": len(alerts),
+        "alerts_by_level": alerts_by_level,
+        "alerts": alerts,
+        "metrics_file": metrics_path
+    }
+    if recorder is not None:
+        report["landmarks_file"] = recorder.path
+
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    return report
+
+
+def run_batch(videos, output_dir=DEFAULT_OUTPUT_DIR, workers=None, use_roi=True,
+              save_landmarks=False):
+    """Répartit les vidéos sur un pool de processus, retourne les résumés"""
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    summaries = []
+
+    # Noms de rapports uniques (deux vidéos du même nom dans des dossiers différents)
+    report_names = {}
+    used = set()
+    for path in videos:
+        base = name = os.path.splitext(os.path.basename(path))[0]
+        suffix = 2
+        while name in used:
+            name = f"{base}_{suffix}"
+            suffix += 1
+        used.add(name)
+        report_names[path] = name
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(use_roi,)) as pool:
+        futures = {
+            pool.submit(process_video, path, output_dir, report_names[path], save_landmarks): path
+            for path in videos
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                summary = future.result()
+            except Exception as e:
+                summary = {"file": path, "error": str(e)}
+
+            if "error" in summary:
+                print(f"❌ {path}: {summary['error']}")
+            else:
+                print(f"✅ {path}: {summary['total_alerts']} alertes, "
+                      f"{summary['video_duration_seconds']:.0f}s vidéo en "
+                      f"{summary['processing_seconds']:.0f}s (x{summary['speed_factor']})")
+            summaries.append(summary)
+
+    with open(os.path.join(output_dir, "batch_summary.json"), 'w', encoding='utf-8') as f:
+        json.dump([
+            {k: v for k, v in s.items() if k != "alerts"} for s in summaries
+        ], f, ensure_ascii=False, indent=2)
+
+    return summaries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyse hors ligne de vidéos enregistrées")
+    parser.add_argument("inputs", nargs="+", help="Fichiers vidéo et/ou dossiers")
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT_DIR,
+                        help="Dossier des rapports (défaut: batch_reports)")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="Nombre de processus (défaut: nombre de coeurs)")
+    parser.add_argument("--no-roi", action="store_true",
+                        help="FaceMesh sur l'image complète (pas de recadrage sur le visage)")
+    parser.add_argument("--save-landmarks", action="store_true",
+                        help="Enregistre aussi les landmarks (<nom>_landmarks.lmk) pour les rejouer")
+    args = parser.parse_args()
+
+    videos = collect_videos(args.inputs)
+    if not videos:
+        print("❌ Aucune vidéo trouvée.")
+        return
+
+    print(f"🎞️  {len(videos)} vidéo(s) à analyser avec {args.workers or os.cpu_count()} processus")
+    started = time.perf_counter()
+    run_batch(videos, args.output, args.workers, use_roi=not args.no_roi,
+              save_landmarks=args.save_landmarks)
+    print(f"\n✅ Batch terminé en {time.perf_counter() - started:.1f}s — rapports dans {args.output}/")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Micro-benchmark : extraction des features point par point vs vectorisée
+
+Compare eye_aspect_ratio + calculate_head_pose (main.py) avec
+landmark_features.compute_features, sur une frame et sur un lot de frames.
+Ne nécessite ni caméra ni affichage.
+
+Usage :
+    python benchmarks/bench_features.py --frames 2000
+"""
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+from mediapipe.framework.formats import landmark_pb2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import LEFT_EYE, RIGHT_EYE, eye_aspect_ratio, calculate_head_pose
+from landmark_features import landmarks_to_array, compute_features
+
+NUM_LANDMARKS = 478
+W, H = 640, 480
+
+
+def synthetic_landmarks(frames, seed=0):
+    """Séquences de landmarks FaceMesh aléatoires (mêmes objets protobuf que MediaPipe)"""
+    rng = np.random.default_rng(seed)
+    coords = rng.uniform(0.2, 0.8, size=(frames, NUM_LANDMARKS, 3))
+    coords[..., 2] -= 0.5
+    frames_lm = []
+    for frame in coords.tolist():
+        landmark_list = landmark_pb2.NormalizedLandmarkList()
+        for x, y, z in frame:
+            landmark_list.landmark.add(x=x, y=y, z=z)
+        frames_lm.append(landmark_list.landmark)
+    return frames_lm, coords
+
+
+def bench(label, fn, repeat=3):
+    """Meilleur temps sur plusieurs répétitions"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return label, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark extraction des features")
+    parser.add_argument("--frames", type=int, default=2000)
+    args = parser.parse_args()
+
+    frames_lm, coords = synthetic_landmarks(args.frames)
+
+    def scalar():
+        for lm in frames_lm:
+            eye_aspect_ratio(lm, LEFT_EYE, W, H)
+            eye_aspect_ratio(lm, RIGHT_EYE, W, H)
+            calculate_head_pose(lm, W, H)
+
+    def vector_per_frame():
+        for lm in frames_lm:
+            compute_features(landmarks_to_array(lm), W, H)
+
+    def vector_batch():
+        compute_features(coords, W, H)
+
+    results = [
+        bench("point par point (main.py)", scalar),
+        bench("vectorisé, frame par frame", vector_per_frame),
+        bench("vectorisé, lot (F, N, 3)", vector_batch),
+    ]
+
+    reference = results[0][1]
+    print(f"{args.frames} frames")
+    for label, elapsed in results:
+        print(f"  {label:<30} {elapsed * 1e6 / args.frames:8.2f} µs/frame  (x{reference / elapsed:.1f})")
+
+    # Cohérence : écart dû uniquement à l'arrondi en pixels entiers de l'ancienne version
+    batch = compute_features(coords, W, H)
+    pitch_ref = np.array([calculate_head_pose(lm, W, H)[0] for lm in frames_lm])
+    print(f"  écart max pitch: {np.max(np.abs(batch['pitch'] - pitch_ref)):.2e}°")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,398 @@
+"""
+Suite de benchmarks : calculs de détection et export dashboard
+Pour mesurer l'effet d'un changement sur la boucle chaude, sans caméra ni affichage
+
+Chaque benchmark donne un temps par opération (µs, meilleur de --repeat
+passages, et médiane). Les données d'entrée sont une séquence de
+landmarks synthétique (clignements, yeux fermés 2 s puis 13 s, tête
+baissée, balancements) ou une séquence enregistrée (--fixture).
+
+Usage :
+    python benchmarks/bench_suite.py -o bench_results.json
+    python benchmarks/bench_suite.py --compare bench_baseline.json --threshold 0.15
+    python benchmarks/bench_suite.py --only perclos exporter
+    python benchmarks/bench_suite.py --record video.mp4 --save-fixture fixtures/trajet.npz
+
+Fixture : enregistrement de landmarks (.lmk, voir landmark_recording.py)
+ou .npz avec "timestamps" (F,) en secondes et "landmarks" (F, N, 3)
+normalisés FaceMesh (N = 478 ou les 17 points de FEATURE_LANDMARKS,
+NaN pour les frames sans visage), plus "width" / "height" optionnels.
+Code de sortie 1 avec --compare si un benchmark ralentit de plus que
+--threshold.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+from mediapipe.framework.formats import landmark_pb2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import eye_aspect_ratio, calculate_head_pose
+from drowsiness_engine import (EAR_THRESHOLD, PERCLOS_WINDOW, PERCLOS_EXTRA_WINDOWS,
+                               PerclosWindow, HeadMovementDetector, DrowsinessEngine)
+from dashboard_exporter import DashboardExporter
+from landmark_features import (LEFT_EYE, RIGHT_EYE, NOSE_TIP, CHIN, FOREHEAD, LEFT_EAR,
+                               RIGHT_EAR, FEATURE_LANDMARKS, compute_features,
+                               to_feature_points)
+from landmark_recording import LandmarkRecording, RECORDING_SUFFIX
+from perf_stats import PerfTimer
+
+NUM_LANDMARKS = 478
+W, H = 640, 480
+FPS = 30.0
+
+
+# ----------------------------------------------------------------------
+# Données d'entrée
+# ----------------------------------------------------------------------
+
+def _set_eye(coords, eye, cx, cy, ear):
+    """Place les 4 points d'un oeil pour obtenir l'EAR voulu (largeur 0.06)"""
+    half = 0.03
+    coords[:, eye["outer"], :2] = np.c_[np.full(len(cy), cx - half), cy]
+    coords[:, eye["inner"], :2] = np.c_[np.full(len(cy), cx + half), cy]
+    # EAR = hauteur / largeur, en pixels
+    half_height = ear * (2 * half * W) / H / 2
+    coords[:, eye["upper"], 1] = cy - half_height
+    coords[:, eye["lower"], 1] = cy + half_height
+    coords[:, eye["upper"], 0] = cx
+    coords[:, eye["lower"], 0] = cx
+
+
+def synthetic_sequence(frames, fps=FPS, seed=0):
+    """(timestamps, landmarks (F, 478, 3)) : minute de conduite type, répétée"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(frames) / fps
+    coords = np.repeat(rng.uniform(0.3, 0.7, size=(1, NUM_LANDMARKS, 3)), frames, axis=0)
+    coords[..., 2] -= 0.5
+    coords += rng.normal(0, 0.0005, size=coords.shape)   # bruit de mesure
+
+    # Yeux : ouverts, clignement toutes les 4 s, fermés 2 s à 20 s et 13 s à 40 s
+    cycle = t % 60.0
+    ear = np.full(frames, 0.30)
+    ear[(t % 4.0) < 0.15] = 0.12
+    ear[(cycle >= 20.0) & (cycle < 22.0)] = 0.15
+    ear[(cycle >= 40.0) & (cycle < 53.0)] = 0.15
+    ear += rng.normal(0, 0.005, size=frames)
+    cy = np.full(frames, 0.40)
+    _set_eye(coords, LEFT_EYE, 0.42, cy, ear)
+    _set_eye(coords, RIGHT_EYE, 0.58, cy, ear)
+
+    # Tête : baissée (-25°) de 5 à 9 s, balancements ±15° de 28 à 36 s
+    pitch = np.zeros(frames)
+    pitch[(cycle >= 5.0) & (cycle < 9.0)] = -25.0
+    sway = (cycle >= 28.0) & (cycle < 36.0)
+    pitch[sway] = 15.0 * np.sin(2 * np.pi * 0.5 * cycle[sway])
+    coords[:, NOSE_TIP, :2] = (0.5, 0.5)
+    coords[:, FOREHEAD, :2] = (0.5, 0.25)
+    coords[:, CHIN, :2] = (0.5, 0.75)
+    chin_forehead_px = 0.5 * H
+    dz = np.tan(np.radians(pitch)) * chin_forehead_px / W
+    coords[:, FOREHEAD, 2] = 0.0
+    coords[:, CHIN, 2] = -dz
+    # Yaw de calculate_head_pose : écart horizontal / distance 3D des oreilles (~3° ici)
+    coords[:, LEFT_EAR, :] = (0.51, 0.45, 0.2)
+    coords[:, RIGHT_EAR, :] = (0.49, 0.45, -0.2)
+    return t, coords
+
+
+def load_fixture(path):
+    """(timestamps, landmarks, largeur, hauteur) d'une séquence enregistrée (.npz ou .lmk)"""
+    if path.endswith(RECORDING_SUFFIX):
+        recording = LandmarkRecording(path)
+        return (np.array(recording.timestamps, dtype=np.float64),
+                recording.points.astype(np.float64), recording.width, recording.height)
+    data = np.load(path)
+    width = int(data["width"]) if "width" in data else W
+    height = int(data["height"]) if "height" in data else H
+    return data["timestamps"].astype(np.float64), data["landmarks"].astype(np.float64), width, height
+
+
+def record_fixture(video_path):
+    """Landmarks FaceMesh d'une vidéo (NaN sans visage), pour --save-fixture"""
+    import cv2
+    from face_roi import RoiFaceMesh, create_face_mesh
+
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or FPS
+    timestamps, landmarks = [], []
+    width = height = 0
+    with RoiFaceMesh(create_face_mesh) as face_mesh:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            height, width = frame.shape[:2]
+            points = face_mesh.process(frame)
+            timestamps.append(len(timestamps) / fps)
+            landmarks.append(points if points is not None
+                             else np.full((len(FEATURE_LANDMARKS), 3), np.nan))
+    cap.release()
+    return np.array(timestamps), np.array(landmarks), width, height
+
+
+def to_protobuf(coords):
+    """Mêmes objets que MediaPipe, pour les fonctions point par point de main.py"""
+    frames = []
+    for frame in coords.tolist():
+        landmark_list = landmark_pb2.NormalizedLandmarkList()
+        for x, y, z in frame:
+            landmark_list.landmark.add(x=x, y=y, z=z)
+        frames.append(landmark_list.landmark)
+    return frames
+
+
+# ----------------------------------------------------------------------
+# Mesure
+# ----------------------------------------------------------------------
+
+def measure(fn, ops, repeat):
+    """Temps par opération (µs) : meilleur et médiane de `repeat` passages"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) / ops * 1e6)
+    return {"best_us": round(min(times), 4), "median_us": round(statistics.median(times), 4),
+            "ops": ops, "repeat": repeat}
+
+
+def build_benchmarks(t, coords, w, h):
+    """{nom: (fonction, nombre d'opérations par passage)}"""
+    frames = len(t)
+    face = ~np.isnan(coords).any(axis=(1, 2))
+    points = to_feature_points(coords)
+    points_list = [points[i] if face[i] else None for i in range(frames)]
+    features = compute_features(np.nan_to_num(points), w, h)
+    ears = features["ear"].tolist()
+    pitches = features["pitch"].tolist()
+    yaws = features["yaw"].tolist()
+    times = t.tolist()
+    closed = [e < EAR_THRESHOLD for e in ears]
+
+    benchmarks = {}
+
+    if coords.shape[1] == NUM_LANDMARKS:
+        protobuf = to_protobuf(np.nan_to_num(coords))
+
+        def legacy_ear():
+            for lm in protobuf:
+                eye_aspect_ratio(lm, LEFT_EYE, w, h)
+                eye_aspect_ratio(lm, RIGHT_EYE, w, h)
+
+        def legacy_head_pose():
+            for lm in protobuf:
+                calculate_head_pose(lm, w, h)
+
+        benchmarks["eye_aspect_ratio"] = (legacy_ear, 2 * frames)
+        benchmarks["calculate_head_pose"] = (legacy_head_pose, frames)
+
+    def features_per_frame():
+        for p in points_list:
+            if p is not None:
+                compute_features(p, w, h)
+
+    def features_batch():
+        compute_features(points, w, h)
+
+    benchmarks["compute_features"] = (features_per_frame, int(face.sum()))
+    benchmarks["compute_features_batch"] = (features_batch, frames)
+
+    def perclos_update():
+        window = PerclosWindow(PERCLOS_WINDOW, PERCLOS_EXTRA_WINDOWS)
+        for now, c in zip(times, closed):
+            window.update(c, now)
+
+    perclos_filled = PerclosWindow(PERCLOS_WINDOW, PERCLOS_EXTRA_WINDOWS)
+    for now, c in zip(times, closed):
+        perclos_filled.update(c, now)
+
+    def perclos_read():
+        for _ in range(frames):
+            perclos_filled.perclos()
+
+    def perclos_all():
+        for _ in range(frames):
+            perclos_filled.perclos_all()
+
+    benchmarks["PerclosWindow.update"] = (perclos_update, frames)
+    benchmarks["PerclosWindow.perclos"] = (perclos_read, frames)
+    benchmarks["PerclosWindow.perclos_all"] = (perclos_all, frames)
+
+    def head_update():
+        detector = HeadMovementDetector()
+        for now, p, y in zip(times, pitches, yaws):
+            detector.update(p, y, now)
+            detector.is_drowsy_head_movement(now)
+
+    benchmarks["HeadMovementDetector.update"] = (head_update, frames)
+
+    # Logique d'alertes complète d'une frame (features comprises)
+    def alert_logic():
+        engine = DrowsinessEngine()
+        for now, p in zip(times, points_list):
+            engine.process(now, p, w, h)
+
+    benchmarks["alert_logic"] = (alert_logic, frames)
+
+    def perf_timer():
+        timer = PerfTimer()
+        for _ in range(frames):
+            timer.start_frame()
+            for stage in ("capture", "cvtColor", "face_mesh", "features", "alerts", "hud"):
+                timer.mark(stage)
+            timer.end_frame(0)
+
+    benchmarks["PerfTimer.frame"] = (perf_timer, frames)
+    return benchmarks
+
+
+def run_exporter_benchmarks(frames, repeat, selected=lambda name: True):
+    """Chaque méthode de DashboardExporter (temps vu par la boucle de détection)"""
+    realtime = dict(ear=0.3, perclos=0.12, status="✓ OK", closed_duration=0.0, pitch=-3.2,
+                    yaw=1.5, head_movements=0, head_down_duration=0.0, head_drowsy=False,
+                    eyes_alert_active=False, head_alert_active=False,
+                    head_down_alert_active=False, eyes_continuous_mode=False,
+                    head_continuous_mode=False, perclos_windows={300.0: 0.1, 900.0: 0.08})
+    streams = {f"stream{i}": {"source": str(i), "alive": True, "restarts": 0,
+                              "alert_level": 0, "metrics": dict(realtime)} for i in range(4)}
+    perf = PerfTimer().snapshot()
+    events = max(frames // 10, 1)
+
+    cases = {
+        "DashboardExporter.update_realtime": (lambda: [exporter.update_realtime(**realtime)
+                                                       for _ in range(frames)], frames),
+        "DashboardExporter.update_session": (lambda: [exporter.update_session(0.12)
+                                                      for _ in range(frames)], frames),
+        "DashboardExporter.increment_blink": (lambda: [exporter.increment_blink()
+                                                       for _ in range(frames)], frames),
+        "DashboardExporter.add_message": (lambda: [exporter.add_message("ALERTE YEUX", "warning")
+                                                   for _ in range(events)], events),
+        "DashboardExporter.add_alert": (lambda: [exporter.add_alert("Yeux fermés", 2, 1.6)
+                                                 for _ in range(events)], events),
+        "DashboardExporter.update_streams": (lambda: [exporter.update_streams(streams)
+                                                      for _ in range(events)], events),
+        "DashboardExporter.update_perf": (lambda: [exporter.update_perf(perf)
+                                                   for _ in range(events)], events),
+    }
+    cases = {name: case for name, case in cases.items() if selected(name)}
+    measure_finalize = selected("DashboardExporter.finalize")
+    if not cases and not measure_finalize:
+        return {}
+
+    output_dir = tempfile.mkdtemp(prefix="bench_export_")
+    exporter = DashboardExporter(output_dir, ipc=False)
+    results = {}
+    try:
+        for name, (fn, ops) in cases.items():
+            results[name] = measure(fn, ops, repeat)
+        # finalize ferme l'exporteur : un seul passage (toujours appelé)
+        finalize = measure(lambda: exporter.finalize(0.12), 1, 1)
+        if measure_finalize:
+            results["DashboardExporter.finalize"] = finalize
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+    return results
+
+
+# ----------------------------------------------------------------------
+# Résultats
+# ----------------------------------------------------------------------
+
+def compare(results, baseline, threshold):
+    """Affiche l'écart avec la référence, retourne la liste des régressions"""
+    regressions = []
+    print(f"\n{'benchmark':<40} {'réf. µs':>10} {'actuel µs':>10} {'écart':>8}")
+    for name, current in results.items():
+        ref = baseline.get(name)
+        if ref is None:
+            print(f"{name:<40} {'-':>10} {current['best_us']:>10.3f}   nouveau")
+            continue
+        change = current["best_us"] / ref["best_us"] - 1 if ref["best_us"] > 0 else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  ⚠️ régression"
+            regressions.append(name)
+        print(f"{name:<40} {ref['best_us']:>10.3f} {current['best_us']:>10.3f} {change:>+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks des calculs de détection et de l'export")
+    parser.add_argument("--frames", type=int, default=3600, help="frames synthétiques (défaut: 2 min à 30 fps)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--fixture", help="séquence enregistrée (.lmk ou .npz) au lieu des données synthétiques")
+    parser.add_argument("--record", help="vidéo à passer dans FaceMesh pour créer une fixture")
+    parser.add_argument("--save-fixture", help="enregistre la séquence utilisée (.npz)")
+    parser.add_argument("--only", nargs="+", help="benchmarks dont le nom contient un de ces mots")
+    parser.add_argument("-o", "--output", help="résultats JSON")
+    parser.add_argument("--compare", help="résultats JSON de référence")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="ralentissement toléré avec --compare (défaut: 0.15 = 15%%)")
+    args = parser.parse_args()
+
+    if args.record:
+        t, coords, w, h = record_fixture(args.record)
+        source = args.record
+    elif args.fixture:
+        t, coords, w, h = load_fixture(args.fixture)
+        source = args.fixture
+    else:
+        t, coords = synthetic_sequence(args.frames)
+        w, h = W, H
+        source = "synthetic"
+    if args.save_fixture:
+        np.savez_compressed(args.save_fixture, timestamps=t, landmarks=coords, width=w, height=h)
+        print(f"💾 Fixture: {args.save_fixture} ({len(t)} frames)")
+
+    def selected(name):
+        return not args.only or any(word.lower() in name.lower() for word in args.only)
+
+    results = {}
+    for name, (fn, ops) in build_benchmarks(t, coords, w, h).items():
+        if selected(name):
+            results[name] = measure(fn, ops, args.repeat)
+            print(f"  {name:<40} {results[name]['best_us']:>10.3f} µs/op")
+    for name, result in run_exporter_benchmarks(len(t), args.repeat, selected).items():
+        results[name] = result
+        print(f"  {name:<40} {result['best_us']:>10.3f} µs/op")
+
+    report = {
+        "meta": {
+            "date": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "source": source,
+            "frames": int(len(t)),
+            "repeat": args.repeat
+        },
+        "results": results
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"💾 Résultats: {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} régression(s) au-delà de {args.threshold:.0%}")
+            sys.exit(1)
+        print("\n✅ Aucune régression")
+
+
+if __name__ == "__main__":
+    main()
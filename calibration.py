@@ -0,0 +1,330 @@
+"""
+Calibration des seuils sur des sessions enregistrées
+Pour choisir EAR_THRESHOLD, MIN_CLOSED_SECONDS, HEAD_DOWN_THRESHOLD... sur des données réelles
+
+Chaque combinaison de la grille est jugée sur des sessions enregistrées
+(landmarks .lmk ou métriques *_metrics.csv du mode batch) dont les
+intervalles de somnolence ont été annotés. Les alertes de chaque détecteur
+ne dépendent que de ses propres paramètres : les alertes yeux fermés sont
+calculées pour toutes les paires (seuil EAR, durée) en une passe NumPy,
+de même pour la tête baissée, et le balancement de tête (état plus riche)
+est rejoué avec HeadMovementDetector pour chaque paire (seuil, nombre de
+mouvements). Les combinaisons complètes sont ensuite évaluées par
+fusion de ces listes. Les sessions sont réparties sur un pool de processus.
+
+Règles (identiques au DrowsinessEngine) : une alerte yeux fermés / tête
+baissée part quand la durée dépasse le minimum, une seule fois par
+événement ; la perte du visage désactive les alertes mais ne remet pas à
+zéro le début de l'événement. Seuls les déclenchements comptent (pas les
+passages en mode sirène).
+
+Annotations (--labels, JSON) : {"nom_du_fichier": [[début, fin], ...]} en
+secondes depuis le début de la session. Une alerte est juste si elle tombe
+dans un intervalle (jusqu'à --grace secondes après sa fin). Rappel :
+intervalles avec au moins une alerte ; latence : première alerte de
+l'intervalle - début de l'intervalle.
+
+Usage :
+    python calibration.py recordings/*.lmk --labels labels.json \\
+        --ear-threshold 0.19:0.27:0.02 --min-closed-seconds 1.0 1.5 2.0 \\
+        --head-down-threshold -20 -15 -10 --output calibration.csv
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from drowsiness_engine import (
+    EAR_THRESHOLD, MIN_CLOSED_SECONDS, HEAD_DOWN_THRESHOLD, HEAD_DOWN_DURATION,
+    HEAD_MOVEMENT_THRESHOLD, MIN_HEAD_MOVEMENTS, HeadMovementDetector
+)
+from landmark_recording import LandmarkRecording, RECORDING_SUFFIX
+
+
+GRACE_SECONDS = 2.0        # alerte encore comptée juste après la fin d'un intervalle
+TOP_RESULTS = 15           # lignes affichées (le fichier --output contient tout)
+
+PARAMETERS = (
+    ("ear_threshold", EAR_THRESHOLD),
+    ("min_closed_seconds", MIN_CLOSED_SECONDS),
+    ("head_down_threshold", HEAD_DOWN_THRESHOLD),
+    ("head_down_duration", HEAD_DOWN_DURATION),
+    ("head_movement_threshold", HEAD_MOVEMENT_THRESHOLD),
+    ("min_head_movements", MIN_HEAD_MOVEMENTS),
+)
+
+
+# ----------------------------------------------------------------------
+# Sessions
+# ----------------------------------------------------------------------
+
+def load_session(path):
+    """Frames avec visage d'une session : dict t (depuis le début), ear, pitch, yaw,
+    after_loss (première frame après une perte du visage), duration"""
+    if path.endswith(RECORDING_SUFFIX):
+        recording = LandmarkRecording(path)
+        t = np.array(recording.timestamps, dtype=np.float64)
+        face = recording.face_mask()
+        features = recording.features()
+        ear, pitch, yaw = features["ear"], features["pitch"], features["yaw"]
+    else:
+        # *_metrics.csv du mode batch
+        rows = []
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                face_row = row["face"] == "1"
+                rows.append((float(row["video_time"]), face_row,
+                             float(row["ear"]) if face_row else np.nan,
+                             float(row["pitch"]) if face_row else np.nan,
+                             float(row["yaw"]) if face_row else np.nan))
+        data = np.array(rows, dtype=np.float64).reshape(-1, 5)
+        t, face = data[:, 0], data[:, 1].astype(bool)
+        ear, pitch, yaw = data[:, 2], data[:, 3], data[:, 4]
+
+    start = t[0] if len(t) else 0.0
+    lost_before = np.r_[False, ~face[:-1]] if len(face) else face
+    return {
+        "t": t[face] - start,
+        "ear": ear[face],
+        "pitch": pitch[face],
+        "yaw": yaw[face],
+        "after_loss": lost_before[face],
+        "duration": float(t[-1] - start) if len(t) else 0.0,
+    }
+
+
+# ----------------------------------------------------------------------
+# Alertes par détecteur
+# ----------------------------------------------------------------------
+
+def duration_alerts(t, values, thresholds, min_durations, after_loss):
+    """Alertes « valeur sous le seuil depuis au moins min_duration », toutes paires en une passe.
+
+    Retourne {(seuil, durée): tableau des dates d'alerte}.
+    """
+    frames = len(t)
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    min_durations = np.asarray(min_durations, dtype=np.float64)
+    if frames == 0:
+        return {(a, d): np.empty(0) for a in thresholds.tolist() for d in min_durations.tolist()}
+
+    below = values[None, :] < thresholds[:, None]                       # (A, F)
+    starts = below & ~np.c_[np.zeros((len(thresholds), 1), bool), below[:, :-1]]
+    start_index = np.maximum.accumulate(np.where(starts, np.arange(frames), 0), axis=1)
+    elapsed = t[None, :] - t[start_index]                               # (A, F)
+
+    alerts = {}
+    for j, min_duration in enumerate(min_durations.tolist()):
+        triggered = below & (elapsed >= min_duration)                   # (A, F)
+        previous = np.c_[np.zeros((len(thresholds), 1), bool), triggered[:, :-1]]
+        # Nouvelle alerte : début du dépassement, ou retour du visage (alerte désactivée)
+        fired = triggered & (~previous | after_loss[None, :])
+        for i, threshold in enumerate(thresholds.tolist()):
+            alerts[(threshold, min_duration)] = t[fired[i]]
+    return alerts
+
+
+def head_movement_alerts(t, pitch, yaw, after_loss, thresholds, min_movements):
+    """Alertes de balancement pour chaque paire (seuil d'angle, nombre de mouvements)"""
+    times, pitches, yaws = t.tolist(), pitch.tolist(), yaw.tolist()
+    losses = after_loss.tolist()
+    alerts = {}
+    for threshold, movements in itertools.product(thresholds, min_movements):
+        detector = HeadMovementDetector(threshold=threshold, min_movements=movements)
+        fired = []
+        active = False
+        for now, p, y, lost in zip(times, pitches, yaws, losses):
+            detector.update(p, y, now)
+            drowsy = detector.is_drowsy_head_movement(now)
+            if drowsy and (not active or lost):
+                fired.append(now)
+            active = drowsy
+        alerts[(threshold, movements)] = np.array(fired)
+    return alerts
+
+
+# ----------------------------------------------------------------------
+# Évaluation
+# ----------------------------------------------------------------------
+
+def _score(alert_times, intervals, grace):
+    """(alertes, alertes justes, latences par intervalle (NaN si manqué))"""
+    if len(intervals) == 0:
+        return len(alert_times), 0, np.empty(0)
+    starts, ends = intervals[:, 0], intervals[:, 1] + grace
+    # Intervalle qui contient chaque alerte (intervalles triés, sans chevauchement)
+    k = np.searchsorted(starts, alert_times, side="right") - 1
+    inside = (k >= 0) & (alert_times <= ends[np.maximum(k, 0)])
+    latencies = np.full(len(intervals), np.nan)
+    hit = k[inside]
+    if len(hit):
+        # Première alerte de chaque intervalle (alert_times trié)
+        first = np.unique(hit, return_index=True)
+        latencies[first[0]] = alert_times[inside][first[1]] - starts[first[0]]
+    return len(alert_times), int(inside.sum()), latencies
+
+
+def evaluate_session(path, intervals, grid, grace=GRACE_SECONDS):
+    """Évalue toutes les combinaisons de la grille sur une session (exécuté dans un worker).
+
+    Retourne (nombre d'alertes (C,), alertes justes (C,), latences (C, intervalles), durée).
+    """
+    session = load_session(path)
+    t, after_loss = session["t"], session["after_loss"]
+    intervals = np.array(sorted(intervals), dtype=np.float64).reshape(-1, 2)
+
+    eyes = duration_alerts(t, session["ear"], grid["ear_threshold"],
+                           grid["min_closed_seconds"], after_loss)
+    head_down = duration_alerts(t, session["pitch"], grid["head_down_threshold"],
+                                grid["head_down_duration"], after_loss)
+    head = head_movement_alerts(t, session["pitch"], session["yaw"], after_loss,
+                                grid["head_movement_threshold"], grid["min_head_movements"])
+
+    combinations = list(itertools.product(*(grid[name] for name, _ in PARAMETERS)))
+    alerts = np.zeros(len(combinations), dtype=np.int64)
+    correct = np.zeros(len(combinations), dtype=np.int64)
+    latencies = np.full((len(combinations), len(intervals)), np.nan)
+    for c, (ear_t, closed_s, down_t, down_s, move_t, moves) in enumerate(combinations):
+        times = np.sort(np.concatenate((eyes[(ear_t, closed_s)], head_down[(down_t, down_s)],
+                                        head[(move_t, moves)])))
+        alerts[c], correct[c], latencies[c] = _score(times, intervals, grace)
+    return alerts, correct, latencies, session["duration"]
+
+
+def sweep(sessions, labels, grid, workers=None, grace=GRACE_SECONDS):
+    """Répartit les sessions sur un pool de processus, retourne les lignes de résultats"""
+    combinations = list(itertools.product(*(grid[name] for name, _ in PARAMETERS)))
+    alerts = np.zeros(len(combinations), dtype=np.int64)
+    correct = np.zeros(len(combinations), dtype=np.int64)
+    latencies = []
+    duration = 0.0
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            path: pool.submit(evaluate_session, path, labels.get(os.path.basename(path), []),
+                              grid, grace)
+            for path in sessions
+        }
+        for path, future in futures.items():
+            try:
+                session_alerts, session_correct, session_latencies, session_duration = future.result()
+            except (OSError, ValueError, KeyError) as e:
+                print(f"❌ {path}: {e}")
+                continue
+            alerts += session_alerts
+            correct += session_correct
+            latencies.append(session_latencies)
+            duration += session_duration
+
+    latencies = np.concatenate(latencies, axis=1) if latencies else np.empty((len(combinations), 0))
+    intervals = latencies.shape[1]
+    detected = np.sum(~np.isnan(latencies), axis=1)
+    hours = duration / 3600.0
+
+    rows = []
+    for c, values in enumerate(combinations):
+        precision = correct[c] / alerts[c] if alerts[c] else 0.0
+        recall = detected[c] / intervals if intervals else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        detected_latencies = latencies[c][~np.isnan(latencies[c])]
+        row = dict(zip((name for name, _ in PARAMETERS), values))
+        row.update({
+            "alerts": int(alerts[c]),
+            "precision": round(float(precision), 3),
+            "recall": round(float(recall), 3),
+            "f1": round(float(f1), 3),
+            "latency_median": round(float(np.median(detected_latencies)), 2) if len(detected_latencies) else None,
+            "latency_p90": round(float(np.percentile(detected_latencies, 90)), 2) if len(detected_latencies) else None,
+            "false_alerts_per_hour": round((alerts[c] - correct[c]) / hours, 2) if hours > 0 else None,
+        })
+        rows.append(row)
+    rows.sort(key=lambda r: (-r["f1"], r["latency_median"] if r["latency_median"] is not None else float("inf")))
+    return rows, {"sessions": len(sessions), "intervals": intervals, "hours": round(hours, 2)}
+
+
+# ----------------------------------------------------------------------
+# Ligne de commande
+# ----------------------------------------------------------------------
+
+def parse_values(values):
+    """["0.19:0.27:0.02"] -> [0.19, 0.21, 0.23, 0.25, 0.27] ; ["1", "1.5"] -> [1.0, 1.5]"""
+    parsed = []
+    for value in values:
+        if ":" in value:
+            start, stop, step = (float(v) for v in value.split(":"))
+            count = int(round((stop - start) / step)) + 1
+            parsed.extend(round(start + i * step, 6) for i in range(count))
+        else:
+            parsed.append(float(value))
+    return sorted(set(parsed))
+
+
+def print_table(rows, limit=TOP_RESULTS):
+    header = (f"{'EAR':>6} {'ferm.s':>6} {'pitch':>6} {'bais.s':>6} {'angle':>6} {'mvts':>4} "
+              f"{'alertes':>7} {'préc.':>6} {'rappel':>6} {'F1':>6} {'lat.méd':>7} {'lat.p90':>7} {'faux/h':>7}")
+    print(header)
+    print("-" * len(header))
+
+    def fmt(value, spec):
+        return format(value, spec) if value is not None else format("-", spec.lstrip("+").split(".")[0] + "s")
+
+    for r in rows[:limit]:
+        print(f"{r['ear_threshold']:>6.3f} {r['min_closed_seconds']:>6.2f} {r['head_down_threshold']:>6.1f} "
+              f"{r['head_down_duration']:>6.2f} {r['head_movement_threshold']:>6.1f} "
+              f"{int(r['min_head_movements']):>4d} {r['alerts']:>7d} {r['precision']:>6.3f} "
+              f"{r['recall']:>6.3f} {r['f1']:>6.3f} {fmt(r['latency_median'], '>7.2f')} "
+              f"{fmt(r['latency_p90'], '>7.2f')} {fmt(r['false_alerts_per_hour'], '>7.2f')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Balayage des seuils de détection sur des sessions annotées")
+    parser.add_argument("sessions", nargs="+", help="Enregistrements .lmk et/ou *_metrics.csv du mode batch")
+    parser.add_argument("--labels", required=True, help="JSON {fichier: [[début, fin], ...]} (secondes)")
+    for name, default in PARAMETERS:
+        parser.add_argument(f"--{name.replace('_', '-')}", nargs="+", default=[str(default)],
+                            help=f"valeurs ou début:fin:pas (défaut: {default})")
+    parser.add_argument("--grace", type=float, default=GRACE_SECONDS,
+                        help="alerte comptée juste jusqu'à N s après la fin d'un intervalle")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="Nombre de processus (défaut: nombre de coeurs)")
+    parser.add_argument("-o", "--output", help="Toutes les combinaisons (.csv ou .json)")
+    parser.add_argument("--top", type=int, default=TOP_RESULTS)
+    args = parser.parse_args()
+
+    with open(args.labels, "r", encoding="utf-8") as f:
+        labels = json.load(f)
+    for path in args.sessions:
+        if os.path.basename(path) not in labels:
+            print(f"⚠️ Pas d'annotation pour {path} : aucune somnolence supposée")
+
+    grid = {name: parse_values(getattr(args, name)) for name, _ in PARAMETERS}
+    grid["min_head_movements"] = [int(v) for v in grid["min_head_movements"]]
+    total = int(np.prod([len(values) for values in grid.values()]))
+    print(f"🎛️  {total} combinaisons sur {len(args.sessions)} session(s)")
+
+    started = time.perf_counter()
+    rows, summary = sweep(args.sessions, labels, grid, args.workers, args.grace)
+    print(f"✅ {summary['sessions']} sessions, {summary['hours']} h, {summary['intervals']} intervalles "
+          f"annotés — {time.perf_counter() - started:.1f}s\n")
+    print_table(rows, args.top)
+
+    if args.output:
+        if args.output.endswith(".json"):
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump({"summary": summary, "grid": grid, "results": rows}, f, ensure_ascii=False, indent=2)
+        else:
+            with open(args.output, "w", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+                writer.writeheader()
+                writer.writerows(rows)
+        print(f"\n💾 Résultats: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Capture vidéo sur un thread dédié
+Pour que la détection analyse toujours l'image la plus récente, sans retard accumulé
+
+Module léger (OpenCV seulement) : les processus de multi_camera.py
+l'importent sans charger l'audio, le dashboard ni le HUD de main.py.
+"""
+
+import threading
+import time
+
+import cv2
+
+
+CAPTURE_READ_TIMEOUT = 2.0      # attente max d'une nouvelle frame avant de considérer le flux perdu
+
+
+class FrameGrabber:
+    """Capture la caméra sur un thread dédié et ne garde que la frame la plus récente.
+
+    La boucle de détection lit toujours la dernière image disponible : si
+    FaceMesh est lent, les frames intermédiaires sont écrasées (et comptées)
+    au lieu de s'accumuler dans le buffer de la caméra.
+    """
+    def __init__(self, cap):
+        self.cap = cap
+        self.condition = threading.Condition()
+        self.frame = None
+        self.frame_time = 0.0
+        self.frame_id = 0
+        self.last_read_id = 0
+        self.running = False
+        self.ended = False
+        self.thread = None
+
+        # Compteurs
+        self.frames_captured = 0
+        self.frames_dropped = 0   # frames écrasées sans avoir été traitées
+
+        # Limiter le buffer interne du driver (ignoré si non supporté)
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+    def start(self):
+        """Démarre le thread de capture"""
+        if self.running:
+            return self
+        self.running = True
+        self.thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self.thread.start()
+        return self
+
+    def _capture_loop(self):
+        while self.running:
+            ret, frame = self.cap.read()
+            now = time.time()
+            with self.condition:
+                if not ret:
+                    self.ended = True
+                    self.condition.notify_all()
+                    break
+                if self.frame_id > self.last_read_id:
+                    self.frames_dropped += 1
+                self.frame = frame
+                self.frame_time = now
+                self.frame_id += 1
+                self.frames_captured += 1
+                self.condition.notify_all()
+
+    def read(self, timeout=CAPTURE_READ_TIMEOUT):
+        """Attend une frame plus récente que la dernière lue.
+
+        Retourne (ok, frame, timestamp_capture). ok=False si le flux est
+        terminé ou si aucune frame n'arrive avant le timeout.
+        """
+        with self.condition:
+            got_frame = self.condition.wait_for(
+                lambda: self.frame_id > self.last_read_id or self.ended,
+                timeout=timeout
+            )
+            if not got_frame or self.frame_id <= self.last_read_id:
+                return False, None, 0.0
+            self.last_read_id = self.frame_id
+            return True, self.frame, self.frame_time
+
+    def wait_first_frame(self, timeout=CAPTURE_READ_TIMEOUT):
+        """Attend la première frame sans la consommer (True si elle est arrivée)"""
+        with self.condition:
+            return self.condition.wait_for(lambda: self.frame_id > 0 or self.ended,
+                                           timeout=timeout) and self.frame_id > 0
+
+    def get_stats(self):
+        """Retourne (frames capturées, frames perdues)"""
+        with self.condition:
+            return self.frames_captured, self.frames_dropped
+
+    def stop(self):
+        """Arrête le thread de capture"""
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
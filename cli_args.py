@@ -0,0 +1,20 @@
+"""
+Types d'arguments de ligne de commande partagés
+Pour que app.py et main.py valident les options de la même façon
+
+Module sans dépendance : le lanceur l'importe sans charger OpenCV ni la
+détection avant d'avoir démarré le serveur.
+"""
+
+import argparse
+
+
+def positive_fps(value):
+    """Type argparse : cadence en images/s, strictement positive"""
+    try:
+        fps = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"nombre attendu : {value!r}")
+    if not fps > 0:
+        raise argparse.ArgumentTypeError(f"doit être > 0 : {value}")
+    return fps
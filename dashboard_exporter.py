@@ -4,23 +4,210 @@ Pour intégration avec le dashboard frontend
 
 Ce module est importé par le backend (sleep_detection_2_test.py)
 et exporte automatiquement toutes les données en temps réel
+
+Les écritures disque sont faites par un thread d'arrière-plan : la boucle
+de détection ne fait que déposer le dernier état de chaque fichier, et les
+mises à jour arrivées entre deux écritures sont fusionnées (seule la plus
+récente est écrite). Chaque fichier est écrit dans un fichier temporaire
+puis renommé, le serveur ne lit donc jamais un JSON à moitié écrit.
+
+Quand c'est possible, les mêmes données passent aussi par le canal local
+de dashboard_ipc (mémoire partagée + socket Unix) : le serveur les lit
+sans toucher au disque. Les fichiers JSON restent la trace de la session
+et le repli quand le canal n'est pas disponible.
 """
 
 import json
 import os
+import threading
+import time
 from datetime import datetime
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
+
+import dashboard_ipc
+from event_log import LOG_DIR, EventLogWriter
+from timeseries_store import HISTORY_DIR, TimeSeriesWriter
+
+
+WRITE_RATE = 10.0          # écritures max par seconde (par fichier)
+WRITE_RETRIES = 3          # renommage refusé (fichier ouvert par le serveur sous Windows)
+CLOSE_TIMEOUT = 2.0        # attente max du dernier flush à la fermeture
+
+
+class BackgroundJsonWriter:
+    """Écrit des fichiers JSON depuis un thread dédié, en fusionnant les mises à jour.
+
+    Les ajouts aux journaux (append) ne sont jamais fusionnés : ils sont
+    écrits dans l'ordre, par le même thread. Les tâches (run) passent avant
+    eux : travail disque qui ne doit pas bloquer la boucle de détection.
+    """
+    
+    def __init__(self, output_dir: str, write_rate: float = WRITE_RATE):
+        self.output_dir = output_dir
+        self.min_interval = 1.0 / write_rate if write_rate > 0 else 0.0
+        self.pending: Dict[str, Any] = {}
+        self.appends: List[Any] = []   # (journal, événement)
+        self.tasks: List[Any] = []     # fonctions sans argument
+        self.condition = threading.Condition()
+        self.running = True
+        self.writing = False
+        
+        # Compteurs
+        self.submitted = 0
+        self.written = 0
+        self.merged = 0    # mises à jour remplacées par une plus récente avant écriture
+        self.dropped = 0   # mises à jour perdues (erreur d'écriture ou fermeture)
+        
+        self.thread = threading.Thread(target=self._run, name="dashboard-writer", daemon=True)
+        self.thread.start()
+    
+    def submit(self, filename: str, data: Any):
+        """Dépose le nouvel état d'un fichier (ne touche jamais le disque)"""
+        with self.condition:
+            if filename in self.pending:
+                self.merged += 1
+            self.pending[filename] = data
+            self.submitted += 1
+            self.condition.notify()
+    
+    def append(self, log, entry: Dict[str, Any]):
+        """Dépose un événement à ajouter à un journal (EventLogWriter)"""
+        with self.condition:
+            self.appends.append((log, entry))
+            self.submitted += 1
+            self.condition.notify()
+    
+    def run(self, task):
+        """Dépose une tâche (fonction sans argument) à exécuter sur le thread d'écriture"""
+        with self.condition:
+            self.tasks.append(task)
+            self.condition.notify()
+    
+    def _run(self):
+        while True:
+            with self.condition:
+                while self.running and not self.pending and not self.appends and not self.tasks:
+                    self.condition.wait()
+                if not self.pending and not self.appends and not self.tasks:
+                    return
+                batch, self.pending = self.pending, {}
+                appends, self.appends = self.appends, []
+                tasks, self.tasks = self.tasks, []
+                self.writing = True
+            
+            start = time.monotonic()
+            for task in tasks:
+                try:
+                    task()
+                except Exception as e:
+                    print(f"⚠️ Erreur tâche d'écriture: {e}")
+            for log, entry in appends:
+                self._append(log, entry)
+            for filename, data in batch.items():
+                self._write_file(filename, data)
+            
+            with self.condition:
+                self.writing = False
+                self.condition.notify_all()
+                running = self.running
+            
+            # Limite la fréquence d'écriture : ce qui arrive entre-temps est fusionné
+            if running:
+                remaining = self.min_interval - (time.monotonic() - start)
+                if remaining > 0:
+                    time.sleep(remaining)
+    
+    def _write_file(self, filename: str, data: Any):
+        path = os.path.join(self.output_dir, filename)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            for attempt in range(WRITE_RETRIES):
+                try:
+                    os.replace(tmp_path, path)
+                    break
+                except PermissionError:
+                    if attempt == WRITE_RETRIES - 1:
+                        raise
+                    time.sleep(0.01)
+            self.written += 1
+        except Exception as e:
+            self.dropped += 1
+            print(f"⚠️ Erreur export {filename}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+    
+    def _append(self, log, entry: Dict[str, Any]):
+        try:
+            log.append(entry)
+            self.written += 1
+        except Exception as e:
+            self.dropped += 1
+            print(f"⚠️ Erreur journal {log.name}: {e}")
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Attend que tout l'état déposé soit écrit (False si délai dépassé)"""
+        with self.condition:
+            return self.condition.wait_for(
+                lambda: (not self.pending and not self.appends and not self.tasks
+                         and not self.writing), timeout
+            )
+    
+    def close(self, timeout: float = CLOSE_TIMEOUT):
+        """Écrit ce qui reste en attente puis arrête le thread"""
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        self.thread.join(timeout)
+        with self.condition:
+            # Thread bloqué sur le disque : ce qui n'a pas été écrit est perdu
+            self.dropped += len(self.pending) + len(self.appends)
+            self.pending.clear()
+            self.appends.clear()
+            self.tasks.clear()
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Compteurs d'écriture (déposées, écrites, fusionnées, perdues)"""
+        with self.condition:
+            return {
+                "submitted": self.submitted,
+                "written": self.written,
+                "merged": self.merged,
+                "dropped": self.dropped
+            }
 
 
 class DashboardExporter:
     """Exporte les données de détection vers fichiers JSON pour le dashboard"""
     
-    def __init__(self):
+    def __init__(self, output_dir: str = ".", write_rate: float = WRITE_RATE, ipc: bool = True,
+                 history: bool = True):
+        self.output_dir = output_dir
+        os.makedirs(output_dir, exist_ok=True)
+        self.writer = BackgroundJsonWriter(output_dir, write_rate)
+        # Historique par frame (fichiers projetés en mémoire, voir timeseries_store.py)
+        # Chunk suivant préparé par le thread d'écriture, jamais par la boucle de détection
+        self.history = (TimeSeriesWriter(os.path.join(output_dir, HISTORY_DIR), schedule=self.writer.run)
+                        if history else None)
+        # Journaux complets des messages et alertes (JSONL, ajout seul)
+        self.dialogue_events = EventLogWriter(os.path.join(output_dir, LOG_DIR), "dialogue")
+        self.alert_events = EventLogWriter(os.path.join(output_dir, LOG_DIR), "alerts")
+        self.realtime_block = None
+        self.events = None
+        if ipc:
+            self._open_ipc()
         self.session_start = datetime.now()
         self.total_blinks = 0
         self.total_alerts = 0
-        self.dialogue_log = []
-        self.alert_history = []
+        
+        # Agrégats de toute la session (le détail est dans les journaux ci-dessus)
+        self.alerts_by_level = {"1": 0, "2": 0, "3": 0}
+        self.alerts_by_type: Dict[str, int] = {}
+        self.messages_by_severity = {"info": 0, "warning": 0, "critical": 0}
+        self.alerts_per_minute: Dict[str, Dict[str, int]] = {}
         
         # Initialiser fichiers JSON vides
         self._init_files()
@@ -56,16 +243,33 @@ class DashboardExporter:
         
         self._write_json("realtime_data.json", default_realtime)
         self._write_json("session_report.json", default_session)
-        self._write_json("dialogue_log.json", [])
-        self._write_json("alert_history.json", [])
+        self._write_alert_stats()
+        # Le serveur trouve des fichiers valides dès le démarrage
+        self.writer.flush()
     
-    def _write_json(self, filename: str, data: Any):
-        """Écrit données JSON de manière sécurisée"""
+    def _open_ipc(self):
+        """Ouvre le canal local vers le serveur (sinon : fichiers JSON seuls)"""
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            self.realtime_block = dashboard_ipc.RealtimeBlock()
         except Exception as e:
-            print(f"⚠️ Erreur export {filename}: {e}")
+            print(f"⚠️ Mémoire partagée indisponible ({e}), export fichiers uniquement")
+        if dashboard_ipc.EVENTS_AVAILABLE:
+            try:
+                self.events = dashboard_ipc.EventPublisher()
+            except Exception as e:
+                print(f"⚠️ Socket événements indisponible ({e}), export fichiers uniquement")
+    
+    def _close_ipc(self):
+        if self.realtime_block is not None:
+            self.realtime_block.close()
+            self.realtime_block = None
+        if self.events is not None:
+            self.events.close()
+            self.events = None
+    
+    def _write_json(self, filename: str, data: Any):
+        """Dépose les données pour le thread d'écriture (non bloquant)"""
+        self.writer.submit(filename, data)
     
     def update_realtime(self, 
                        ear: float,
@@ -81,7 +285,8 @@ class DashboardExporter:
                        head_alert_active: bool,
                        head_down_alert_active: bool,
                        eyes_continuous_mode: bool,
-                       head_continuous_mode: bool):
+                       head_continuous_mode: bool,
+                       perclos_windows: Optional[Dict[float, float]] = None):
         """Met à jour les données temps réel"""
         
         # Déterminer niveau alerte
@@ -115,26 +320,36 @@ class DashboardExporter:
             "eyes_continuous_mode": eyes_continuous_mode,
             "head_continuous_mode": head_continuous_mode
         }
+        if perclos_windows:
+            # PERCLOS des fenêtres longues, clé = durée de la fenêtre en secondes
+            realtime_data["perclos_windows"] = {
+                str(int(window)): round(value * 100, 1) for window, value in perclos_windows.items()
+            }
         
+        if self.realtime_block is not None:
+            self.realtime_block.write_realtime(realtime_data)
+        if self.history is not None:
+            self.history.append(time.time(), ear, realtime_data["perclos"], pitch, yaw, alert_level)
         self._write_json("realtime_data.json", realtime_data)
     
-    def add_message(self, message: str, severity: str = "info"):
+    def add_message(self, message: str, severity: str = "info", stream_id: Optional[str] = None):
         """Ajoute un message au log dialogue"""
         entry = {
             "timestamp": datetime.now().isoformat(),
             "message": message,
             "severity": severity
         }
+        if stream_id is not None:
+            entry["stream"] = stream_id
         
-        self.dialogue_log.append(entry)
+        self.messages_by_severity[severity] = self.messages_by_severity.get(severity, 0) + 1
         
-        # Garder seulement les 50 derniers messages
-        if len(self.dialogue_log) > 50:
-            self.dialogue_log = self.dialogue_log[-50:]
-        
-        self._write_json("dialogue_log.json", self.dialogue_log)
+        if self.events is not None:
+            self.events.publish("dialogue", entry)
+        self.writer.append(self.dialogue_events, entry)
+        self._write_alert_stats()
     
-    def add_alert(self, alert_type: str, level: int, duration: float):
+    def add_alert(self, alert_type: str, level: int, duration: float, stream_id: Optional[str] = None):
         """Ajoute une alerte à l'historique"""
         entry = {
             "timestamp": datetime.now().isoformat(),
@@ -142,15 +357,46 @@ class DashboardExporter:
             "level": level,
             "duration": round(duration, 1)
         }
+        if stream_id is not None:
+            entry["stream"] = stream_id
         
-        self.alert_history.append(entry)
         self.total_alerts += 1
         
-        # Garder seulement les 100 dernières alertes
-        if len(self.alert_history) > 100:
-            self.alert_history = self.alert_history[-100:]
+        # Agrégats mis à jour à chaque alerte, jamais recalculés
+        level_key = str(level)
+        self.alerts_by_level[level_key] = self.alerts_by_level.get(level_key, 0) + 1
+        self.alerts_by_type[alert_type] = self.alerts_by_type.get(alert_type, 0) + 1
+        minute = entry["timestamp"][:16]   # AAAA-MM-JJTHH:MM
+        bucket = self.alerts_per_minute.setdefault(minute, {})
+        bucket[level_key] = bucket.get(level_key, 0) + 1
         
-        self._write_json("alert_history.json", self.alert_history)
+        if self.events is not None:
+            self.events.publish("alert", entry)
+        self.writer.append(self.alert_events, entry)
+        self._write_alert_stats()
+    
+    def _write_alert_stats(self):
+        """Exporte les agrégats d'alertes et de messages de la session"""
+        self._write_json("alert_stats.json", {
+            "total_alerts": self.total_alerts,
+            "alerts_by_level": dict(self.alerts_by_level),
+            "alerts_by_type": dict(self.alerts_by_type),
+            "messages_by_severity": dict(self.messages_by_severity),
+            "alerts_per_minute": {minute: dict(bucket) for minute, bucket in self.alerts_per_minute.items()}
+        })
+    
+    def update_streams(self, streams: Dict[str, Dict[str, Any]]):
+        """Met à jour l'état de chaque flux (mode multi-caméras)"""
+        self._write_json("streams_data.json", {
+            "last_update": datetime.now().isoformat(),
+            "streams": {stream_id: dict(stream) for stream_id, stream in streams.items()}
+        })
+    
+    def update_perf(self, perf: Dict[str, Any]):
+        """Met à jour les temps par étape de la boucle (PerfTimer.snapshot())"""
+        perf = dict(perf)
+        perf["last_update"] = datetime.now().isoformat()
+        self._write_json("perf_data.json", perf)
     
     def increment_blink(self):
         """Incrémente le compteur de clignements"""
@@ -169,6 +415,8 @@ class DashboardExporter:
             "last_update": datetime.now().isoformat()
         }
         
+        if self.realtime_block is not None:
+            self.realtime_block.write_session(session_data)
         self._write_json("session_report.json", session_data)
     
     def finalize(self, perclos_avg: float):
@@ -182,7 +430,23 @@ class DashboardExporter:
             "info"
         )
         
+        self._close_ipc()
+        self.writer.close()
+        # Après le thread d'écriture : plus aucune préparation de chunk en cours
+        if self.history is not None:
+            self.history.close()
+        self.dialogue_events.close()
+        self.alert_events.close()
+        stats = self.writer.get_stats()
+        
         print(f"\n📊 Export terminé:")
         print(f"   - Clignements: {self.total_blinks}")
         print(f"   - Alertes: {self.total_alerts}")
-        print(f"   - Messages: {len(self.dialogue_log)}")
+        # Journaux fermés : toutes les écritures en attente sont comptées
+        print(f"   - Messages: {self.dialogue_events.appended}")
+        print(f"   - Écritures: {stats['written']} "
+              f"(fusionnées: {stats['merged']}, perdues: {stats['dropped']})")
+    
+    def get_write_stats(self) -> Dict[str, int]:
+        """Compteurs du thread d'écriture"""
+        return self.writer.get_stats()
@@ -0,0 +1,429 @@
+"""
+Canal local entre la détection et le serveur du dashboard
+Pour que le dashboard lise les valeurs temps réel sans passer par le disque
+
+Deux canaux :
+- un bloc de mémoire partagée à format fixe pour les valeurs temps réel et
+  la session. Un compteur de séquence (impair pendant l'écriture) permet
+  au lecteur de détecter une lecture faite pendant une mise à jour et de
+  recommencer, sans verrou entre les processus.
+- un socket Unix pour les événements (messages du dialogue, alertes). À la
+  connexion, le serveur reçoit l'historique récent puis chaque nouvel
+  événement, une ligne JSON par événement.
+
+La détection crée les deux canaux, le serveur s'y attache quand ils
+existent. Un canal laissé par une détection qui a planté est repris ; un
+canal encore utilisé par une autre détection (battement du bloc récent,
+socket qui accepte les connexions) ne l'est jamais : la seconde détection
+passe alors sur les fichiers JSON. Sans socket Unix (Windows) ou sans
+mémoire partagée, le dashboard continue aussi à lire les fichiers JSON.
+"""
+
+import json
+import os
+import queue
+import socket
+import struct
+import tempfile
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from multiprocessing import shared_memory
+
+
+SHM_NAME = "detect_face_realtime"
+SOCKET_PATH = os.path.join(tempfile.gettempdir(), "detect_face_events.sock")
+EVENTS_AVAILABLE = hasattr(socket, "AF_UNIX")
+
+DIALOGUE_HISTORY = 50      # même taille que dialogue_log.json
+ALERT_HISTORY = 100        # même taille que alert_history.json
+EVENT_QUEUE_SIZE = 1000    # événements en attente d'envoi (au-delà : perdus)
+SEND_TIMEOUT = 0.5         # client trop lent -> déconnecté
+RECONNECT_DELAY = 1.0      # attente entre deux tentatives de connexion (serveur)
+STALE_SECONDS = 2.0        # bloc non mis à jour depuis -> on tente de s'y rattacher
+READ_RETRIES = 100         # lectures successives pendant une écriture avant abandon
+HEARTBEAT_INTERVAL = 1.0   # battement du bloc par la détection propriétaire (secondes)
+BLOCK_STALE_SECONDS = 5.0  # bloc sans battement depuis -> détection morte, bloc repris
+
+# Format du bloc partagé
+MAGIC = b"DFRT"
+LAYOUT_VERSION = 1
+MAX_PERCLOS_WINDOWS = 4
+STATUS_BYTES = 128
+
+_HEADER = struct.Struct("<4sIQII")   # magic, version, séquence, fermé, battement (epoch s)
+_HEARTBEAT_OFFSET = 20
+_REALTIME = struct.Struct(
+    "<d"        # date de mise à jour (epoch)
+    "7d"        # ear, perclos, blink_rate, pitch, yaw, eyes_closed_duration, head_down_duration
+    "iiI"       # head_movements, alert_level, drapeaux
+    f"I{2 * MAX_PERCLOS_WINDOWS}d"   # nombre de fenêtres PERCLOS, (fenêtre, valeur) x N
+    f"{STATUS_BYTES}s"
+)
+_SESSION = struct.Struct("<ddiidd")   # durée, début, clignements, alertes, perclos moyen, mise à jour
+_REALTIME_OFFSET = _HEADER.size
+_SESSION_OFFSET = _REALTIME_OFFSET + _REALTIME.size
+BLOCK_SIZE = _SESSION_OFFSET + _SESSION.size
+
+_FLOAT_FIELDS = ("ear", "perclos", "blink_rate", "pitch", "yaw",
+                 "eyes_closed_duration", "head_down_duration")
+_FLAG_FIELDS = ("head_drowsy", "eyes_alert_active", "head_alert_active",
+                "head_down_alert_active", "eyes_continuous_mode", "head_continuous_mode")
+
+
+def _unregister(shm):
+    """Le processus qui s'attache ne doit pas détruire le bloc en quittant (Python < 3.13)"""
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+
+
+def _pack_realtime(data):
+    flags = 0
+    for bit, name in enumerate(_FLAG_FIELDS):
+        if data.get(name):
+            flags |= 1 << bit
+    windows = list((data.get("perclos_windows") or {}).items())[:MAX_PERCLOS_WINDOWS]
+    window_values = []
+    for window, value in windows:
+        window_values += [float(window), float(value)]
+    window_values += [0.0] * (2 * MAX_PERCLOS_WINDOWS - len(window_values))
+    status = data.get("status", "").encode("utf-8")[:STATUS_BYTES]
+    return (time.time(), *(float(data.get(name, 0.0)) for name in _FLOAT_FIELDS),
+            int(data.get("head_movements", 0)), int(data.get("alert_level", 0)), flags,
+            len(windows), *window_values, status)
+
+
+def _unpack_realtime(values):
+    data = dict(zip(_FLOAT_FIELDS, values[1:8]))
+    data["head_movements"], data["alert_level"], flags = values[8:11]
+    for bit, name in enumerate(_FLAG_FIELDS):
+        data[name] = bool(flags & (1 << bit))
+    count = values[11]
+    windows = values[12:12 + 2 * MAX_PERCLOS_WINDOWS]
+    if count:
+        data["perclos_windows"] = {
+            str(int(windows[2 * i])): windows[2 * i + 1] for i in range(count)
+        }
+    # Statut tronqué au milieu d'un caractère : on ignore la fin
+    data["status"] = values[-1].rstrip(b"\0").decode("utf-8", errors="ignore")
+    data["updated_at"] = values[0]
+    return data
+
+
+def _block_in_use(shm):
+    """True si le bloc appartient à une détection vivante (non fermé, battement récent)"""
+    if shm.size < _HEADER.size:
+        return False
+    magic, version, _, closed, heartbeat = _HEADER.unpack_from(shm.buf, 0)
+    if magic != MAGIC or version != LAYOUT_VERSION or closed:
+        return False
+    return time.time() - heartbeat < BLOCK_STALE_SECONDS
+
+
+class RealtimeBlock:
+    """Bloc de mémoire partagée des valeurs temps réel (côté détection : écriture)"""
+
+    def __init__(self, name=SHM_NAME):
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=BLOCK_SIZE)
+        except FileExistsError:
+            # Repris seulement s'il a été laissé par une détection qui a planté
+            existing = shared_memory.SharedMemory(name=name)
+            in_use = _block_in_use(existing)
+            existing.close()
+            if in_use:
+                _unregister(existing)   # le bloc reste à son propriétaire
+                raise RuntimeError("bloc utilisé par une autre détection")
+            existing.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=BLOCK_SIZE)
+        self.buf = self.shm.buf
+        self.seq = 0
+        _HEADER.pack_into(self.buf, 0, MAGIC, LAYOUT_VERSION, 0, 0, int(time.time()))
+
+        # Battement indépendant des écritures (pas d'écriture tant qu'aucun visage n'est vu)
+        self.stopped = threading.Event()
+        self.heartbeat = threading.Thread(target=self._heartbeat_loop, name="realtime-heartbeat",
+                                          daemon=True)
+        self.heartbeat.start()
+
+    def _heartbeat_loop(self):
+        while not self.stopped.wait(HEARTBEAT_INTERVAL):
+            struct.pack_into("<I", self.buf, _HEARTBEAT_OFFSET, int(time.time()))
+
+    def _write(self, struct_, offset, values):
+        # Séquence impaire pendant l'écriture, paire quand le bloc est cohérent
+        self.seq += 1
+        struct.pack_into("<Q", self.buf, 8, self.seq)
+        struct_.pack_into(self.buf, offset, *values)
+        self.seq += 1
+        struct.pack_into("<Q", self.buf, 8, self.seq)
+
+    def write_realtime(self, data):
+        self._write(_REALTIME, _REALTIME_OFFSET, _pack_realtime(data))
+
+    def write_session(self, data):
+        self._write(_SESSION, _SESSION_OFFSET, (
+            float(data["duration_seconds"]),
+            datetime.fromisoformat(data["start_time"]).timestamp(),
+            int(data["total_blinks"]),
+            int(data["total_alerts"]),
+            float(data["average_perclos"]),
+            time.time()
+        ))
+
+    def close(self):
+        """Marque le bloc fermé (le serveur repasse sur les fichiers) puis le détruit"""
+        self.stopped.set()
+        self.heartbeat.join()
+        struct.pack_into("<I", self.buf, 16, 1)
+        self.buf = None
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class RealtimeReader:
+    """Lecture du bloc partagé (côté serveur), rattachement automatique"""
+
+    def __init__(self, name=SHM_NAME):
+        self.name = name
+        self.shm = None
+        self.last_attach = 0.0
+        self.last_seq = None
+        self.cache = None
+        self.lock = threading.Lock()
+
+    def _attach(self):
+        now = time.monotonic()
+        if now - self.last_attach < RECONNECT_DELAY:
+            return False
+        self.last_attach = now
+        try:
+            shm = shared_memory.SharedMemory(name=self.name)
+        except (FileNotFoundError, OSError):
+            return False
+        _unregister(shm)
+        magic, version = _HEADER.unpack_from(shm.buf, 0)[:2]
+        if shm.size < BLOCK_SIZE or magic != MAGIC or version != LAYOUT_VERSION:
+            shm.close()
+            return False
+        self.shm = shm
+        self.last_seq = None
+        return True
+
+    def _detach(self):
+        self.shm.close()
+        self.shm = None
+        self.cache = None
+
+    def _read_block(self):
+        """Dernier contenu cohérent du bloc (lecture sans verrou), None si fermé"""
+        buf = self.shm.buf
+        for _ in range(READ_RETRIES):
+            _, _, seq, closed, _ = _HEADER.unpack_from(buf, 0)
+            if closed:
+                self._detach()
+                return None
+            if seq == self.last_seq:
+                break
+            if seq % 2:
+                continue   # écriture en cours
+            realtime = _REALTIME.unpack_from(buf, _REALTIME_OFFSET)
+            session = _SESSION.unpack_from(buf, _SESSION_OFFSET)
+            if struct.unpack_from("<Q", buf, 8)[0] == seq:
+                self.cache = (realtime, session)
+                self.last_seq = seq
+                break
+        return self.cache
+
+    def read(self):
+        """(realtime, session) en dicts, ou None si aucune détection n'écrit dans le bloc"""
+        with self.lock:
+            if self.shm is None and not self._attach():
+                return None
+            block = self._read_block()
+            if block is not None and time.time() - block[0][0] > STALE_SECONDS:
+                # Détection arrêtée sans fermer le bloc, ou remplacée par une nouvelle
+                self._detach()
+                block = self._read_block() if self._attach() else None
+            if block is None or block[0][0] == 0.0:
+                return None
+            return self._to_dicts(*block)
+
+    @staticmethod
+    def _to_dicts(realtime, session):
+        duration, start, blinks, alerts, perclos_avg, updated = session
+        session_data = None
+        if start:
+            session_data = {
+                "duration_seconds": duration,
+                "total_blinks": blinks,
+                "total_alerts": alerts,
+                "average_perclos": perclos_avg,
+                "start_time": datetime.fromtimestamp(start).isoformat(),
+                "last_update": datetime.fromtimestamp(updated).isoformat()
+            }
+        return _unpack_realtime(realtime), session_data
+
+
+def _socket_in_use(path):
+    """True si une détection vivante écoute encore sur ce socket"""
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        probe.close()
+
+
+class EventPublisher:
+    """Diffuse les événements (dialogue, alertes) aux serveurs connectés (côté détection)"""
+
+    def __init__(self, path=SOCKET_PATH):
+        self.path = path
+        self.queue = queue.Queue(maxsize=EVENT_QUEUE_SIZE)
+        self.history = {"dialogue": deque(maxlen=DIALOGUE_HISTORY),
+                        "alert": deque(maxlen=ALERT_HISTORY)}
+        self.clients = []
+        self.dropped = 0
+
+        if os.path.exists(path):
+            if _socket_in_use(path):
+                raise RuntimeError("socket utilisé par une autre détection")
+            os.remove(path)   # socket laissé par une détection qui a planté
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(path)
+        self.server.listen()
+
+        threading.Thread(target=self._accept_loop, name="events-accept", daemon=True).start()
+        self.sender = threading.Thread(target=self._send_loop, name="events-send", daemon=True)
+        self.sender.start()
+
+    def publish(self, kind, entry):
+        """Non bloquant : l'événement est perdu si la file est pleine"""
+        try:
+            self.queue.put_nowait((kind, entry))
+        except queue.Full:
+            self.dropped += 1
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return   # socket fermé
+            conn.settimeout(SEND_TIMEOUT)
+            self.queue.put(("client", conn))
+
+    def _send_loop(self):
+        # Un seul thread gère l'historique et les envois : un nouveau client
+        # reçoit exactement l'historique qui précède les événements suivants
+        while True:
+            kind, payload = self.queue.get()
+            if kind == "stop":
+                break
+            if kind == "client":
+                snapshot = {"kind": "snapshot",
+                            "dialogue": list(self.history["dialogue"]),
+                            "alert": list(self.history["alert"])}
+                if self._send(payload, snapshot):
+                    self.clients.append(payload)
+                continue
+            self.history[kind].append(payload)
+            message = {"kind": kind, "entry": payload}
+            self.clients = [c for c in self.clients if self._send(c, message)]
+
+        for conn in self.clients:
+            conn.close()
+
+    @staticmethod
+    def _send(conn, message):
+        try:
+            conn.sendall((json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8"))
+            return True
+        except OSError:
+            conn.close()
+            return False
+
+    def close(self):
+        self.queue.put(("stop", None))
+        self.sender.join(SEND_TIMEOUT * 2)
+        # shutdown réveille le thread bloqué dans accept() (close seul ne suffit pas sous Linux)
+        try:
+            self.server.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.server.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class EventSubscriber:
+    """Reçoit les événements de la détection (côté serveur), reconnexion automatique"""
+
+    def __init__(self, path=SOCKET_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connected = False
+        self.dialogue = deque(maxlen=DIALOGUE_HISTORY)
+        self.alerts = deque(maxlen=ALERT_HISTORY)
+        self.listeners = []
+        self.thread = None
+
+    def start(self):
+        if EVENTS_AVAILABLE and self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="events-subscriber", daemon=True)
+            self.thread.start()
+        return self
+
+    def add_listener(self, callback):
+        """callback(kind, entry) appelé depuis le thread de réception"""
+        self.listeners.append(callback)
+
+    def _run(self):
+        while True:
+            try:
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+                    conn.connect(self.path)
+                    for line in conn.makefile("r", encoding="utf-8"):
+                        self._handle(json.loads(line))
+            except (OSError, ValueError):
+                pass
+            with self.lock:
+                self.connected = False
+            time.sleep(RECONNECT_DELAY)
+
+    def _handle(self, message):
+        kind = message["kind"]
+        with self.lock:
+            if kind == "snapshot":
+                self.dialogue = deque(message["dialogue"], maxlen=DIALOGUE_HISTORY)
+                self.alerts = deque(message["alert"], maxlen=ALERT_HISTORY)
+                self.connected = True
+            elif kind == "dialogue":
+                self.dialogue.append(message["entry"])
+            elif kind == "alert":
+                self.alerts.append(message["entry"])
+        if kind != "snapshot":
+            for callback in self.listeners:
+                callback(kind, message["entry"])
+
+    def get_dialogue(self):
+        """Derniers messages, ou None si aucune détection n'est connectée"""
+        with self.lock:
+            return list(self.dialogue) if self.connected else None
+
+    def get_alerts(self):
+        """Dernières alertes, ou None si aucune détection n'est connectée"""
+        with self.lock:
+            return list(self.alerts) if self.connected else None
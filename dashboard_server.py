@@ -3,21 +3,87 @@ Dashboard Web - Système Anti-Somnolence
 Affiche les statistiques et alertes en temps réel avec graphiques
 """
 
-from flask import Flask, render_template, jsonify
+from flask import Flask, Response, render_template, jsonify, request
 from flask_cors import CORS
 import json
 import os
-from datetime import datetime
+from datetime import datetime, timezone
 import threading
 import time
 
+from dashboard_ipc import EventSubscriber, RealtimeReader
+from dashboard_stream import DashboardStream
+import timeseries_store
+from event_log import LOG_DIR, EventLogReader, EventLogTail
+
 app = Flask(__name__)
 CORS(app)
 
+HOST = '0.0.0.0'
+PORT = 5000
+
+# Canal local avec la détection (repli sur les fichiers JSON s'il est absent)
+realtime_reader = RealtimeReader()
+event_subscriber = EventSubscriber()
+
 # Fichiers de données
 SESSION_FILE = "session_report.json"
 DIALOGUE_FILE = "dialogue_log.json"
 REALTIME_FILE = "realtime_data.json"  # Nouveau fichier pour données temps réel
+STREAMS_FILE = "streams_data.json"    # État par flux (mode multi-caméras)
+ALERTS_FILE = "alert_history.json"
+ALERT_STATS_FILE = "alert_stats.json"  # Agrégats de toute la session
+PERF_FILE = "perf_data.json"            # Temps par étape de la boucle de détection
+
+# Journaux JSONL complets (on ne lit que les lignes nouvelles)
+LOGS = {'dialogue': EventLogReader(LOG_DIR, 'dialogue'), 'alerts': EventLogReader(LOG_DIR, 'alerts')}
+dialogue_tail = EventLogTail(LOG_DIR, 'dialogue', keep=50)
+alerts_tail = EventLogTail(LOG_DIR, 'alerts', keep=100)
+LOG_PAGE_SIZE = 500
+
+class JsonFileCache:
+    """Garde le contenu parsé de chaque fichier JSON tant qu'il n'a pas changé"""
+    
+    def __init__(self):
+        self.entries = {}   # chemin -> ((inode, mtime_ns, taille), données, mtime)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def load(self, path):
+        """Données du fichier, None s'il n'existe pas ou est illisible"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        # L'exporteur remplace le fichier (nouvel inode) : mtime + taille + inode suffisent
+        key = (st.st_ino, st.st_mtime_ns, st.st_size)
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None and entry[0] == key:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"Erreur chargement {path}: {e}")
+            return None
+        with self.lock:
+            self.entries[path] = (key, data, st.st_mtime)
+        return data
+    
+    def mtime(self, path):
+        """Date de modification du fichier lors de son dernier chargement"""
+        entry = self.entries.get(path)
+        return entry[2] if entry is not None else None
+    
+    def get_stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'files': len(self.entries)}
+
+file_cache = JsonFileCache()
 
 def load_session_data():
     """Charge les données de session"""
@@ -29,32 +95,29 @@ def load_session_data():
         'average_perclos': 0
     }
     
-    try:
-        if os.path.exists(SESSION_FILE):
-            with open(SESSION_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return data
-    except Exception as e:
-        print(f"Erreur chargement session: {e}")
+    shared = realtime_reader.read()
+    if shared is not None and shared[1] is not None:
+        return shared[1]
     
-    return default_data
+    data = file_cache.load(SESSION_FILE)
+    return data if data is not None else default_data
 
 def load_dialogue_data():
     """Charge l'historique des dialogues IA"""
     default_data = {'total_messages': 0, 'history': []}
     
-    try:
-        if os.path.exists(DIALOGUE_FILE):
-            with open(DIALOGUE_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                # Si c'est une liste, convertir
-                if isinstance(data, list):
-                    return {'total_messages': len(data), 'history': data}
-                return data
-    except Exception as e:
-        print(f"Erreur chargement dialogue: {e}")
+    history = event_subscriber.get_dialogue()
+    if history is None:
+        history = dialogue_tail.poll()
+    if history is not None:
+        return {'total_messages': len(history), 'history': history}
     
-    return default_data
+    # Export d'une ancienne version
+    data = file_cache.load(DIALOGUE_FILE)
+    # Si c'est une liste, convertir
+    if isinstance(data, list):
+        return {'total_messages': len(data), 'history': data}
+    return data if data is not None else default_data
 
 def load_realtime_data():
     """Charge les données temps réel"""
@@ -70,14 +133,82 @@ def load_realtime_data():
         'yaw': 0.0
     }
     
-    try:
-        if os.path.exists(REALTIME_FILE):
-            with open(REALTIME_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-    except Exception as e:
-        print(f"Erreur chargement realtime: {e}")
+    shared = realtime_reader.read()
+    if shared is not None:
+        return shared[0]
     
-    return default_data
+    data = file_cache.load(REALTIME_FILE)
+    return data if data is not None else default_data
+
+def load_alert_history():
+    """Charge l'historique des alertes"""
+    history = event_subscriber.get_alerts()
+    if history is None:
+        history = alerts_tail.poll()
+    if history is not None:
+        return history
+    
+    # Export d'une ancienne version
+    data = file_cache.load(ALERTS_FILE)
+    return data if isinstance(data, list) else []
+
+def load_alert_stats():
+    """Charge les agrégats d'alertes (tenus à jour par l'exporteur)"""
+    data = file_cache.load(ALERT_STATS_FILE)
+    if data is not None:
+        return data
+    
+    # Export d'une ancienne version : comptage sur l'historique (tronqué)
+    alerts_by_level = {'1': 0, '2': 0, '3': 0}
+    for alert in load_alert_history():
+        level = str(alert.get('level', 1))
+        if level in alerts_by_level:
+            alerts_by_level[level] += 1
+    messages_by_severity = {'info': 0, 'warning': 0, 'critical': 0}
+    for msg in load_dialogue_data().get('history', []):
+        cat = msg.get('severity', 'info')
+        if cat in messages_by_severity:
+            messages_by_severity[cat] += 1
+    return {
+        'total_alerts': sum(alerts_by_level.values()),
+        'alerts_by_level': alerts_by_level,
+        'alerts_by_type': {},
+        'messages_by_severity': messages_by_severity,
+        'alerts_per_minute': {}
+    }
+
+def load_perf_data():
+    """Charge les temps par étape de la boucle de détection"""
+    data = file_cache.load(PERF_FILE)
+    return data if data is not None else {'enabled': False, 'stages': {}}
+
+def load_streams_data():
+    """Charge l'état des flux (mode multi-caméras)"""
+    default_data = {'streams': {}}
+    
+    data = file_cache.load(STREAMS_FILE)
+    return data if data is not None else default_data
+
+# Flux SSE partagé par tous les onglets ouverts
+dashboard_stream = DashboardStream(load_realtime_data, load_session_data,
+                                   load_dialogue_data, load_alert_history, load_alert_stats,
+                                   load_perf_data)
+event_subscriber.add_listener(dashboard_stream.notify)
+
+def json_response(data, *files, mtimes=()):
+    """Réponse JSON avec ETag / Last-Modified : 304 si le navigateur a déjà ces données
+
+    Last-Modified : date la plus récente parmi les fichiers JSON chargés
+    et les dates `mtimes` (journaux d'événements).
+    """
+    response = jsonify(data)
+    response.add_etag()
+    mtimes = [m for m in [file_cache.mtime(f) for f in files] + list(mtimes) if m is not None]
+    if mtimes:
+        response.last_modified = datetime.fromtimestamp(max(mtimes), timezone.utc)
+    # Le navigateur peut garder la réponse mais doit la revalider à chaque fois
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
 
 @app.route('/')
 def index():
@@ -87,82 +218,128 @@ def index():
 @app.route('/api/session')
 def api_session():
     """API: Données de session"""
-    response = jsonify(load_session_data())
-    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-    response.headers['Pragma'] = 'no-cache'
-    response.headers['Expires'] = '0'
-    return response
+    return json_response(load_session_data(), SESSION_FILE)
 
 @app.route('/api/dialogue')
 def api_dialogue():
     """API: Historique dialogue IA"""
-    response = jsonify(load_dialogue_data())
-    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-    response.headers['Pragma'] = 'no-cache'
-    response.headers['Expires'] = '0'
-    return response
+    return json_response(load_dialogue_data(), mtimes=[LOGS['dialogue'].mtime()])
 
 @app.route('/api/realtime')
 def api_realtime():
     """API: Données temps réel"""
-    response = jsonify(load_realtime_data())
-    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-    response.headers['Pragma'] = 'no-cache'
-    response.headers['Expires'] = '0'
-    return response
+    return json_response(load_realtime_data(), REALTIME_FILE)
+
+@app.route('/api/streams')
+def api_streams():
+    """API: État de chaque flux caméra (mode multi-caméras)"""
+    return json_response(load_streams_data(), STREAMS_FILE)
+
+@app.route('/api/perf')
+def api_perf():
+    """API: Temps par étape (p50/p95/p99 en ms), fps et frames perdues"""
+    return json_response(load_perf_data(), PERF_FILE)
 
 @app.route('/api/stats')
 def api_stats():
     """API: Statistiques combinées pour graphiques - VERSION SIMPLIFIÉE"""
-    # Valeurs par défaut garanties
+    # Agrégats tenus à jour par l'exporteur : pas de parcours des historiques
+    alert_stats = load_alert_stats()
     result = {
         'session': load_session_data(),
         'dialogue': load_dialogue_data(),
-        'alerts_by_level': {1: 0, 2: 0, 3: 0},
-        'messages_by_category': {'info': 0, 'warning': 0, 'critical': 0},
+        'alerts_by_level': alert_stats['alerts_by_level'],
+        'alerts_by_type': alert_stats['alerts_by_type'],
+        'alerts_per_minute': alert_stats['alerts_per_minute'],
+        'messages_by_category': alert_stats['messages_by_severity'],
         'realtime': load_realtime_data()
     }
     
+    return json_response(result, SESSION_FILE, REALTIME_FILE, ALERT_STATS_FILE,
+                         mtimes=[LOGS['dialogue'].mtime()])
+
+@app.route('/api/history')
+def api_history():
+    """API: Historique agrégé (min/max/moyenne) - ?from=&to= (epoch s) &resolution= (s)"""
+    params = {}
+    for name in ('from', 'to', 'resolution'):
+        value = request.args.get(name)
+        try:
+            params[name] = float(value) if value not in (None, '') else None
+        except ValueError:
+            return jsonify({'error': f"paramètre {name} invalide: {value!r} (nombre attendu)"}), 400
     try:
-        # Charger alert_history.json
-        if os.path.exists("alert_history.json"):
-            with open("alert_history.json", 'r', encoding='utf-8') as f:
-                alert_history = json.load(f)
-                if isinstance(alert_history, list):
-                    for alert in alert_history:
-                        level = alert.get('level', 1)
-                        if level in [1, 2, 3]:
-                            result['alerts_by_level'][level] += 1
-    except:
-        pass  # Ignorer les erreurs, garder les valeurs par défaut
-    
-    try:
-        # Compter messages par catégorie
-        for msg in result['dialogue'].get('history', []):
-            cat = msg.get('severity', 'info')
-            if cat in result['messages_by_category']:
-                result['messages_by_category'][cat] += 1
-    except:
-        pass  # Ignorer les erreurs
-    
-    response = jsonify(result)
-    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-    response.headers['Pragma'] = 'no-cache'
-    response.headers['Expires'] = '0'
+        data = timeseries_store.query(params['from'], params['to'], params['resolution'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except OSError as e:
+        print(f"Erreur historique: {e}")
+        return jsonify({'error': "historique illisible"}), 500
+    return jsonify(data)
+
+@app.route('/api/log/<name>')
+def api_log(name):
+    """API: Journal complet par pages - ?offset= (numéro du premier événement) &limit="""
+    log = LOGS.get(name)
+    if log is None:
+        return jsonify({'error': f"journal inconnu: {name}"}), 404
+    offset = request.args.get('offset', 0, type=int)
+    limit = min(request.args.get('limit', LOG_PAGE_SIZE, type=int), LOG_PAGE_SIZE)
+    total = log.count()
+    if offset < 0:
+        offset = max(total + offset, 0)   # offset négatif : les derniers événements
+    entries = log.read(offset, offset + limit)
+    return jsonify({'total': total, 'offset': offset,
+                    'next_offset': offset + len(entries), 'entries': entries})
+
+@app.route('/api/cache')
+def api_cache():
+    """API: Compteurs du cache des fichiers JSON"""
+    return jsonify(file_cache.get_stats())
+
+@app.route('/api/stream')
+def api_stream():
+    """API: Flux Server-Sent Events (état complet puis changements)"""
+    dashboard_stream.start()
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    response = Response(dashboard_stream.subscribe(last_event_id), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
     return response
 
-def run_server():
+def start_server_thread(host=HOST, port=PORT):
+    """Lance le serveur sur un thread du processus courant (lanceur app.py).
+
+    Le port est ouvert au retour : les requêtes sont acceptées dès que le
+    thread tourne. Retourne le serveur (server.shutdown() pour l'arrêter).
+    """
+    from werkzeug.serving import make_server
+
+    event_subscriber.start()
+    server = make_server(host, port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="dashboard-server", daemon=True).start()
+    return server
+
+def run_server(host=HOST, port=PORT):
     """Lance le serveur Flask"""
     print("\n" + "="*60)
     print("DASHBOARD WEB DEMARRE")
     print("="*60)
     print("Ouvrez votre navigateur a l'adresse:")
-    print("   >> http://localhost:5000")
+    print(f"   >> http://localhost:{port}")
     print("="*60)
     print("Ctrl+C pour arreter le serveur\n")
     
+    event_subscriber.start()
+    
     # Mode debug désactivé pour éviter les problèmes d'encodage
-    app.run(host='0.0.0.0', port=5000, debug=False, use_reloader=False)
+    # threaded : chaque onglet garde une connexion SSE ouverte
+    app.run(host=host, port=port, debug=False, use_reloader=False, threaded=True)
 
 if __name__ == '__main__':
-    run_server()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Dashboard web de la détection de somnolence")
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args()
+    run_server(port=args.port)
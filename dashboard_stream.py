@@ -0,0 +1,212 @@
+"""
+Flux Server-Sent Events du dashboard
+Pour pousser les mises à jour aux navigateurs au lieu de les laisser interroger l'API
+
+Un seul thread (la « pompe ») lit les données de la détection, calcule ce
+qui a changé et range chaque changement dans un tampon d'événements
+numérotés, déjà sérialisés. Les connexions des navigateurs ne font
+qu'attendre le prochain numéro et renvoyer le texte tel quel : un onglet
+de plus ne coûte presque rien au serveur.
+
+Événements envoyés :
+- snapshot : état complet (à la connexion, ou si le navigateur a manqué
+  trop d'événements)
+- realtime : valeurs temps réel qui ont changé
+- session : statistiques de session
+- dialogue / alert : nouveau message, nouvelle alerte
+- perf : temps par étape de la boucle de détection
+
+Chaque événement porte un identifiant (démarrage du serveur + numéro) : à
+la reconnexion le navigateur envoie Last-Event-ID et reçoit les événements
+manqués, ou un état complet si le serveur a redémarré entre-temps.
+"""
+
+import json
+import threading
+import time
+from collections import deque
+
+
+STREAM_INTERVAL = 0.1      # période de la pompe (secondes)
+KEEPALIVE_SECONDS = 15.0   # commentaire envoyé sur une connexion inactive
+RETRY_MS = 2000            # délai de reconnexion conseillé au navigateur
+BUFFER_EVENTS = 1000       # événements gardés pour la reprise avec Last-Event-ID
+
+
+def _entry_key(entry):
+    return entry.get("timestamp"), entry.get("message", entry.get("type"))
+
+
+def _new_entries(previous, current):
+    """Entrées de current arrivées après la dernière de previous (None : resynchronisation)"""
+    if not previous:
+        return list(current)
+    last = _entry_key(previous[-1])
+    for i in range(len(current) - 1, -1, -1):
+        if _entry_key(current[i]) == last:
+            return current[i + 1:]
+    return None
+
+
+class DashboardStream:
+    """Pompe unique + tampon d'événements partagé par toutes les connexions SSE"""
+
+    def __init__(self, load_realtime, load_session, load_dialogue, load_alerts,
+                 load_alert_stats, load_perf=None, interval=STREAM_INTERVAL):
+        self.load_realtime = load_realtime
+        self.load_session = load_session
+        self.load_dialogue = load_dialogue
+        self.load_alerts = load_alerts
+        self.load_alert_stats = load_alert_stats
+        self.load_perf = load_perf
+        self.interval = interval
+
+        self.condition = threading.Condition()
+        self.events = deque(maxlen=BUFFER_EVENTS)   # (id, texte SSE)
+        self.epoch = format(int(time.time()), "x")   # distingue les redémarrages du serveur
+        self.last_id = 0
+        self.snapshot_cache = None                  # (id, texte SSE)
+        self.clients = 0
+
+        self.poll_lock = threading.Lock()
+        self.polled = False
+        self.realtime = {}
+        self.session = {}
+        self.dialogue = []
+        self.alerts = []
+        self.perf = None
+
+        self.wakeup = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._pump, name="dashboard-stream", daemon=True)
+            self.thread.start()
+        return self
+
+    def notify(self, *_):
+        """Réveille la pompe tout de suite (nouvel événement de la détection)"""
+        self.wakeup.set()
+
+    def _pump(self):
+        while True:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            # Rien à calculer tant qu'aucun navigateur n'écoute
+            if self.clients == 0:
+                continue
+            try:
+                self._poll()
+            except Exception as e:
+                print(f"Erreur flux dashboard: {e}")
+
+    def _poll(self):
+        with self.poll_lock:
+            realtime = dict(self.load_realtime())
+            realtime.pop("updated_at", None)
+            session = self.load_session()
+            dialogue = self.load_dialogue().get("history", [])
+            alerts = self.load_alerts()
+            perf = self.load_perf() if self.load_perf is not None else None
+
+            new_dialogue = _new_entries(self.dialogue, dialogue)
+            new_alerts = _new_entries(self.alerts, alerts)
+            changed = {k: v for k, v in realtime.items() if self.realtime.get(k) != v}
+            session_changed = session != self.session
+            perf_changed = perf is not None and perf != self.perf
+
+            with self.condition:
+                resync = not self.polled or new_dialogue is None or new_alerts is None
+                self.realtime, self.session = realtime, session
+                self.dialogue, self.alerts = dialogue, alerts
+                self.perf = perf
+                self.polled = True
+                if resync:
+                    # Premier état, nouvelle session ou historique tronqué : état complet
+                    self._emit("snapshot", self._snapshot_data())
+                    return
+                if changed:
+                    self._emit("realtime", changed)
+                if session_changed:
+                    self._emit("session", session)
+                for entry in new_dialogue:
+                    self._emit("dialogue", entry)
+                for entry in new_alerts:
+                    self._emit("alert", entry)
+                if perf_changed:
+                    self._emit("perf", perf)
+
+    def _snapshot_data(self):
+        return {
+            "realtime": self.realtime,
+            "session": self.session,
+            "dialogue": self.dialogue,
+            "alerts_by_level": self.load_alert_stats()["alerts_by_level"],
+            "perf": self.perf
+        }
+
+    def _emit(self, kind, data):
+        # Appelé avec self.condition verrouillé
+        self.last_id += 1
+        text = f"id: {self.epoch}-{self.last_id}\nevent: {kind}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+        self.events.append((self.last_id, text))
+        self.condition.notify_all()
+
+    def _snapshot_text(self):
+        # Un seul état complet sérialisé par numéro d'événement, partagé par les onglets
+        if self.snapshot_cache is None or self.snapshot_cache[0] != self.last_id:
+            data = json.dumps(self._snapshot_data(), ensure_ascii=False)
+            self.snapshot_cache = (self.last_id, f"id: {self.epoch}-{self.last_id}\nevent: snapshot\ndata: {data}\n\n")
+        return self.snapshot_cache[1]
+
+    def _events_after(self, cursor):
+        """Textes des événements après cursor, ou None s'ils ne sont plus dans le tampon"""
+        if cursor == self.last_id:
+            return []
+        if not self.events or cursor < self.events[0][0] - 1 or cursor > self.last_id:
+            return None
+        start = cursor - self.events[0][0] + 1
+        return [self.events[i][1] for i in range(start, len(self.events))]
+
+    def _parse_event_id(self, last_event_id):
+        """Numéro d'événement de Last-Event-ID, None s'il vient d'un autre démarrage"""
+        epoch, _, number = (last_event_id or "").partition("-")
+        if epoch != self.epoch or not number.isdigit():
+            return None
+        return int(number)
+
+    def subscribe(self, last_event_id=None):
+        """Générateur du flux SSE d'une connexion (last_event_id : en-tête Last-Event-ID)"""
+        cursor = self._parse_event_id(last_event_id)
+        with self.condition:
+            self.clients += 1
+            first = self.clients == 1
+        try:
+            if first:
+                # La pompe était au repos : état à jour avant de répondre
+                self._poll()
+            with self.condition:
+                pending = None
+                if cursor is not None:
+                    pending = self._events_after(cursor)
+                if pending is None:
+                    pending = [self._snapshot_text()]
+                cursor = self.last_id
+
+            yield f"retry: {RETRY_MS}\n\n"
+            while True:
+                for text in pending:
+                    yield text
+                with self.condition:
+                    if not self.condition.wait_for(lambda: self.last_id > cursor, KEEPALIVE_SECONDS):
+                        pending = [": keepalive\n\n"]
+                        continue
+                    pending = self._events_after(cursor)
+                    if pending is None:
+                        # Connexion trop lente : le tampon a tourné
+                        pending = [self._snapshot_text()]
+                    cursor = self.last_id
+        finally:
+            with self.condition:
+                self.clients -= 1
@@ -0,0 +1,663 @@
+"""
+Moteur de détection de somnolence, sans caméra, son ni affichage
+Pour appliquer exactement la même logique en direct, sur des enregistrements et dans les workers
+
+DrowsinessEngine reçoit une frame sous forme (horodatage, landmarks NumPy)
+et retourne ses métriques (EAR, PERCLOS, pose de tête, durées, statut)
+ainsi que la liste des événements produits par les machines à états :
+alertes, bips, messages vocaux, sirène, lignes de journal. Le moteur ne
+lit jamais l'horloge et n'appelle aucune sortie : le son, le HUD et
+l'export du dashboard s'abonnent aux événements (subscribe) ou lisent les
+métriques retournées. Sans dépendance à OpenCV ni aux modules audio, il
+tourne à plusieurs milliers de frames par seconde sur des données
+enregistrées.
+
+Événements (dict, clé "kind") :
+- alert : nouvelle alerte (type, level, duration, message, severity)
+- beep : bip (frequency en Hz, duration en ms)
+- voice : phrase à prononcer (text, critical=True pour les phrases du mode sirène)
+- siren_start / siren_stop : bip continu (frequency)
+- log : ligne de journal console (text)
+"""
+
+import time
+from array import array
+
+import numpy as np
+
+from landmark_features import compute_features
+
+
+# -----------------------
+# PARAMÈTRES À RÉGLER
+# -----------------------
+EAR_THRESHOLD = 0.23          # seuil de fermeture des yeux (à ajuster après test)
+MIN_CLOSED_SECONDS = 1.5      # durée minimale yeux fermés pour déclencher l'alerte
+ALERT_REPEAT_INTERVAL = 5.0   # répéter l'alerte toutes les 5 secondes
+BEEP_INTERVAL = 1.0           # bip sonore toutes les 1 seconde pendant alerte
+PERCLOS_WINDOW = 60.0         # fenêtre (secondes) pour estimer le "PERCLOS light"
+PERCLOS_EXTRA_WINDOWS = (300.0, 900.0)  # fenêtres longues (5 et 15 min) suivies en parallèle
+
+# Paramètres détection mouvements de tête
+HEAD_MOVEMENT_THRESHOLD = 12.0  # degrés de rotation pour considérer un mouvement
+HEAD_MOVEMENT_WINDOW = 6.0      # fenêtre de temps (secondes) pour compter les mouvements
+MIN_HEAD_MOVEMENTS = 4          # nombre minimum de changements de direction
+HEAD_DROWSY_DURATION = 3.0      # durée minimale de balancement pour confirmer somnolence
+
+# Passage en mode sirène continue
+EYES_CRITICAL_SECONDS = 12.0    # yeux fermés depuis plus de 12s
+HEAD_CRITICAL_SECONDS = 16.0    # balancement de tête depuis plus de 16s
+
+# Paramètres détection tête baissée
+HEAD_DOWN_THRESHOLD = -15.0     # pitch négatif = tête baissée (ajuster selon besoin)
+HEAD_DOWN_DURATION = 2.0        # durée minimale tête baissée pour alerte
+HEAD_DOWN_BEEP_INTERVAL = 1.5   # intervalle entre bips pour tête baissée
+
+# Bips qui s'accélèrent pendant une alerte (avant la sirène) :
+# (durée max de l'événement, intervalle entre bips, durée du bip ms, fréquence Hz, libellé)
+EYES_BEEP_STAGES = (
+    (3.0, 1.0, 200, 2500, "Bips séparés"),
+    (5.0, 0.5, 250, 2500, "Bips rapprochés"),
+    (8.0, 0.2, 150, 2600, "Bips très rapides"),
+    (EYES_CRITICAL_SECONDS, 0.1, 90, 2700, "Quasi-continu"),
+)
+HEAD_BEEP_STAGES = (
+    (5.0, 1.0, 200, 1800, "Bips séparés"),
+    (8.0, 0.5, 250, 1900, "Bips rapprochés"),
+    (12.0, 0.2, 150, 2000, "Bips très rapides"),
+    (HEAD_CRITICAL_SECONDS, 0.1, 90, 2100, "Quasi-continu"),
+)
+
+# Phrases des alertes vocales (pré-synthétisées au démarrage, voir audio_alerts.py)
+VOICE_CRITICAL = "Ohhhh ! Tu vas mourir ! Réveille-toi maintenant !"
+VOICE_EYES_CLOSED = "Attention ! Tes yeux sont fermés ! Réveille-toi !"
+VOICE_EYES_STILL_CLOSED = "Alerte ! Tes yeux sont toujours fermés ! Arrête-toi immédiatement !"
+VOICE_HEAD_SWAY = "Attention ! Tu as sommeil ! Ta tête balance ! Repose-toi !"
+VOICE_HEAD_STILL_SWAY = "Danger ! Tu continues à somnoler ! Arrête le véhicule maintenant !"
+VOICE_HEAD_DOWN = "Attention ! Ta tête est baissée ! Relève-toi !"
+VOICE_HEAD_STILL_DOWN = "Relève ta tête ! Tu t'endors !"
+VOICE_PHRASES = (
+    VOICE_CRITICAL, VOICE_EYES_CLOSED, VOICE_EYES_STILL_CLOSED, VOICE_HEAD_SWAY,
+    VOICE_HEAD_STILL_SWAY, VOICE_HEAD_DOWN, VOICE_HEAD_STILL_DOWN,
+)
+
+
+class PerclosWindow:
+    """PERCLOS pondéré par la durée des frames, sur une ou plusieurs fenêtres.
+
+    Les échantillons sont stockés dans un buffer circulaire préalloué
+    (horodatage, durée en µs, yeux fermés). Chaque fenêtre garde un pointeur
+    de fin et ses totaux cumulés (temps total, temps yeux fermés) : update()
+    est en O(1) amorti et perclos() en O(1), quel que soit le nombre de frames.
+    """
+    NOMINAL_FRAME_US = 33_333      # durée attribuée au tout premier échantillon
+    MAX_FRAME_US = 1_000_000       # une frame ne compte jamais plus d'1 s (saut de flux)
+
+    def __init__(self, window_seconds=60.0, extra_windows=(), expected_fps=60):
+        self.window_seconds = window_seconds
+        self.windows = [window_seconds] + [w for w in extra_windows if w != window_seconds]
+
+        capacity = int(max(self.windows) * expected_fps) + 1
+        self.capacity = capacity
+        self.timestamps = array('d', bytes(8 * capacity))
+        self.durations = array('q', bytes(8 * capacity))
+        self.closed = array('b', bytes(capacity))
+        self.head = 0       # nombre total d'échantillons ajoutés
+        self.last_time = None
+
+        # Par fenêtre : indice (absolu) du plus vieil échantillon, totaux en µs
+        self.tails = [0] * len(self.windows)
+        self.total_us = [0] * len(self.windows)
+        self.closed_us = [0] * len(self.windows)
+
+    def _grow(self):
+        """Double la capacité (fps plus élevé que prévu)"""
+        old_capacity = self.capacity
+        order = [i % old_capacity for i in range(min(self.tails), self.head)]
+        self.capacity *= 2
+        timestamps = array('d', bytes(8 * self.capacity))
+        durations = array('q', bytes(8 * self.capacity))
+        closed = array('b', bytes(self.capacity))
+        for absolute, slot in zip(range(min(self.tails), self.head), order):
+            new_slot = absolute % self.capacity
+            timestamps[new_slot] = self.timestamps[slot]
+            durations[new_slot] = self.durations[slot]
+            closed[new_slot] = self.closed[slot]
+        self.timestamps, self.durations, self.closed = timestamps, durations, closed
+
+    def update(self, closed_now, now=None):
+        if now is None:
+            now = time.time()
+        if self.last_time is None:
+            duration = self.NOMINAL_FRAME_US
+        else:
+            duration = min(max(int((now - self.last_time) * 1e6), 0), self.MAX_FRAME_US)
+        self.last_time = now
+
+        if self.head - min(self.tails) >= self.capacity:
+            self._grow()
+        slot = self.head % self.capacity
+        self.timestamps[slot] = now
+        self.durations[slot] = duration
+        self.closed[slot] = 1 if closed_now else 0
+        self.head += 1
+
+        for k, window in enumerate(self.windows):
+            self.total_us[k] += duration
+            if closed_now:
+                self.closed_us[k] += duration
+            # Sortie des échantillons trop vieux pour cette fenêtre
+            cutoff = now - window
+            tail = self.tails[k]
+            while tail < self.head and self.timestamps[tail % self.capacity] < cutoff:
+                old = tail % self.capacity
+                self.total_us[k] -= self.durations[old]
+                if self.closed[old]:
+                    self.closed_us[k] -= self.durations[old]
+                tail += 1
+            self.tails[k] = tail
+
+    def perclos(self, window_seconds=None):
+        """Fraction du temps yeux fermés sur la fenêtre (par défaut la principale)"""
+        k = 0 if window_seconds is None else self.windows.index(window_seconds)
+        if self.total_us[k] <= 0:
+            return 0.0
+        return self.closed_us[k] / self.total_us[k]
+
+    def perclos_all(self):
+        """PERCLOS de toutes les fenêtres : {durée fenêtre (s): fraction}"""
+        return {window: self.perclos(window) for window in self.windows}
+
+
+# Codes de direction de la tête (historique compact)
+DIR_CENTER, DIR_LEFT, DIR_RIGHT, DIR_UP, DIR_DOWN = 0, 1, 2, 3, 4
+DIRECTION_NAMES = ("center", "left", "right", "up", "down")
+
+HEAD_HISTORY_DTYPE = np.dtype([
+    ("t", "f8"),          # horodatage de la frame
+    ("pitch", "f4"),
+    ("yaw", "f4"),
+    ("direction", "i1"),  # code DIR_*
+    ("change", "i1"),     # 1 si changement de direction sur cette frame
+])
+
+
+class HeadMovementDetector:
+    """Détecte le balancement de tête typique de la somnolence.
+
+    L'historique de la fenêtre est un buffer circulaire NumPy structuré de
+    taille fixe. Des sommes cumulées (changements de direction, pitch, yaw et
+    leurs carrés) sont tenues à jour à l'ajout et à l'élagage : les requêtes
+    sur la fenêtre sont en O(1). Toutes les méthodes prennent l'horodatage
+    de la frame au lieu de lire l'horloge.
+    """
+    def __init__(self, window_seconds=HEAD_MOVEMENT_WINDOW, threshold=HEAD_MOVEMENT_THRESHOLD,
+                 expected_fps=60, min_movements=MIN_HEAD_MOVEMENTS,
+                 drowsy_duration=HEAD_DROWSY_DURATION):
+        self.window_seconds = window_seconds
+        self.threshold = threshold
+        self.min_movements = min_movements
+        self.drowsy_duration = drowsy_duration
+        self.last_direction = DIR_CENTER
+        self.direction_changes = 0
+        self.movement_start_time = None
+        self.last_update_time = None
+
+        self.capacity = int(window_seconds * expected_fps) + 1
+        self.history = np.zeros(self.capacity, dtype=HEAD_HISTORY_DTYPE)
+        self.head = 0    # nombre total d'échantillons ajoutés
+        self.tail = 0    # plus vieil échantillon encore dans la fenêtre
+
+        # Sommes sur la fenêtre
+        self.window_changes = 0
+        self.sum_pitch = 0.0
+        self.sum_yaw = 0.0
+        self.sum_pitch2 = 0.0
+        self.sum_yaw2 = 0.0
+        
+    def _grow(self):
+        """Double la capacité (fps plus élevé que prévu)"""
+        live = self.history[np.arange(self.tail, self.head) % self.capacity]
+        self.capacity *= 2
+        self.history = np.zeros(self.capacity, dtype=HEAD_HISTORY_DTYPE)
+        self.history[np.arange(self.tail, self.head) % self.capacity] = live
+
+    def update(self, pitch, yaw, now):
+        # Détermine la direction actuelle
+        current_direction = DIR_CENTER
+        if abs(yaw) > self.threshold:
+            current_direction = DIR_RIGHT if yaw > 0 else DIR_LEFT
+        elif abs(pitch) > self.threshold:
+            current_direction = DIR_DOWN if pitch > 0 else DIR_UP
+        
+        # Détecte un changement de direction
+        changed = (current_direction != DIR_CENTER and self.last_direction != DIR_CENTER
+                   and current_direction != self.last_direction)
+        if changed:
+            self.direction_changes += 1
+            if self.movement_start_time is None:
+                self.movement_start_time = now
+        
+        # Ajoute le point
+        if self.head - self.tail >= self.capacity:
+            self._grow()
+        slot = self.head % self.capacity
+        self.history[slot] = (now, pitch, yaw, current_direction, changed)
+        self.head += 1
+        # Sommes calculées sur les valeurs stockées (float32) pour que l'élagage les annule exactement
+        _, pitch32, yaw32, _, _ = self.history[slot].item()
+        self.window_changes += changed
+        self.sum_pitch += pitch32
+        self.sum_yaw += yaw32
+        self.sum_pitch2 += pitch32 * pitch32
+        self.sum_yaw2 += yaw32 * yaw32
+        
+        # Élagage
+        cutoff = now - self.window_seconds
+        while self.tail < self.head:
+            old_t, old_pitch, old_yaw, _, old_change = self.history[self.tail % self.capacity].item()
+            if old_t >= cutoff:
+                break
+            self.window_changes -= old_change
+            self.sum_pitch -= old_pitch
+            self.sum_yaw -= old_yaw
+            self.sum_pitch2 -= old_pitch * old_pitch
+            self.sum_yaw2 -= old_yaw * old_yaw
+            self.tail += 1
+        
+        # Reset si pas de mouvement récent (inactivité de 2s)
+        if self.last_update_time and (now - self.last_update_time) > 2.0:
+            if current_direction == DIR_CENTER:
+                self.direction_changes = 0
+                self.movement_start_time = None
+        
+        if current_direction != DIR_CENTER:
+            self.last_direction = current_direction
+        
+        self.last_update_time = now
+        return DIRECTION_NAMES[current_direction]
+    
+    def is_drowsy_head_movement(self, now):
+        """Retourne True si détecte un pattern de balancement typique de somnolence"""
+        if self.head == self.tail or self.movement_start_time is None:
+            return False
+        
+        movement_duration = now - self.movement_start_time
+        
+        return (self.direction_changes >= self.min_movements and 
+                movement_duration >= self.drowsy_duration)
+    
+    def get_stats(self, now):
+        """Retourne statistiques pour affichage"""
+        duration = 0.0
+        if self.movement_start_time:
+            duration = now - self.movement_start_time
+        return self.direction_changes, duration
+
+    def window_direction_changes(self):
+        """Nombre de changements de direction dans la fenêtre"""
+        return self.window_changes
+
+    def oscillation_frequency(self):
+        """Fréquence de balancement (Hz) sur la fenêtre : un aller-retour = 2 changements"""
+        count = self.head - self.tail
+        if count < 2:
+            return 0.0
+        span = (self.history["t"][(self.head - 1) % self.capacity]
+                - self.history["t"][self.tail % self.capacity])
+        return self.window_changes / 2.0 / span if span > 0 else 0.0
+
+    def angle_variance(self):
+        """Variance (pitch, yaw) en degrés² sur la fenêtre"""
+        count = self.head - self.tail
+        if count == 0:
+            return 0.0, 0.0
+        mean_pitch, mean_yaw = self.sum_pitch / count, self.sum_yaw / count
+        return (max(self.sum_pitch2 / count - mean_pitch * mean_pitch, 0.0),
+                max(self.sum_yaw2 / count - mean_yaw * mean_yaw, 0.0))
+
+    def window_history(self):
+        """Copie ordonnée de l'historique de la fenêtre (tableau structuré)"""
+        return self.history[np.arange(self.tail, self.head) % self.capacity]
+    
+    def reset(self):
+        """Reset le détecteur"""
+        self.direction_changes = 0
+        self.movement_start_time = None
+        self.last_direction = DIR_CENTER
+
+
+def _beep_stage(stages, duration):
+    for stage in stages:
+        if duration < stage[0]:
+            return stage
+    return stages[-1]
+
+
+class DrowsinessEngine:
+    """Machines à états yeux fermés / balancement / tête baissée, pilotées par l'horodatage.
+
+    process() traite une frame et retourne (métriques, événements) ; les
+    événements sont aussi transmis aux abonnés dans l'ordre où ils sont
+    produits. Toutes les durées viennent des horodatages fournis : le même
+    enregistrement rejoué donne toujours les mêmes alertes.
+    """
+
+    def __init__(self, ear_threshold=EAR_THRESHOLD, head_down_threshold=HEAD_DOWN_THRESHOLD,
+                 min_closed_seconds=MIN_CLOSED_SECONDS, head_down_duration=HEAD_DOWN_DURATION,
+                 head_movement_threshold=HEAD_MOVEMENT_THRESHOLD,
+                 min_head_movements=MIN_HEAD_MOVEMENTS,
+                 perclos_window=PERCLOS_WINDOW, perclos_extra_windows=PERCLOS_EXTRA_WINDOWS):
+        self.ear_threshold = ear_threshold
+        self.head_down_threshold = head_down_threshold
+        self.min_closed_seconds = min_closed_seconds
+        self.head_down_duration = head_down_duration
+
+        self.perclos = PerclosWindow(perclos_window, perclos_extra_windows)
+        self.head_detector = HeadMovementDetector(threshold=head_movement_threshold,
+                                                  min_movements=min_head_movements)
+        self.subscribers = []
+
+        # Yeux fermés
+        self.closed_start_time = None
+        self.eyes_alert_active = False
+        self.eyes_continuous_mode = False
+        self.last_eyes_voice_alert = 0.0
+        self.last_eyes_beep = 0.0
+
+        # Balancement de tête
+        self.head_alert_active = False
+        self.head_continuous_mode = False
+        self.last_head_voice_alert = 0.0
+        self.last_head_beep = 0.0
+
+        # Tête baissée
+        self.head_down_start_time = None
+        self.head_down_alert_active = False
+        self.last_head_down_beep = 0.0
+        self.last_head_down_voice = 0.0
+
+        self.status_text = "✓ OK"
+        self.events = []
+
+    def subscribe(self, callback):
+        """callback(event) est appelé pour chaque événement produit"""
+        self.subscribers.append(callback)
+        return callback
+
+    def _emit(self, kind, now, **fields):
+        event = {"kind": kind, "time": now, **fields}
+        self.events.append(event)
+        for callback in self.subscribers:
+            callback(event)
+
+    def _alert(self, now, alert_type, level, duration, message, severity):
+        self._emit("alert", now, type=alert_type, level=level, duration=duration,
+                   message=message, severity=severity)
+
+    def busy(self):
+        """True si une alerte ou un début d'événement est en cours (pleine cadence d'inférence)"""
+        return (self.eyes_alert_active or self.head_alert_active or self.head_down_alert_active or
+                self.closed_start_time is not None or self.head_down_start_time is not None or
+                self.head_detector.direction_changes > 0)
+
+    def alert_level(self):
+        """Même niveau d'alerte que DashboardExporter.update_realtime"""
+        if self.eyes_continuous_mode or self.head_continuous_mode:
+            return 3
+        if self.eyes_alert_active or self.head_alert_active:
+            return 2
+        if self.head_down_alert_active:
+            return 1
+        return 0
+
+    def process(self, now, points, w, h, features=None):
+        """Traite une frame (points : landmarks NumPy, None sans visage).
+
+        features : features déjà calculées (ou prolongées par l'ordonnanceur
+        d'inférence), sinon calculées à partir de points. Retourne
+        (métriques, événements de la frame).
+        """
+        self.events = []
+        if points is None:
+            return self._face_lost(now), self.events
+        if features is None:
+            features = compute_features(points, w, h)
+        return self._update(now, float(features["ear"]), float(features["pitch"]),
+                            float(features["yaw"])), self.events
+
+    def _face_lost(self, now):
+        self.perclos.update(False, now)
+        if self.eyes_alert_active or self.head_alert_active or self.head_down_alert_active:
+            self.eyes_alert_active = False
+            self.head_alert_active = False
+            self.head_down_alert_active = False
+            self.eyes_continuous_mode = False
+            self.head_continuous_mode = False
+            self._emit("siren_stop", now)
+            self._emit("log", now, text="😶 Visage perdu - alertes désactivées")
+        self.status_text = "Visage non detecte"
+        return {
+            "face": False,
+            "perclos": self.perclos.perclos(),
+            "status": self.status_text,
+            "alert_level": 0
+        }
+
+    def _update(self, now, ear, pitch, yaw):
+        # ===== DÉTECTION YEUX =====
+        eye_closed = ear < self.ear_threshold
+        if eye_closed:
+            if self.closed_start_time is None:
+                self.closed_start_time = now
+            closed_duration = now - self.closed_start_time
+        else:
+            self.closed_start_time = None
+            closed_duration = 0.0
+            if self.eyes_alert_active:
+                self.eyes_alert_active = False
+                self.eyes_continuous_mode = False
+                self._emit("siren_stop", now)
+                self._emit("log", now, text="👁️  Yeux ouverts - alerte désactivée")
+
+        self.perclos.update(eye_closed, now)
+
+        # ===== DÉTECTION MOUVEMENTS TÊTE =====
+        head_detector = self.head_detector
+        head_direction = head_detector.update(pitch, yaw, now)
+        head_drowsy = head_detector.is_drowsy_head_movement(now)
+
+        # ===== DÉTECTION TÊTE BAISSÉE =====
+        head_is_down = pitch < self.head_down_threshold
+        if head_is_down:
+            if self.head_down_start_time is None:
+                self.head_down_start_time = now
+            head_down_duration = now - self.head_down_start_time
+        else:
+            self.head_down_start_time = None
+            head_down_duration = 0.0
+            if self.head_down_alert_active:
+                self.head_down_alert_active = False
+                self._emit("log", now, text="🙂 Tête relevée - alerte tête baissée désactivée")
+
+        if not head_drowsy and self.head_alert_active:
+            self.head_alert_active = False
+            self.head_continuous_mode = False
+            self._emit("siren_stop", now)
+            self._emit("log", now, text="🧘 Tête stable - alerte désactivée")
+
+        if eye_closed and closed_duration >= self.min_closed_seconds:
+            self._eyes_alert(now, closed_duration)
+        if head_drowsy:
+            self._head_alert(now)
+        if head_is_down and head_down_duration >= self.head_down_duration:
+            self._head_down_alert(now, head_down_duration)
+
+        # ===== MISE À JOUR STATUT =====
+        changes, movement_duration = head_detector.get_stats(now)
+        if self.eyes_alert_active and self.head_alert_active:
+            self.status_text = "🚨🚨 DANGER CRITIQUE"
+        elif self.eyes_alert_active and self.head_down_alert_active:
+            self.status_text = "🚨🚨 DANGER - Yeux + Tête baissée"
+        elif self.eyes_alert_active:
+            self.status_text = f"🚨 ALERTE YEUX ({closed_duration:.1f}s)"
+        elif self.head_alert_active:
+            self.status_text = f"🚨 ALERTE TÊTE ({changes}mvts)"
+        elif self.head_down_alert_active:
+            self.status_text = f"⚠️ TÊTE BAISSÉE ({head_down_duration:.1f}s)"
+        elif eye_closed:
+            self.status_text = f"⚠️ Yeux... {closed_duration:.1f}s"
+        elif head_is_down:
+            self.status_text = f"⚠️ Tête baissée... {head_down_duration:.1f}s"
+        elif changes > 0:
+            self.status_text = f"⚠️ Tête... {changes}mvts"
+        else:
+            self.status_text = "✓ OK"
+
+        return {
+            "face": True,
+            "ear": ear,
+            "perclos": self.perclos.perclos(),
+            "pitch": pitch,
+            "yaw": yaw,
+            "eye_closed": eye_closed,
+            "closed_duration": closed_duration,
+            "head_direction": head_direction,
+            "head_is_down": head_is_down,
+            "head_down_duration": head_down_duration,
+            "head_movements": changes,
+            "head_movement_duration": movement_duration,
+            "head_drowsy": head_drowsy,
+            "eyes_alert_active": self.eyes_alert_active,
+            "head_alert_active": self.head_alert_active,
+            "head_down_alert_active": self.head_down_alert_active,
+            "eyes_continuous_mode": self.eyes_continuous_mode,
+            "head_continuous_mode": self.head_continuous_mode,
+            "alert_level": self.alert_level(),
+            "status": self.status_text
+        }
+
+    # ===== ALERTE YEUX FERMÉS =====
+    def _eyes_alert(self, now, closed_duration):
+        if not self.eyes_alert_active:
+            # PREMIÈRE ALERTE
+            self._emit("log", now, text=f"🚨 [YEUX] ALERTE ACTIVÉE ! Durée: {closed_duration:.1f}s")
+            self._emit("voice", now, text=VOICE_EYES_CLOSED)
+            self._emit("beep", now, frequency=2000, duration=300)
+            self.last_eyes_voice_alert = now
+            self.last_eyes_beep = now
+            self.eyes_alert_active = True
+            self._alert(now, "Yeux fermés", 2, closed_duration,
+                        f"ALERTE YEUX ! Yeux fermés depuis {closed_duration:.1f}s", "warning")
+            return
+
+        # Passage en mode SIRÈNE CONTINUE après 12 secondes
+        if closed_duration >= EYES_CRITICAL_SECONDS and not self.eyes_continuous_mode:
+            self._emit("log", now, text=f"💀 [YEUX] MODE SIRÈNE CONTINUE ACTIVÉ ! {closed_duration:.1f}s")
+            self._emit("siren_start", now, frequency=2800)
+            self._emit("voice", now, text=VOICE_CRITICAL, critical=True)
+            self.eyes_continuous_mode = True
+            self.last_eyes_voice_alert = now
+            self._alert(now, "Yeux fermés - Critique", 3, closed_duration,
+                        f"DANGER CRITIQUE ! Yeux fermés {closed_duration:.1f}s - MODE SIRÈNE", "critical")
+
+        # BIP qui devient progressivement rapide (tant que la sirène n'a pas pris le relais)
+        if closed_duration < EYES_CRITICAL_SECONDS:
+            _, interval, duration, frequency, label = _beep_stage(EYES_BEEP_STAGES, closed_duration)
+            if (now - self.last_eyes_beep) >= interval:
+                self._emit("beep", now, frequency=frequency, duration=duration)
+                self.last_eyes_beep = now
+                if int(closed_duration) != int(closed_duration - 0.5):
+                    self._emit("log", now, text=f"🔊 [YEUX] {label} - {closed_duration:.1f}s")
+
+        # VOIX répétée toutes les 5 secondes
+        if (now - self.last_eyes_voice_alert) >= ALERT_REPEAT_INTERVAL:
+            self._emit("log", now, text=f"🔔 [YEUX] Alerte vocale répétée ! Durée: {closed_duration:.1f}s")
+            if self.eyes_continuous_mode:
+                self._emit("voice", now, text=VOICE_CRITICAL, critical=True)
+            else:
+                self._emit("voice", now, text=VOICE_EYES_STILL_CLOSED)
+            self.last_eyes_voice_alert = now
+
+    # ===== ALERTE MOUVEMENTS TÊTE =====
+    def _head_alert(self, now):
+        changes, head_duration = self.head_detector.get_stats(now)
+        if not self.head_alert_active:
+            # PREMIÈRE ALERTE
+            self._emit("log", now, text=f"🚨 [TÊTE] ALERTE ACTIVÉE ! Mvts: {changes}, Durée: {head_duration:.1f}s")
+            self._emit("voice", now, text=VOICE_HEAD_SWAY)
+            self._emit("beep", now, frequency=1500, duration=300)
+            self.last_head_voice_alert = now
+            self.last_head_beep = now
+            self.head_alert_active = True
+            self._alert(now, "Mouvements tête", 2, head_duration,
+                        f"ALERTE TÊTE ! Mouvements de somnolence ({changes} mvts)", "warning")
+            return
+
+        # Passage en mode SIRÈNE CONTINUE après 16 secondes
+        if head_duration >= HEAD_CRITICAL_SECONDS and not self.head_continuous_mode:
+            self._emit("log", now, text=f"💀 [TÊTE] MODE SIRÈNE CONTINUE ACTIVÉ ! {head_duration:.1f}s")
+            self._emit("siren_start", now, frequency=2200)
+            self._emit("voice", now, text=VOICE_CRITICAL, critical=True)
+            self.head_continuous_mode = True
+            self.last_head_voice_alert = now
+            self._alert(now, "Mouvements tête - Critique", 3, head_duration,
+                        f"DANGER CRITIQUE ! Somnolence tête {head_duration:.1f}s - MODE SIRÈNE", "critical")
+
+        if head_duration < HEAD_CRITICAL_SECONDS:
+            _, interval, duration, frequency, label = _beep_stage(HEAD_BEEP_STAGES, head_duration)
+            if (now - self.last_head_beep) >= interval:
+                self._emit("beep", now, frequency=frequency, duration=duration)
+                self.last_head_beep = now
+                if int(head_duration) != int(head_duration - 0.5):
+                    self._emit("log", now, text=f"🔊 [TÊTE] {label} - {head_duration:.1f}s")
+
+        if (now - self.last_head_voice_alert) >= ALERT_REPEAT_INTERVAL:
+            self._emit("log", now, text=f"🔔 [TÊTE] Alerte vocale répétée ! Mvts: {changes}, Durée: {head_duration:.1f}s")
+            if self.head_continuous_mode:
+                self._emit("voice", now, text=VOICE_CRITICAL, critical=True)
+            else:
+                self._emit("voice", now, text=VOICE_HEAD_STILL_SWAY)
+            self.last_head_voice_alert = now
+
+    # ===== ALERTE TÊTE BAISSÉE =====
+    def _head_down_alert(self, now, head_down_duration):
+        if not self.head_down_alert_active:
+            self._emit("log", now, text=f"⚠️ [TÊTE BAISSÉE] ALERTE ! Durée: {head_down_duration:.1f}s")
+            self._emit("voice", now, text=VOICE_HEAD_DOWN)
+            self._emit("beep", now, frequency=2200, duration=300)
+            self.head_down_alert_active = True
+            self.last_head_down_beep = now
+            self.last_head_down_voice = now
+            self._alert(now, "Tête baissée", 1, head_down_duration,
+                        f"ALERTE ! Tête baissée depuis {head_down_duration:.1f}s", "info")
+            return
+
+        if (now - self.last_head_down_beep) >= HEAD_DOWN_BEEP_INTERVAL:
+            self._emit("beep", now, frequency=2200, duration=200)
+            self.last_head_down_beep = now
+            self._emit("log", now, text=f"🔔 [TÊTE BAISSÉE] Bip ! {head_down_duration:.1f}s")
+
+        if (now - self.last_head_down_voice) >= ALERT_REPEAT_INTERVAL:
+            self._emit("log", now, text=f"🔔 [TÊTE BAISSÉE] Alerte vocale ! {head_down_duration:.1f}s")
+            self._emit("voice", now, text=VOICE_HEAD_STILL_DOWN)
+            self.last_head_down_voice = now
+
+
+# -----------------------
+# ABONNÉS
+# -----------------------
+
+def print_events(event):
+    """Abonné : lignes de journal sur la console"""
+    if event["kind"] == "log":
+        print(event["text"])
+
+
+def dashboard_subscriber(exporter):
+    """Abonné : alertes et messages vers le DashboardExporter"""
+    def on_event(event):
+        if event["kind"] == "alert":
+            exporter.add_message(event["message"], event["severity"])
+            exporter.add_alert(event["type"], event["level"], event["duration"])
+    return on_event
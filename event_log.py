@@ -0,0 +1,200 @@
+"""
+Journaux d'événements en JSONL, en ajout seul, avec rotation et index
+Pour garder tout l'historique des alertes et du dialogue sans réécrire de fichier
+
+Chaque événement est une ligne JSON ajoutée à la fin du segment courant
+(`logs/<nom>-000001.jsonl`, ...). Un nouveau segment est ouvert quand le
+courant dépasse SEGMENT_BYTES ou SEGMENT_SECONDS, et à chaque session.
+L'index `logs/<nom>.idx` contient un enregistrement de taille fixe par
+événement (segment, position de la ligne, date) : le numéro d'un
+événement donne directement sa position, et un lecteur peut lire les
+lignes arrivées depuis son dernier passage sans reparser le reste.
+
+L'index est écrit après la ligne : un événement présent dans l'index est
+toujours complet dans son segment. `logs/<nom>.session` contient le numéro
+du premier événement de la session en cours (écrit à l'ouverture du
+journal) : le serveur peut n'afficher que la session courante, comme les
+agrégats de alert_stats.json.
+"""
+
+import json
+import os
+import struct
+import threading
+import time
+from collections import deque
+
+
+LOG_DIR = "logs"
+SEGMENT_BYTES = 4 * 1024 * 1024   # rotation par taille
+SEGMENT_SECONDS = 3600.0          # rotation par durée
+
+_INDEX = struct.Struct("<IQd")    # segment, position de la ligne, date (epoch)
+
+
+def _segment_path(directory, name, segment):
+    return os.path.join(directory, f"{name}-{segment:06d}.jsonl")
+
+
+def _session_path(directory, name):
+    return os.path.join(directory, f"{name}.session")
+
+
+class EventLogWriter:
+    """Ajout d'événements dans un journal (côté détection)"""
+
+    def __init__(self, directory, name, segment_bytes=SEGMENT_BYTES,
+                 segment_seconds=SEGMENT_SECONDS):
+        self.directory = directory
+        self.name = name
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        os.makedirs(directory, exist_ok=True)
+
+        index_path = os.path.join(directory, f"{name}.idx")
+        self.index = open(index_path, "ab")
+        # Enregistrement incomplet (arrêt brutal pendant l'écriture) : on le retire
+        size = self.index.tell()
+        if size % _INDEX.size:
+            self.index.truncate(size - size % _INDEX.size)
+            self.index.seek(0, os.SEEK_END)
+        self.count = self.index.tell() // _INDEX.size
+
+        # Nouvelle session : nouveau segment après le dernier existant
+        last = 0
+        if self.count:
+            with open(index_path, "rb") as f:
+                f.seek((self.count - 1) * _INDEX.size)
+                last = _INDEX.unpack(f.read(_INDEX.size))[0]
+        self.appended = 0          # événements ajoutés par cette instance (la session)
+        self.segment = last
+        self.segment_file = None
+        self.segment_start = 0.0
+        self._rotate()
+
+        # Début de la session : remplacé d'un bloc (jamais lu à moitié écrit)
+        session_path = _session_path(directory, name)
+        with open(session_path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(str(self.count))
+        os.replace(session_path + ".tmp", session_path)
+
+    def _rotate(self):
+        if self.segment_file is not None:
+            self.segment_file.close()
+        self.segment += 1
+        self.segment_file = open(_segment_path(self.directory, self.name, self.segment), "ab")
+        self.segment_start = time.time()
+
+    def append(self, entry):
+        """Ajoute un événement (dict) à la fin du journal"""
+        now = time.time()
+        if (self.segment_file.tell() >= self.segment_bytes or
+                now - self.segment_start >= self.segment_seconds):
+            self._rotate()
+        offset = self.segment_file.tell()
+        self.segment_file.write((json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8"))
+        self.segment_file.flush()
+        self.index.write(_INDEX.pack(self.segment, offset, now))
+        self.index.flush()
+        self.count += 1
+        self.appended += 1
+
+    def close(self):
+        self.segment_file.close()
+        self.index.close()
+
+
+class EventLogReader:
+    """Lecture d'un journal par numéro d'événement (côté serveur)"""
+
+    def __init__(self, directory, name):
+        self.directory = directory
+        self.name = name
+        self.index_path = os.path.join(directory, f"{name}.idx")
+        self.session_path = _session_path(directory, name)
+
+    def exists(self):
+        return os.path.exists(self.index_path)
+
+    def mtime(self):
+        """Date du dernier événement ajouté (l'index est écrit après chaque ligne), None sans journal"""
+        try:
+            return os.path.getmtime(self.index_path)
+        except OSError:
+            return None
+
+    def session_start(self):
+        """Numéro du premier événement de la dernière session (0 si inconnu)"""
+        try:
+            with open(self.session_path, "r", encoding="utf-8") as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return 0
+
+    def count(self):
+        """Nombre d'événements complets dans le journal"""
+        try:
+            return os.path.getsize(self.index_path) // _INDEX.size
+        except OSError:
+            return 0
+
+    def read(self, start, stop=None):
+        """Événements start <= numéro < stop (stop = fin actuelle du journal)"""
+        total = self.count()
+        stop = total if stop is None else min(stop, total)
+        start = max(start, 0)
+        if start >= stop:
+            return []
+        with open(self.index_path, "rb") as f:
+            f.seek(start * _INDEX.size)
+            raw = f.read((stop - start) * _INDEX.size)
+        positions = [_INDEX.unpack_from(raw, i * _INDEX.size)
+                     for i in range(len(raw) // _INDEX.size)]
+
+        entries = []
+        i = 0
+        while i < len(positions):
+            # Lignes consécutives d'un même segment : une seule ouverture
+            segment, offset, _ = positions[i]
+            j = i
+            while j < len(positions) and positions[j][0] == segment:
+                j += 1
+            with open(_segment_path(self.directory, self.name, segment), "rb") as f:
+                f.seek(offset)
+                for _ in range(j - i):
+                    entries.append(json.loads(f.readline()))
+            i = j
+        return entries
+
+
+class EventLogTail:
+    """Derniers événements de la session en cours, mis à jour en ne lisant que les nouvelles lignes"""
+
+    def __init__(self, directory, name, keep):
+        self.reader = EventLogReader(directory, name)
+        self.entries = deque(maxlen=keep)
+        self.position = 0
+        self.session = 0          # premier événement de la session suivie
+        self.lock = threading.Lock()
+
+    def poll(self):
+        """Lit les événements arrivés depuis le dernier appel, retourne la liste gardée
+        (None si le journal n'existe pas)"""
+        with self.lock:
+            if not self.reader.exists():
+                return None
+            total = self.reader.count()
+            session = self.reader.session_start()
+            if total < self.position or session != self.session:
+                # Nouvelle session (ou journal recréé) : on repart de son début
+                self.entries.clear()
+                self.session = session
+                self.position = min(session, total)
+            if total > self.position:
+                start = max(self.position, total - self.entries.maxlen)
+                try:
+                    self.entries.extend(self.reader.read(start, total))
+                    self.position = total
+                except (OSError, ValueError) as e:
+                    print(f"Erreur lecture journal {self.reader.name}: {e}")
+            return list(self.entries)
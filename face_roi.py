@@ -0,0 +1,157 @@
+"""
+Recadrage de l'entrée FaceMesh sur la zone du visage (ROI)
+Pour réduire le coût de conversion couleur et de préparation de l'image par frame
+
+Le visage du conducteur reste à peu près au même endroit d'une frame à
+l'autre : on recadre l'image autour de la boîte englobante des landmarks de
+la frame précédente (avec une marge), on la ramène à une taille cible fixe,
+et seule cette zone est convertie en RGB. Les landmarks obtenus sont ramenés
+en coordonnées de l'image complète. Quand le visage est perdu dans la ROI,
+on repasse sur l'image complète (dans la même frame).
+
+Deux instances FaceMesh sont utilisées : le suivi interne de MediaPipe
+suppose une géométrie d'image stable, on ne mélange donc pas les images
+recadrées et les images complètes dans la même instance.
+"""
+
+import cv2
+
+from landmark_features import landmarks_to_array
+
+
+ROI_ENABLED = True         # FaceMesh sur la zone du visage seulement (main.py, multi_camera.py)
+ROI_PADDING = 0.6          # marge autour du visage (fraction de sa taille, de chaque côté)
+ROI_TARGET_SIZE = 256      # côté (pixels) de l'image carrée envoyée à FaceMesh
+ROI_MIN_FILL = 0.35        # visage trop petit dans la ROI -> on recadre
+ROI_MAX_FRAME_RATIO = 0.9  # ROI presque aussi grande que l'image -> image complète
+
+
+def create_face_mesh(static_image_mode=False):
+    """FaceMesh avec les réglages du projet (un seul visage, iris raffinés)"""
+    # Import ici : mediapipe est le plus long à charger (~1 s), il se charge
+    # en parallèle de l'ouverture de la caméra au lieu de la précéder
+    import mediapipe as mp
+    return mp.solutions.face_mesh.FaceMesh(
+        static_image_mode=static_image_mode,
+        max_num_faces=1,
+        refine_landmarks=True,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5
+    )
+
+
+class RoiFaceMesh:
+    """FaceMesh sur la zone du visage suivi, avec repli sur l'image complète.
+
+    create_face_mesh(static_image_mode) doit retourner une instance FaceMesh.
+    timer : PerfTimer optionnel (étapes "cvtColor" et "face_mesh").
+    """
+
+    def __init__(self, create_face_mesh, enabled=True,
+                 padding=ROI_PADDING, target_size=ROI_TARGET_SIZE, timer=None):
+        self.enabled = enabled
+        self.timer = timer
+        self.padding = padding
+        self.target_size = target_size
+        self.roi = None   # (x0, y0, x1, y1) en pixels de l'image complète
+
+        # Image complète : détection à chaque appel en mode ROI (repli sans état),
+        # suivi vidéo classique sinon
+        self.full_mesh = create_face_mesh(static_image_mode=enabled)
+        self.roi_mesh = create_face_mesh(static_image_mode=False) if enabled else None
+
+        # Compteurs
+        self.frames_full = 0
+        self.frames_cropped = 0
+        self.roi_misses = 0   # visage perdu dans la ROI, frame refaite sur l'image complète
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.full_mesh.close()
+        if self.roi_mesh is not None:
+            self.roi_mesh.close()
+
+    def process(self, frame):
+        """Landmarks utiles (K, 3) normalisés sur l'image complète, ou None si pas de visage"""
+        h, w = frame.shape[:2]
+
+        if self.roi is not None:
+            x0, y0, x1, y1 = self.roi
+            # Taille d'entrée constante : FaceMesh garde son suivi d'une frame à l'autre
+            crop = cv2.resize(frame[y0:y1, x0:x1], (self.target_size, self.target_size),
+                              interpolation=cv2.INTER_LINEAR)
+            rgb = cv2.cvtColor(crop, cv2.COLOR_BGR2RGB)
+            self._mark("cvtColor")
+            results = self.roi_mesh.process(rgb)
+            self._mark("face_mesh")
+            self.frames_cropped += 1
+            if results.multi_face_landmarks:
+                points = self._to_frame(
+                    landmarks_to_array(results.multi_face_landmarks[0].landmark), w, h)
+                self._update_roi(points, w, h)
+                return points
+            self.roi_misses += 1
+            self.roi = None
+
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        self._mark("cvtColor")
+        results = self.full_mesh.process(rgb)
+        self._mark("face_mesh")
+        self.frames_full += 1
+        if not results.multi_face_landmarks:
+            return None
+        points = landmarks_to_array(results.multi_face_landmarks[0].landmark)
+        if self.enabled:
+            self._update_roi(points, w, h)
+        return points
+
+    def _mark(self, stage):
+        if self.timer is not None:
+            self.timer.mark(stage)
+
+    def _to_frame(self, points, w, h):
+        """Ramène des landmarks normalisés dans la ROI en coordonnées de l'image complète"""
+        x0, y0, x1, y1 = self.roi
+        crop_w, crop_h = x1 - x0, y1 - y0
+        points[:, 0] = (points[:, 0] * crop_w + x0) / w
+        points[:, 1] = (points[:, 1] * crop_h + y0) / h
+        points[:, 2] *= crop_w / w   # z FaceMesh est à l'échelle de la largeur de l'image
+        return points
+
+    def _update_roi(self, points, w, h):
+        """Met à jour la ROI d'après les landmarks (image complète) de la frame courante"""
+        bx0, by0 = points[:, 0].min() * w, points[:, 1].min() * h
+        bx1, by1 = points[:, 0].max() * w, points[:, 1].max() * h
+        face_side = max(bx1 - bx0, by1 - by0)
+
+        # On garde la ROI tant que le visage reste bien à l'intérieur : une
+        # zone stable d'une frame à l'autre laisse FaceMesh suivre le visage
+        if self.roi is not None:
+            x0, y0, x1, y1 = self.roi
+            margin = (x1 - x0) * self.padding / (1 + 2 * self.padding) / 2
+            inside = (bx0 >= x0 + margin and by0 >= y0 + margin and
+                      bx1 <= x1 - margin and by1 <= y1 - margin)
+            if inside and face_side >= (x1 - x0) * ROI_MIN_FILL:
+                return
+
+        side = int(face_side * (1 + 2 * self.padding))
+        if side <= 0 or side >= min(w, h) * ROI_MAX_FRAME_RATIO:
+            self.roi = None
+            return
+        cx, cy = (bx0 + bx1) / 2, (by0 + by1) / 2
+        x0 = int(min(max(cx - side / 2, 0), w - side))
+        y0 = int(min(max(cy - side / 2, 0), h - side))
+        self.roi = (x0, y0, x0 + side, y0 + side)
+
+    def reset(self):
+        """Nouvelle vidéo : on repart de l'image complète"""
+        self.roi = None
+
+    def get_stats(self):
+        """Retourne (frames image complète, frames recadrées, pertes dans la ROI)"""
+        return self.frames_full, self.frames_cropped, self.roi_misses
@@ -0,0 +1,110 @@
+"""
+Fréquence d'inférence adaptative
+Pour économiser CPU et énergie quand le conducteur est clairement éveillé
+
+Tant que l'EAR et le pitch restent loin des seuils, que la tête est stable
+et qu'aucune alerte n'est en cours, FaceMesh n'est lancé que sur une partie
+des frames (au plus MAX_SKIP_INTERVAL secondes entre deux inférences). Les
+frames sautées reçoivent les derniers rapports yeux / bouche mesurés (EAR
+gauche, droite, moyenne et MAR, jamais extrapolés : une frame sautée ne
+peut pas créer de temps yeux fermés qu'aucune inférence n'a vu) et des
+angles prolongés à partir des deux dernières inférences.
+Dès qu'un signal s'approche d'un seuil, que l'EAR varie ou qu'une alerte
+est active, on repasse à pleine cadence.
+"""
+
+
+EAR_MARGIN = 0.06            # EAR au-dessus du seuil + marge -> yeux clairement ouverts
+PITCH_MARGIN = 8.0           # pitch au-dessus du seuil tête baissée + marge (degrés)
+MAX_ANGLE_SPEED = 30.0       # variation max pitch/yaw (°/s) pour considérer la tête stable
+MAX_EAR_SPEED = 0.1          # variation max de l'EAR (par seconde) pour considérer les yeux stables
+EXTRAPOLATED = ("pitch", "yaw", "roll")   # seules valeurs prolongées sur une frame sautée
+MIN_SKIP_INTERVAL = 0.05     # premier palier d'espacement des inférences (secondes)
+MAX_SKIP_INTERVAL = 0.25     # espacement max, très inférieur à MIN_CLOSED_SECONDS
+
+
+class InferenceScheduler:
+    """Décide à chaque frame s'il faut lancer FaceMesh ou prolonger la dernière mesure"""
+
+    def __init__(self, ear_threshold, head_down_threshold, enabled=True,
+                 max_interval=MAX_SKIP_INTERVAL):
+        self.ear_threshold = ear_threshold
+        self.head_down_threshold = head_down_threshold
+        self.enabled = enabled
+        self.max_interval = max_interval
+
+        self.interval = 0.0          # 0 = pleine cadence
+        self.last_time = None
+        self.last_points = None
+        self.last_features = None
+        self.prev_time = None
+        self.prev_features = None
+
+        # Compteurs
+        self.frames_inferred = 0
+        self.frames_skipped = 0
+
+    def should_infer(self, now, busy=False):
+        """True s'il faut lancer FaceMesh sur cette frame.
+
+        busy : une alerte ou un début d'événement est en cours (pleine cadence).
+        """
+        if not self.enabled or busy or self.last_features is None:
+            self.interval = 0.0
+        if self.interval == 0.0 or now - self.last_time >= self.interval:
+            self.frames_inferred += 1
+            return True
+        self.frames_skipped += 1
+        return False
+
+    def observe(self, now, points, features):
+        """Enregistre le résultat d'une inférence (points None = pas de visage)"""
+        self.prev_time, self.prev_features = self.last_time, self.last_features
+        self.last_time, self.last_points, self.last_features = now, points, features
+
+        if features is None or not self._is_stable():
+            self.interval = 0.0
+        else:
+            self.interval = min(max(self.interval * 2, MIN_SKIP_INTERVAL), self.max_interval)
+
+    def _is_stable(self):
+        f = self.last_features
+        if f["ear"] < self.ear_threshold + EAR_MARGIN:
+            return False
+        if f["pitch"] < self.head_down_threshold + PITCH_MARGIN:
+            return False
+        if self.prev_features is None:
+            return False
+        dt = self.last_time - self.prev_time
+        if dt <= 0:
+            return False
+        # Une EAR qui baisse, même lentement, peut annoncer une fermeture
+        ear_speed = abs(f["ear"] - self.prev_features["ear"]) / dt
+        pitch_speed = abs(f["pitch"] - self.prev_features["pitch"]) / dt
+        yaw_speed = abs(f["yaw"] - self.prev_features["yaw"]) / dt
+        return (ear_speed < MAX_EAR_SPEED and pitch_speed < MAX_ANGLE_SPEED
+                and yaw_speed < MAX_ANGLE_SPEED)
+
+    def interpolate(self, now):
+        """Features estimées pour une frame sautée.
+
+        Rapports yeux / bouche (EAR, MAR) : dernières valeurs mesurées.
+        Angles (EXTRAPOLATED) : prolongement linéaire des 2 dernières
+        mesures, seuls couverts par une marge (PITCH_MARGIN couvre
+        MAX_ANGLE_SPEED sur un intervalle de saut).
+        """
+        last, prev = self.last_features, self.prev_features
+        features = dict(last)
+        dt = self.last_time - self.prev_time if prev is not None else 0.0
+        if dt <= 0:
+            return features
+        # Le prolongement ne dépasse jamais un intervalle de saut
+        t = min(now - self.last_time, self.max_interval) / dt
+        for k in EXTRAPOLATED:
+            if k in last:
+                features[k] = last[k] + (last[k] - prev[k]) * t
+        return features
+
+    def get_stats(self):
+        """Retourne (frames inférées, frames sautées)"""
+        return self.frames_inferred, self.frames_skipped
@@ -0,0 +1,154 @@
+"""
+Extraction vectorisée des caractéristiques du visage (NumPy)
+EAR des deux yeux, MAR (bouche) et pose de la tête (pitch / yaw / roll)
+
+Les landmarks FaceMesh utiles sont copiés une seule fois dans un tableau
+(K, 3) en float, sans arrondi en pixels entiers. Les mêmes fonctions
+acceptent un lot de frames (F, K, 3) pour le rejeu hors ligne : tous les
+calculs y sont faits en opérations sur tableaux.
+
+Benchmark : python benchmarks/bench_features.py
+"""
+
+import math
+
+import numpy as np
+
+
+# Indices FaceMesh
+LEFT_EYE = {"outer": 33, "inner": 133, "upper": 159, "lower": 145}
+RIGHT_EYE = {"outer": 263, "inner": 362, "upper": 386, "lower": 374}
+MOUTH = {"left": 61, "right": 291, "upper": 13, "lower": 14}
+
+# Points pour calculer l'orientation de la tête
+NOSE_TIP = 1
+CHIN = 152
+FOREHEAD = 10
+LEFT_EAR = 234
+RIGHT_EAR = 454
+
+# Landmarks réellement utilisés, dans l'ordre du tableau compact (K, 3)
+FEATURE_LANDMARKS = (
+    LEFT_EYE["outer"], LEFT_EYE["inner"], LEFT_EYE["upper"], LEFT_EYE["lower"],
+    RIGHT_EYE["outer"], RIGHT_EYE["inner"], RIGHT_EYE["upper"], RIGHT_EYE["lower"],
+    MOUTH["left"], MOUTH["right"], MOUTH["upper"], MOUTH["lower"],
+    NOSE_TIP, CHIN, FOREHEAD, LEFT_EAR, RIGHT_EAR,
+)
+_FEATURE_INDEX = np.array(FEATURE_LANDMARKS)
+
+# Positions dans le tableau compact
+_L_OUTER, _L_INNER, _L_UPPER, _L_LOWER = 0, 1, 2, 3
+_R_OUTER, _R_INNER, _R_UPPER, _R_LOWER = 4, 5, 6, 7
+_M_LEFT, _M_RIGHT, _M_UPPER, _M_LOWER = 8, 9, 10, 11
+_NOSE, _CHIN, _FOREHEAD, _L_EAR, _R_EAR = 12, 13, 14, 15, 16
+_EYE_POINTS = [_L_OUTER, _L_INNER, _L_UPPER, _L_LOWER,
+               _R_OUTER, _R_INNER, _R_UPPER, _R_LOWER]
+
+
+def landmarks_to_array(landmarks, indices=FEATURE_LANDMARKS):
+    """Copie les landmarks FaceMesh utiles dans un tableau (K, 3) normalisé"""
+    points = [landmarks[i] for i in indices]
+    return np.array([(p.x, p.y, p.z) for p in points], dtype=np.float64)
+
+
+def to_feature_points(points):
+    """Ramène un tableau (..., N, 3) de tous les landmarks au tableau compact (..., K, 3)"""
+    points = np.asarray(points, dtype=np.float64)
+    if points.shape[-2] != len(FEATURE_LANDMARKS):
+        points = points[..., _FEATURE_INDEX, :]
+    return points
+
+
+# Paires (départ, arrivée) des vecteurs calculés en une seule indexation :
+# 0-1 oeil gauche (vertical, horizontal), 2-3 oeil droit, 4-5 bouche,
+# 6 oreille droite -> gauche, 7 menton -> front
+_VEC_FROM = [_L_UPPER, _L_OUTER, _R_UPPER, _R_OUTER, _M_UPPER, _M_LEFT, _L_EAR, _FOREHEAD]
+_VEC_TO = [_L_LOWER, _L_INNER, _R_LOWER, _R_INNER, _M_LOWER, _M_RIGHT, _R_EAR, _CHIN]
+
+
+def _ratio(num, den):
+    """num / den, 0 quand den == 0 (comme eye_aspect_ratio)"""
+    return np.divide(num, den, out=np.zeros(np.shape(num)), where=den > 0)
+
+
+def compute_features(points, w, h):
+    """Calcule EAR, MAR et pose de la tête pour une frame ou un lot de frames.
+
+    points : (K, 3) / (F, K, 3) compact, ou (N, 3) / (F, N, 3) complet,
+    en coordonnées normalisées FaceMesh. Retourne un dict (left_ear,
+    right_ear, ear, mar, pitch, yaw, roll) de flottants pour une frame ou
+    de tableaux (F,) pour un lot.
+    """
+    p = to_feature_points(points)
+    if p.ndim == 2:
+        # Une seule frame : sur 17 points le coût fixe de chaque appel NumPy
+        # dépasse le calcul lui-même, même formules en flottants Python
+        return _frame_features(p.tolist(), w, h)
+
+    p = p * np.array([w, h, w], dtype=np.float64)
+    v = p[..., _VEC_FROM, :] - p[..., _VEC_TO, :]
+    sq = v * v
+    xy2 = sq[..., 0] + sq[..., 1]
+    dist = np.sqrt(xy2)
+
+    # EAR gauche, EAR droit et MAR en une division
+    left_ear, right_ear, mar = np.moveaxis(_ratio(dist[..., 0:6:2], dist[..., 1:6:2]), -1, 0)
+
+    # Yaw (rotation gauche-droite)
+    ear_vec = v[..., 6, :]
+    ear_distance = np.sqrt(xy2[..., 6] + sq[..., 6, 2])
+    yaw = np.degrees(np.arcsin(np.clip(_ratio(ear_vec[..., 0], ear_distance), -1.0, 1.0)))
+
+    # Pitch (inclinaison haut-bas)
+    pitch = np.degrees(np.arctan2(v[..., 7, 2], dist[..., 7]))
+
+    # Roll (inclinaison latérale, dans le plan de l'image)
+    roll = np.degrees(np.arctan2(-ear_vec[..., 1], -ear_vec[..., 0]))
+
+    return {
+        "left_ear": left_ear,
+        "right_ear": right_ear,
+        "ear": (left_ear + right_ear) / 2.0,
+        "mar": mar,
+        "pitch": pitch,
+        "yaw": yaw,
+        "roll": roll,
+    }
+
+
+def _frame_features(rows, w, h):
+    """compute_features pour une frame (K, 3) déjà convertie en liste"""
+    vecs = []
+    for i, j in zip(_VEC_FROM, _VEC_TO):
+        a, b = rows[i], rows[j]
+        vecs.append(((a[0] - b[0]) * w, (a[1] - b[1]) * h, (a[2] - b[2]) * w))
+    dist = [math.hypot(x, y) for x, y, _ in vecs]
+
+    def ratio(num, den):
+        return num / den if den > 0 else 0.0
+
+    left_ear = ratio(dist[0], dist[1])
+    right_ear = ratio(dist[2], dist[3])
+    mar = ratio(dist[4], dist[5])
+
+    ex, ey, ez = vecs[6]
+    ear_distance = math.sqrt(ex * ex + ey * ey + ez * ez)
+    yaw = math.degrees(math.asin(min(max(ratio(ex, ear_distance), -1.0), 1.0)))
+    pitch = math.degrees(math.atan2(vecs[7][2], dist[7]))
+    roll = math.degrees(math.atan2(-ey, -ex))
+
+    return {
+        "left_ear": left_ear,
+        "right_ear": right_ear,
+        "ear": (left_ear + right_ear) / 2.0,
+        "mar": mar,
+        "pitch": pitch,
+        "yaw": yaw,
+        "roll": roll,
+    }
+
+
+def eye_points_px(points, w, h):
+    """Points des deux yeux en pixels entiers (pour l'affichage)"""
+    eyes = to_feature_points(points)[_EYE_POINTS, :2] * (w, h)
+    return [tuple(p) for p in eyes.astype(int).tolist()]
@@ -0,0 +1,209 @@
+"""
+Enregistrement et relecture des landmarks FaceMesh
+Pour réanalyser une session avec d'autres seuils sans relancer MediaPipe
+
+Chaque frame inférée ajoute un enregistrement de taille fixe : horodatage
+et les FEATURE_LANDMARKS utilisés par la détection (17 points x, y, z
+normalisés, en float32 ou float16, NaN quand aucun visage n'est détecté).
+Le fichier commence par un en-tête (format, nombre de points, taille de
+l'image) suivi des enregistrements : il se lit directement en mémoire
+projetée (np.memmap), et le nombre de frames se déduit de sa taille (un
+enregistrement interrompu par un arrêt brutal est ignoré).
+
+float32 par défaut. float16 (dtype="float16") divise la taille par deux
+mais arrondit les coordonnées à un pas de 0.3 à 0.6 px pour une image de
+640 à 1280 px : sur un œil de quelques pixels de haut, l'EAR bouge de
+l'ordre de 0.01, assez pour faire passer des frames d'un côté ou de
+l'autre du seuil. À réserver à l'archivage, pas à la calibration.
+
+La relecture calcule toutes les features en une passe NumPy puis les passe
+au DrowsinessEngine frame par frame, sans aucune inférence.
+
+Usage :
+    python landmark_recording.py recordings/session_20241201_143000.lmk
+    python landmark_recording.py session.lmk --ear-threshold 0.21 --head-down-threshold -12
+"""
+
+import argparse
+import os
+import struct
+import time
+
+import numpy as np
+
+from landmark_features import FEATURE_LANDMARKS, compute_features, to_feature_points
+
+
+RECORDINGS_DIR = "recordings"
+RECORDING_SUFFIX = ".lmk"
+DEFAULT_DTYPE = "float32"       # ~23 Mo par heure à 30 fps ("float16" : ~12 Mo, moins précis)
+BUFFER_FRAMES = 256             # frames gardées en mémoire entre deux écritures
+
+MAGIC = b"DFLM"
+FORMAT_VERSION = 1
+HEADER_SIZE = 64
+_HEADER = struct.Struct("<4sIIIII")   # magic, version, points, octets par valeur, largeur, hauteur
+
+_VALUE_DTYPES = {2: "<f2", 4: "<f4"}
+
+
+def record_dtype(num_points=len(FEATURE_LANDMARKS), value_size=4):
+    """dtype d'un enregistrement : horodatage + points (num_points, 3)"""
+    return np.dtype([
+        ("t", "<f8"),
+        ("points", _VALUE_DTYPES[value_size], (num_points, 3)),
+    ])
+
+
+class LandmarkRecorder:
+    """Ajout des landmarks d'une frame par appel (côté détection)"""
+
+    def __init__(self, path, width, height, dtype=DEFAULT_DTYPE):
+        self.path = path
+        value_size = np.dtype(dtype).itemsize
+        self.dtype = record_dtype(len(FEATURE_LANDMARKS), value_size)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.file = open(path, "wb")
+        header = _HEADER.pack(MAGIC, FORMAT_VERSION, len(FEATURE_LANDMARKS), value_size,
+                              width, height)
+        self.file.write(header.ljust(HEADER_SIZE, b"\0"))
+
+        self.buffer = np.empty(BUFFER_FRAMES, dtype=self.dtype)
+        self.pending = 0
+        self.frames = 0
+
+    def record(self, t, points):
+        """Ajoute une frame (points : landmarks NumPy complets ou compacts, None sans visage)"""
+        row = self.buffer[self.pending]
+        row["t"] = t
+        if points is None:
+            row["points"] = np.nan
+        else:
+            row["points"] = to_feature_points(points)
+        self.pending += 1
+        self.frames += 1
+        if self.pending == BUFFER_FRAMES:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.file.write(self.buffer[:self.pending].tobytes())
+            self.file.flush()
+            self.pending = 0
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+def new_recording_path(directory=RECORDINGS_DIR):
+    """recordings/session_AAAAMMJJ_HHMMSS.lmk"""
+    return os.path.join(directory, time.strftime("session_%Y%m%d_%H%M%S") + RECORDING_SUFFIX)
+
+
+class LandmarkRecording:
+    """Enregistrement projeté en mémoire (lecture seule)"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+        if len(header) < _HEADER.size:
+            raise ValueError(f"Enregistrement invalide: {path}")
+        magic, version, num_points, value_size, self.width, self.height = _HEADER.unpack_from(header)
+        if magic != MAGIC or version != FORMAT_VERSION or value_size not in _VALUE_DTYPES:
+            raise ValueError(f"Enregistrement invalide: {path}")
+
+        self.dtype = record_dtype(num_points, value_size)
+        count = max(os.path.getsize(path) - HEADER_SIZE, 0) // self.dtype.itemsize
+        if count:
+            self.records = np.memmap(path, dtype=self.dtype, mode="r",
+                                     offset=HEADER_SIZE, shape=(count,))
+        else:
+            self.records = np.empty(0, dtype=self.dtype)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def timestamps(self):
+        return self.records["t"]
+
+    @property
+    def points(self):
+        """(F, K, 3) dans le type stocké (NaN sans visage)"""
+        return self.records["points"]
+
+    def face_mask(self):
+        return ~np.isnan(self.points[:, 0, 0])
+
+    def features(self):
+        """Features de toutes les frames en une passe : dict de tableaux (F,)"""
+        return compute_features(self.points.astype(np.float64), self.width, self.height)
+
+
+def replay(recording, engine):
+    """Rejoue un enregistrement dans un DrowsinessEngine, sans inférence.
+
+    Générateur de (horodatage, métriques, événements) pour chaque frame.
+    """
+    face = recording.face_mask().tolist()
+    features = recording.features()
+    ears = features["ear"].tolist()
+    pitches = features["pitch"].tolist()
+    yaws = features["yaw"].tolist()
+    points = recording.points
+    w, h = recording.width, recording.height
+
+    for i, t in enumerate(recording.timestamps.tolist()):
+        if face[i]:
+            m, events = engine.process(t, points[i], w, h,
+                                       {"ear": ears[i], "pitch": pitches[i], "yaw": yaws[i]})
+        else:
+            m, events = engine.process(t, None, w, h)
+        yield t, m, events
+
+
+def main():
+    from drowsiness_engine import (DrowsinessEngine, EAR_THRESHOLD, HEAD_DOWN_THRESHOLD,
+                                   MIN_CLOSED_SECONDS, HEAD_DOWN_DURATION)
+
+    parser = argparse.ArgumentParser(description="Rejoue un enregistrement de landmarks avec d'autres seuils")
+    parser.add_argument("recording", help="Fichier .lmk")
+    parser.add_argument("--ear-threshold", type=float, default=EAR_THRESHOLD)
+    parser.add_argument("--head-down-threshold", type=float, default=HEAD_DOWN_THRESHOLD)
+    parser.add_argument("--min-closed-seconds", type=float, default=MIN_CLOSED_SECONDS)
+    parser.add_argument("--head-down-duration", type=float, default=HEAD_DOWN_DURATION)
+    args = parser.parse_args()
+
+    recording = LandmarkRecording(args.recording)
+    engine = DrowsinessEngine(ear_threshold=args.ear_threshold,
+                              head_down_threshold=args.head_down_threshold,
+                              min_closed_seconds=args.min_closed_seconds,
+                              head_down_duration=args.head_down_duration)
+    if len(recording) == 0:
+        print("❌ Enregistrement vide.")
+        return
+    start_time = recording.timestamps[0]
+
+    started = time.perf_counter()
+    alerts = 0
+    for t, _, events in replay(recording, engine):
+        for event in events:
+            if event["kind"] == "alert":
+                alerts += 1
+                print(f"🚨 {t - start_time:8.2f}s  {event['type']} (niveau {event['level']}, "
+                      f"{event['duration']:.1f}s)")
+    elapsed = time.perf_counter() - started
+
+    duration = recording.timestamps[-1] - start_time
+    print(f"\n✅ {len(recording)} frames ({duration:.0f}s de session) rejouées en {elapsed:.2f}s "
+          f"({len(recording) / elapsed:.0f} frames/s) — {alerts} alertes, "
+          f"PERCLOS final {engine.perclos.perclos() * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
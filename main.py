@@ -1,113 +1,56 @@
+import time
+PROCESS_START = time.perf_counter()   # origine du temps de démarrage (imports compris)
+
 import cv2
 import numpy as np
-import mediapipe as mp
 import math
-import time
+import sys
 import threading
-import pyttsx3
-from collections import deque
-import winsound  # Pour les bips sonores (Windows)
+from concurrent.futures import ThreadPoolExecutor
+from audio_alerts import AlertSystem  # 🔊 Bips, sirène et voix sur un seul thread
 from dashboard_exporter import DashboardExporter  # 📊 Export pour dashboard
+from capture import FrameGrabber
+from face_roi import ROI_ENABLED, RoiFaceMesh, create_face_mesh
+from inference_scheduler import InferenceScheduler
+from perf_stats import PerfTimer, StartupTimer
+from landmark_recording import LandmarkRecorder, new_recording_path
+from landmark_features import (
+    LEFT_EYE, RIGHT_EYE, NOSE_TIP, CHIN, FOREHEAD, LEFT_EAR, RIGHT_EAR,
+    compute_features, eye_points_px
+)
+from drowsiness_engine import (
+    EAR_THRESHOLD, MIN_CLOSED_SECONDS, ALERT_REPEAT_INTERVAL, BEEP_INTERVAL,
+    HEAD_DOWN_THRESHOLD, VOICE_PHRASES, DrowsinessEngine,
+    print_events, dashboard_subscriber
+)
+IMPORTS_DONE = time.perf_counter()
 
 
 # -----------------------
 # PARAMÈTRES À RÉGLER
 # -----------------------
-EAR_THRESHOLD = 0.23          # seuil de fermeture des yeux (à ajuster après test)
-MIN_CLOSED_SECONDS = 1.5      # durée minimale yeux fermés pour déclencher l'alerte
-ALERT_REPEAT_INTERVAL = 5.0   # répéter l'alerte toutes les 5 secondes
-BEEP_INTERVAL = 1.0           # bip sonore toutes les 1 seconde pendant alerte
-PERCLOS_WINDOW = 60.0         # fenêtre (secondes) pour estimer le "PERCLOS light"
+# Seuils de détection : voir drowsiness_engine.py
 
-# Paramètres détection mouvements de tête
-HEAD_MOVEMENT_THRESHOLD = 12.0  # degrés de rotation pour considérer un mouvement
-HEAD_MOVEMENT_WINDOW = 6.0      # fenêtre de temps (secondes) pour compter les mouvements
-MIN_HEAD_MOVEMENTS = 4          # nombre minimum de changements de direction
-HEAD_DROWSY_DURATION = 3.0      # durée minimale de balancement pour confirmer somnolence
+# Paramètres capture
+CAMERA_INDEX = 0                # index de la webcam (cv2.VideoCapture)
+# Délai avant flux perdu : voir capture.py ; recadrage sur le visage (ROI_ENABLED) : voir face_roi.py
+ADAPTIVE_INFERENCE = True       # moins d'inférences quand tout est stable (voir inference_scheduler.py)
+PERF_TIMING = True              # temps par étape de la boucle (dashboard /api/perf, voir perf_stats.py)
+PERF_EXPORT_INTERVAL = 1.0      # fréquence d'export des temps par étape (secondes)
+RECORD_LANDMARKS = False        # enregistre les landmarks dans recordings/ (voir landmark_recording.py)
 
-# Paramètres détection tête baissée
-HEAD_DOWN_THRESHOLD = -15.0     # pitch négatif = tête baissée (ajuster selon besoin)
-HEAD_DOWN_DURATION = 2.0        # durée minimale tête baissée pour alerte
-HEAD_DOWN_BEEP_INTERVAL = 1.5   # intervalle entre bips pour tête baissée
+# Affichage
+DISPLAY_MODE = "window"         # "window" : HUD à chaque frame, "preview" : HUD sur un thread à
+                                # PREVIEW_FPS, "headless" : aucun dessin ni fenêtre (boîtier sans écran)
+PREVIEW_FPS = 10.0              # cadence du HUD en mode "preview"
+WINDOW_NAME = "Detection Somnolence - ESC pour quitter"
 
+# Démarrage
+DASHBOARD_URL = "http://localhost:5000"   # adresse affichée (le lanceur passe la sienne)
+AUDIO_READY_TIMEOUT = 5.0       # attente max de la synthèse vocale avant de démarrer sans elle
 
-# -----------------------
-# SYSTÈME D'ALERTE SONORE
-# -----------------------
-class AlertSystem:
-    def __init__(self):
-        self.engine = pyttsx3.init()
-        self.engine.setProperty('rate', 180)
-        self.engine.setProperty('volume', 1.0)
-        self.voice_lock = threading.Lock()
-        self.is_speaking = False
-        self.voice_queue = []
-        
-        # Pour le bip continu
-        self.continuous_beep_active = False
-        self.continuous_beep_thread = None
-        
-    def beep(self, frequency=2000, duration=200):
-        """Bip sonore non bloquant"""
-        def play_beep():
-            try:
-                winsound.Beep(frequency, duration)
-            except:
-                pass  # Si erreur, on ignore (peut arriver sur Linux/Mac)
-        
-        threading.Thread(target=play_beep, daemon=True).start()
-    
-    def start_continuous_beep(self, frequency=2500):
-        """Démarre un bip VRAIMENT continu (piiiiiiii)"""
-        if self.continuous_beep_active:
-            return
-        
-        self.continuous_beep_active = True
-        
-        def continuous_loop():
-            while self.continuous_beep_active:
-                try:
-                    winsound.Beep(frequency, 2000)  # Bip de 2 secondes
-                except:
-                    pass
-        
-        self.continuous_beep_thread = threading.Thread(target=continuous_loop, daemon=True)
-        self.continuous_beep_thread.start()
-    
-    def stop_continuous_beep(self):
-        """Arrête le bip continu"""
-        self.continuous_beep_active = False
-    
-    def say_async(self, text, force=False):
-        """Parle de façon non bloquante"""
-        def speak():
-            with self.voice_lock:
-                self.is_speaking = True
-                try:
-                    self.engine.say(text)
-                    self.engine.runAndWait()
-                except:
-                    pass
-                self.is_speaking = False
-        
-        # Si force=True ou pas déjà en train de parler
-        if force or not self.is_speaking:
-            threading.Thread(target=speak, daemon=True).start()
-            return True
-        return False
-
-
-mp_face_mesh = mp.solutions.face_mesh
-
-LEFT_EYE = {"outer": 33, "inner": 133, "upper": 159, "lower": 145}
-RIGHT_EYE = {"outer": 263, "inner": 362, "upper": 386, "lower": 374}
-
-# Points pour calculer l'orientation de la tête
-NOSE_TIP = 1
-CHIN = 152
-FOREHEAD = 10
-LEFT_EAR = 234
-RIGHT_EAR = 454
+
+# Indices des landmarks : voir landmark_features.py
 
 
 def dist(p1, p2):
@@ -115,6 +58,7 @@ def dist(p1, p2):
 
 
 def eye_aspect_ratio(landmarks, eye_idx, w, h):
+    """Version point par point (référence), voir landmark_features.compute_features"""
     def pt(i):
         return (int(landmarks[i].x * w), int(landmarks[i].y * h))
     outer = pt(eye_idx["outer"])
@@ -162,493 +106,387 @@ def draw_eye_points(frame, pts):
         cv2.circle(frame, p, 2, (0, 255, 0), -1)
 
 
-class PerclosWindow:
-    def __init__(self, window_seconds=60.0):
-        self.window = deque()
-        self.window_seconds = window_seconds
-
-    def update(self, closed_now):
-        now = time.time()
-        self.window.append((now, closed_now))
-        cutoff = now - self.window_seconds
-        while self.window and self.window[0][0] < cutoff:
-            self.window.popleft()
-
-    def perclos(self):
-        if not self.window:
-            return 0.0
-        closed = sum(1 for _, c in self.window if c)
-        return closed / len(self.window)
-
-
-class HeadMovementDetector:
-    def __init__(self, window_seconds=HEAD_MOVEMENT_WINDOW, threshold=HEAD_MOVEMENT_THRESHOLD):
-        self.movements = deque()
-        self.window_seconds = window_seconds
-        self.threshold = threshold
-        self.last_direction = None
-        self.direction_changes = 0
-        self.movement_start_time = None
-        self.last_update_time = None
-        
-    def update(self, pitch, yaw):
-        now = time.time()
-        
-        # Détermine la direction actuelle
-        current_direction = "center"
-        if abs(yaw) > self.threshold:
-            current_direction = "right" if yaw > 0 else "left"
-        elif abs(pitch) > self.threshold:
-            current_direction = "down" if pitch > 0 else "up"
-        
-        # Détecte un changement de direction
-        if current_direction != "center" and self.last_direction and current_direction != self.last_direction:
-            self.direction_changes += 1
-            if self.movement_start_time is None:
-                self.movement_start_time = now
-        
-        # Ajoute le point
-        self.movements.append((now, pitch, yaw, current_direction))
-        
-        # Élagage
-        cutoff = now - self.window_seconds
-        while self.movements and self.movements[0][0] < cutoff:
-            self.movements.popleft()
-        
-        # Reset si pas de mouvement récent (inactivité de 2s)
-        if self.last_update_time and (now - self.last_update_time) > 2.0:
-            if current_direction == "center":
-                self.direction_changes = 0
-                self.movement_start_time = None
-        
-        if current_direction != "center":
-            self.last_direction = current_direction
-        
-        self.last_update_time = now
-        return current_direction
-    
-    def is_drowsy_head_movement(self):
-        """Retourne True si détecte un pattern de balancement typique de somnolence"""
-        if not self.movements or self.movement_start_time is None:
-            return False
-        
-        now = time.time()
-        movement_duration = now - self.movement_start_time
-        
-        return (self.direction_changes >= MIN_HEAD_MOVEMENTS and 
-                movement_duration >= HEAD_DROWSY_DURATION)
-    
-    def get_stats(self):
-        """Retourne statistiques pour affichage"""
-        duration = 0.0
-        if self.movement_start_time:
-            duration = time.time() - self.movement_start_time
-        return self.direction_changes, duration
-    
-    def reset(self):
-        """Reset le détecteur"""
-        self.direction_changes = 0
-        self.movement_start_time = None
-        self.last_direction = None
-
-
-def main():
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
-        print("❌ Impossible d'ouvrir la caméra.")
-        print("Essayez de changer : cv2.VideoCapture(1)")
+def draw_hud(frame, m):
+    """Dessine les métriques d'une frame (retour de DrowsinessEngine.process)"""
+    if not m["face"]:
+        cv2.putText(frame, "Visage non detecte", (10, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 255), 2)
         return
 
-    alert_system = AlertSystem()
-    perclos = PerclosWindow(PERCLOS_WINDOW)
-    head_detector = HeadMovementDetector()
-    
-    # 📊 Initialiser export dashboard
-    exporter = DashboardExporter()
-    print("📊 Dashboard activé : http://localhost:5000")
-
-    # Variables pour yeux fermés
-    closed_start_time = None
-    eyes_alert_active = False
-    last_eyes_voice_alert = 0.0
-    last_eyes_beep = 0.0
-    eyes_continuous_mode = False  # Pour savoir si on est en mode sirène continue
-    
-    # Variables pour mouvements tête
-    head_alert_active = False
-    last_head_voice_alert = 0.0
-    last_head_beep = 0.0
-    head_continuous_mode = False  # Pour savoir si on est en mode sirène continue
-    
-    # Variables pour tête baissée
-    head_down_start_time = None
-    head_down_alert_active = False
-    last_head_down_beep = 0.0
-    last_head_down_voice = 0.0
-    
-    status_text = "✓ OK"
+    ear = m["ear"]
+    cv2.putText(frame, f"EAR: {ear:.3f}", (10, 30),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 255), 2)
+    color = (0, 0, 255) if m["eye_closed"] else (0, 200, 0)
+    bar_width = int(min(max(ear, 0.0), 0.5) * 400)
+    cv2.rectangle(frame, (10, 40), (10 + bar_width, 60), color, -1)
+
+    cv2.putText(frame, f"Seuil: {EAR_THRESHOLD:.2f}", (10, 85),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (200, 200, 200), 2)
 
-    with mp_face_mesh.FaceMesh(
-        max_num_faces=1,
-        refine_landmarks=True,
-        min_detection_confidence=0.5,
-        min_tracking_confidence=0.5
-    ) as face_mesh:
+    cv2.putText(frame, f"Fermes: {m['closed_duration']:.1f}s", (10, 110),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 200, 0), 2)
+
+    cv2.putText(frame, f"PERCLOS: {m['perclos']*100:.1f}%", (10, 135),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 200, 0), 2)
+
+    cv2.putText(frame, f"Pitch:{m['pitch']:+5.1f}° Yaw:{m['yaw']:+5.1f}°", (10, 160),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
+
+    # Indicateur tête baissée
+    if m["head_is_down"]:
+        head_down_color = (0, 0, 255) if m["head_down_alert_active"] else (255, 165, 0)
+        cv2.putText(frame, f"TETE BAISSEE ! ({m['head_down_duration']:.1f}s)", (10, 185),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, head_down_color, 2)
+        y_offset = 210
+    else:
+        y_offset = 185
+
+    # Mouvements
+    changes, duration, head_drowsy = m["head_movements"], m["head_movement_duration"], m["head_drowsy"]
+    head_color = (0, 0, 255) if head_drowsy else (255, 150, 0) if changes > 0 else (200, 200, 200)
+    head_status = "SOMNOLENCE" if head_drowsy else f"{changes}mvts" if changes > 0 else "Normal"
+    cv2.putText(frame, f"Tete: {head_status} ({duration:.1f}s)", (10, y_offset),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.6, head_color, 2)
+
+    status_text = m["status"]
+    st_color = (0, 0, 255) if "ALERTE" in status_text or "DANGER" in status_text else \
+              (255, 165, 0) if "⚠️" in status_text else (0, 255, 0)
+    cv2.putText(frame, f"STATUT: {status_text}", (10, y_offset + 30),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.8, st_color, 2)
+
+    y_pos = y_offset + 60
+    # Effet clignotant pour attirer l'attention
+    blink = int(time.time() * 2) % 2
+    if m["eyes_alert_active"]:
+        color = (0, 0, 255) if blink else (0, 100, 255)
+        cv2.putText(frame, "[ALERTE YEUX ACTIVE]", (10, y_pos),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+        y_pos += 25
+    if m["head_alert_active"]:
+        color = (0, 0, 255) if blink else (0, 100, 255)
+        cv2.putText(frame, "[ALERTE TETE ACTIVE]", (10, y_pos),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+        y_pos += 25
+    if m["head_down_alert_active"]:
+        color = (0, 165, 255) if blink else (255, 165, 0)
+        cv2.putText(frame, "[ALERTE TETE BAISSEE]", (10, y_pos),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+
+
+class PreviewRenderer:
+    """HUD dessiné sur son propre thread, à cadence réduite, depuis la dernière frame publiée.
+
+    La boucle de détection ne fait que publier (frame, landmarks, métriques)
+    sous un verrou : le dessin, imshow et waitKey ne la ralentissent jamais.
+    Une frame n'est dessinée qu'une fois (sur une copie), les frames publiées
+    entre deux rendus sont simplement remplacées.
+
+    Tous les appels HighGUI (imshow, waitKey, fermeture de la fenêtre) sont
+    faits par ce thread. Cela suppose un backend HighGUI qui accepte une
+    fenêtre hors du thread principal : ce n'est pas le cas sous macOS ni de
+    certaines versions Qt (utiliser alors le mode "window").
+    """
+    def __init__(self, fps=PREVIEW_FPS, window_name=WINDOW_NAME):
+        if fps <= 0:
+            raise ValueError(f"cadence du HUD invalide : {fps} (doit être > 0)")
+        self.interval = 1.0 / fps
+        self.window_name = window_name
+        self.lock = threading.Lock()
+        self.snapshot = None      # (frame, points, métriques)
+        self.snapshot_id = 0
+        self.rendered_id = 0
+        self.running = False
+        self.quit_requested = False   # ESC dans la fenêtre
+        self.thread = None
+
+        # Compteurs
+        self.frames_rendered = 0
+
+    def start(self):
+        if self.running:
+            return self
+        self.running = True
+        self.thread = threading.Thread(target=self._render_loop, name="hud-preview", daemon=True)
+        self.thread.start()
+        return self
+
+    def publish(self, frame, points, metrics):
+        """Dernier état de la détection (appelé à chaque frame, sans copie)"""
+        with self.lock:
+            self.snapshot = (frame, points, metrics)
+            self.snapshot_id += 1
+
+    def _render_loop(self):
+        next_render = time.perf_counter()
+        while self.running:
+            with self.lock:
+                snapshot, snapshot_id = self.snapshot, self.snapshot_id
+            if snapshot is not None and snapshot_id != self.rendered_id:
+                frame, points, m = snapshot
+                frame = frame.copy()
+                h, w = frame.shape[:2]
+                if points is not None:
+                    draw_eye_points(frame, eye_points_px(points, w, h))
+                draw_hud(frame, m)
+                cv2.imshow(self.window_name, frame)
+                self.rendered_id = snapshot_id
+                self.frames_rendered += 1
+            if cv2.waitKey(1) & 0xFF == 27:
+                self.quit_requested = True
+
+            next_render += self.interval
+            delay = next_render - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_render = time.perf_counter()
+        # Fermée par le thread qui l'a créée
+        cv2.destroyAllWindows()
+        cv2.waitKey(1)
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+
+
+def _startup_result(future, errors):
+    """Résultat d'une étape du démarrage (None, erreur notée, si elle a échoué)"""
+    try:
+        return future.result()
+    except Exception as e:
+        errors.append(e)
+        return None
+
+
+def main(display_mode=DISPLAY_MODE, preview_fps=PREVIEW_FPS, process_start=PROCESS_START,
+         dashboard_url=DASHBOARD_URL):
+    """Boucle de détection. Retourne le code de sortie : 0 arrêt demandé (ESC, Ctrl+C),
+    1 caméra introuvable ou flux perdu (le lanceur relance alors la détection).
+
+    Caméra, threads (capture, audio, écriture) et canal du dashboard sont
+    toujours libérés en sortie, même sur exception : le lanceur peut
+    rappeler main() dans le même processus.
+    """
+    if display_mode == "preview" and sys.platform == "darwin":
+        # Cocoa n'accepte les fenêtres que sur le thread principal
+        print("⚠️  Mode preview indisponible sous macOS : HUD dans la boucle (mode window)")
+        display_mode = "window"
+
+    # ⏱️ Démarrage : caméra, FaceMesh, dashboard et audio s'initialisent en parallèle
+    startup = StartupTimer(process_start)
+    if process_start <= IMPORTS_DONE:
+        startup.add("imports", process_start, IMPORTS_DONE)
+    perf = PerfTimer(enabled=PERF_TIMING)
+
+    # 🔊 Le thread audio initialise la synthèse vocale de son côté
+    alert_system = AlertSystem(phrases=VOICE_PHRASES)
+    cap = grabber = face_mesh = exporter = preview = recorder = engine = None
+    try:
+        errors = []
+        with ThreadPoolExecutor(max_workers=4, thread_name_prefix="startup") as pool:
+            camera_future = pool.submit(startup.timed, "camera", cv2.VideoCapture, CAMERA_INDEX)
+            mesh_future = pool.submit(startup.timed, "face_mesh", RoiFaceMesh, create_face_mesh,
+                                      enabled=ROI_ENABLED, timer=perf)
+            exporter_future = pool.submit(startup.timed, "dashboard", DashboardExporter)
+            audio_future = pool.submit(startup.timed, "audio", alert_system.wait_ready,
+                                       AUDIO_READY_TIMEOUT)
+
+            cap = _startup_result(camera_future, errors)
+            if cap is not None and cap.isOpened():
+                # 🎥 Capture sur son propre thread (toujours la frame la plus récente)
+                grabber = FrameGrabber(cap).start()
+                startup.timed("first_frame", grabber.wait_first_frame)
+            face_mesh = _startup_result(mesh_future, errors)
+            exporter = _startup_result(exporter_future, errors)
+            audio_ready = _startup_result(audio_future, errors)
+        if errors:
+            raise errors[0]
+        if not audio_ready:
+            print(f"⚠️ Synthèse vocale pas prête après {AUDIO_READY_TIMEOUT:.0f}s : démarrage sans attendre")
+
+        if grabber is None:
+            print("❌ Impossible d'ouvrir la caméra.")
+            print("Essayez de changer : cv2.VideoCapture(1)")
+            return 1
+
+        print(f"⏱️  Démarrage: {startup.summary()}")
+        scheduler = InferenceScheduler(EAR_THRESHOLD, HEAD_DOWN_THRESHOLD, enabled=ADAPTIVE_INFERENCE)
+        last_perf_export = 0.0
+        print(f"📊 Dashboard activé : {dashboard_url}")
+
+        # 🧠 Machines à états des alertes ; son, console et dashboard sont abonnés
+        engine = DrowsinessEngine()
+        engine.subscribe(print_events)
+        engine.subscribe(alert_system.on_event)
+        engine.subscribe(dashboard_subscriber(exporter))
+
+        # 🖥️ Affichage : dans la boucle, sur un thread à cadence réduite, ou aucun
+        preview = PreviewRenderer(preview_fps).start() if display_mode == "preview" else None
 
         print("🎥 Système de détection de somnolence démarré")
         print(f"⚙️  Seuil EAR: {EAR_THRESHOLD}")
         print(f"⚙️  Durée yeux fermés: {MIN_CLOSED_SECONDS}s")
         print(f"⚙️  Alerte vocale toutes les: {ALERT_REPEAT_INTERVAL}s")
         print(f"⚙️  Bip sonore toutes les: {BEEP_INTERVAL}s")
-        print("Press ESC pour quitter\n")
-
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                print("❌ Flux vidéo interrompu.")
-                break
-
-            h, w = frame.shape[:2]
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = face_mesh.process(frame_rgb)
-
-            now = time.time()
-
-            if results.multi_face_landmarks:
-                landmarks = results.multi_face_landmarks[0].landmark
-                
-                # ===== DÉTECTION YEUX =====
-                left_ear, left_pts = eye_aspect_ratio(landmarks, LEFT_EYE, w, h)
-                right_ear, right_pts = eye_aspect_ratio(landmarks, RIGHT_EYE, w, h)
-                ear = (left_ear + right_ear) / 2.0
-                draw_eye_points(frame, left_pts + right_pts)
-
-                # Gestion fermeture yeux
-                eye_closed = ear < EAR_THRESHOLD
-                if eye_closed:
-                    if closed_start_time is None:
-                        closed_start_time = now
-                    closed_duration = now - closed_start_time
-                else:
-                    closed_start_time = None
-                    closed_duration = 0.0
-                    if eyes_alert_active:
-                        eyes_alert_active = False
-                        eyes_continuous_mode = False
-                        alert_system.stop_continuous_beep()
-                        print("👁️  Yeux ouverts - alerte désactivée")
-
-                perclos.update(eye_closed)
-
-                # ===== DÉTECTION MOUVEMENTS TÊTE =====
-                pitch, yaw = calculate_head_pose(landmarks, w, h)
-                head_direction = head_detector.update(pitch, yaw)
-                head_drowsy = head_detector.is_drowsy_head_movement()
-                
-                # ===== DÉTECTION TÊTE BAISSÉE =====
-                head_is_down = pitch < HEAD_DOWN_THRESHOLD
-                if head_is_down:
-                    if head_down_start_time is None:
-                        head_down_start_time = now
-                    head_down_duration = now - head_down_start_time
+        if display_mode == "headless":
+            print("🖥️  Mode sans affichage - Ctrl+C pour quitter\n")
+        else:
+            print("Press ESC pour quitter\n")
+
+        loop_start = time.perf_counter()
+        exit_code = 0
+        try:
+            while True:
+                perf.start_frame()
+                ret, frame, frame_time = grabber.read()
+                if not ret:
+                    print("❌ Flux vidéo interrompu.")
+                    exit_code = 1
+                    break
+                perf.mark("capture")
+
+                h, w = frame.shape[:2]
+
+                # Horodatage de la capture (et non du traitement)
+                now = frame_time
+
+                # Pleine cadence dès qu'un événement est en cours
+                if scheduler.should_infer(now, engine.busy()):
+                    # Conversion RGB + FaceMesh sur la zone du visage (image complète si perdu)
+                    points = face_mesh.process(frame)
+                    # Landmarks utiles (tableau NumPy) -> toutes les features en une passe
+                    features = compute_features(points, w, h) if points is not None else None
+                    scheduler.observe(now, points, features)
+                    # 💾 Seules les frames inférées sont enregistrées (relecture sans interpolation)
+                    if RECORD_LANDMARKS:
+                        if recorder is None:
+                            recorder = LandmarkRecorder(new_recording_path(), w, h)
+                        recorder.record(now, points)
                 else:
-                    head_down_start_time = None
-                    head_down_duration = 0.0
-                    if head_down_alert_active:
-                        head_down_alert_active = False
-                        print("🙂 Tête relevée - alerte tête baissée désactivée")
-                
-                if not head_drowsy and head_alert_active:
-                    head_alert_active = False
-                    head_continuous_mode = False
-                    alert_system.stop_continuous_beep()
-                    print("🧘 Tête stable - alerte désactivée")
-
-                # ===== ALERTE YEUX FERMÉS =====
-                if eye_closed and closed_duration >= MIN_CLOSED_SECONDS:
-                    if not eyes_alert_active:
-                        # PREMIÈRE ALERTE
-                        print(f"🚨 [YEUX] ALERTE ACTIVÉE ! Durée: {closed_duration:.1f}s")
-                        alert_system.say_async("Attention ! Tes yeux sont fermés ! Réveille-toi !", force=True)
-                        alert_system.beep(2000, 300)
-                        last_eyes_voice_alert = now
-                        last_eyes_beep = now
-                        eyes_alert_active = True
-                        # 📊 Export dashboard
-                        exporter.add_message(f"ALERTE YEUX ! Yeux fermés depuis {closed_duration:.1f}s", "warning")
-                        exporter.add_alert("Yeux fermés", 2, closed_duration)
-                    else:
-                        # Passage en mode SIRÈNE CONTINUE après 12 secondes
-                        if closed_duration >= 12 and not eyes_continuous_mode:
-                            print(f"💀 [YEUX] MODE SIRÈNE CONTINUE ACTIVÉ ! {closed_duration:.1f}s")
-                            alert_system.start_continuous_beep(2800)
-                            alert_system.say_async("Ohhhh ! Tu vas mourir ! Réveille-toi maintenant !", force=True)
-                            eyes_continuous_mode = True
-                            last_eyes_voice_alert = now
-                            # 📊 Export dashboard
-                            exporter.add_message(f"DANGER CRITIQUE ! Yeux fermés {closed_duration:.1f}s - MODE SIRÈNE", "critical")
-                            exporter.add_alert("Yeux fermés - Critique", 3, closed_duration)
-                        
-                        # Si pas encore en mode continu
-                        if closed_duration < 12:
-                            # BIP qui devient progressivement rapide
-                            if closed_duration < 3:
-                                beep_interval = 1.0
-                                beep_duration = 200
-                                freq = 2500
-                                status = "Bips séparés"
-                            elif closed_duration < 5:
-                                beep_interval = 0.5
-                                beep_duration = 250
-                                freq = 2500
-                                status = "Bips rapprochés"
-                            elif closed_duration < 8:
-                                beep_interval = 0.2
-                                beep_duration = 150
-                                freq = 2600
-                                status = "Bips très rapides"
-                            else:  # 8-12s
-                                beep_interval = 0.1
-                                beep_duration = 90
-                                freq = 2700
-                                status = "Quasi-continu"
-                            
-                            if (now - last_eyes_beep) >= beep_interval:
-                                alert_system.beep(freq, beep_duration)
-                                last_eyes_beep = now
-                                if int(closed_duration) != int(closed_duration - 0.5):
-                                    print(f"🔊 [YEUX] {status} - {closed_duration:.1f}s")
-                        
-                        # VOIX répétée toutes les 5 secondes
-                        if (now - last_eyes_voice_alert) >= ALERT_REPEAT_INTERVAL:
-                            print(f"🔔 [YEUX] Alerte vocale répétée ! Durée: {closed_duration:.1f}s")
-                            if eyes_continuous_mode:
-                                # Message DRAMATIQUE en mode critique
-                                alert_system.say_async("Ohhhh ! Tu vas mourir ! Réveille-toi maintenant !", force=True)
-                            else:
-                                alert_system.say_async("Alerte ! Tes yeux sont toujours fermés ! Arrête-toi immédiatement !", force=True)
-                            last_eyes_voice_alert = now
-
-                # ===== ALERTE MOUVEMENTS TÊTE =====
-                if head_drowsy:
-                    if not head_alert_active:
-                        # PREMIÈRE ALERTE
-                        changes, duration = head_detector.get_stats()
-                        print(f"🚨 [TÊTE] ALERTE ACTIVÉE ! Mvts: {changes}, Durée: {duration:.1f}s")
-                        alert_system.say_async("Attention ! Tu as sommeil ! Ta tête balance ! Repose-toi !", force=True)
-                        alert_system.beep(1500, 300)
-                        last_head_voice_alert = now
-                        last_head_beep = now
-                        head_alert_active = True
-                        # 📊 Export dashboard
-                        exporter.add_message(f"ALERTE TÊTE ! Mouvements de somnolence ({changes} mvts)", "warning")
-                        exporter.add_alert("Mouvements tête", 2, duration)
-                    else:
-                        # Passage en mode SIRÈNE CONTINUE après 16 secondes
-                        changes, head_duration = head_detector.get_stats()
-                        if head_duration >= 16 and not head_continuous_mode:
-                            print(f"💀 [TÊTE] MODE SIRÈNE CONTINUE ACTIVÉ ! {head_duration:.1f}s")
-                            alert_system.start_continuous_beep(2200)
-                            alert_system.say_async("Ohhhh ! Tu vas mourir ! Réveille-toi maintenant !", force=True)
-                            head_continuous_mode = True
-                            last_head_voice_alert = now
-                            # 📊 Export dashboard
-                            exporter.add_message(f"DANGER CRITIQUE ! Somnolence tête {head_duration:.1f}s - MODE SIRÈNE", "critical")
-                            exporter.add_alert("Mouvements tête - Critique", 3, head_duration)
-                        
-                        # Si pas encore en mode continu
-                        if head_duration < 16:
-                            # BIP qui devient progressivement rapide
-                            if head_duration < 5:
-                                beep_interval = 1.0
-                                beep_duration = 200
-                                freq = 1800
-                                status = "Bips séparés"
-                            elif head_duration < 8:
-                                beep_interval = 0.5
-                                beep_duration = 250
-                                freq = 1900
-                                status = "Bips rapprochés"
-                            elif head_duration < 12:
-                                beep_interval = 0.2
-                                beep_duration = 150
-                                freq = 2000
-                                status = "Bips très rapides"
-                            else:  # 12-16s
-                                beep_interval = 0.1
-                                beep_duration = 90
-                                freq = 2100
-                                status = "Quasi-continu"
-                            
-                            if (now - last_head_beep) >= beep_interval:
-                                alert_system.beep(freq, beep_duration)
-                                last_head_beep = now
-                                if int(head_duration) != int(head_duration - 0.5):
-                                    print(f"🔊 [TÊTE] {status} - {head_duration:.1f}s")
-                        
-                        # VOIX répétée toutes les 5 secondes
-                        if (now - last_head_voice_alert) >= ALERT_REPEAT_INTERVAL:
-                            changes, duration = head_detector.get_stats()
-                            print(f"🔔 [TÊTE] Alerte vocale répétée ! Mvts: {changes}, Durée: {duration:.1f}s")
-                            if head_continuous_mode:
-                                # Message DRAMATIQUE en mode critique
-                                alert_system.say_async("Ohhhh ! Tu vas mourir ! Réveille-toi maintenant !", force=True)
-                            else:
-                                alert_system.say_async("Danger ! Tu continues à somnoler ! Arrête le véhicule maintenant !", force=True)
-                            last_head_voice_alert = now
-
-                # ===== ALERTE TÊTE BAISSÉE =====
-                if head_is_down and head_down_duration >= HEAD_DOWN_DURATION:
-                    if not head_down_alert_active:
-                        # PREMIÈRE ALERTE tête baissée
-                        print(f"⚠️ [TÊTE BAISSÉE] ALERTE ! Durée: {head_down_duration:.1f}s")
-                        alert_system.say_async("Attention ! Ta tête est baissée ! Relève-toi !", force=True)
-                        alert_system.beep(2200, 300)
-                        head_down_alert_active = True
-                        last_head_down_beep = now
-                        last_head_down_voice = now
-                        # 📊 Export dashboard
-                        exporter.add_message(f"ALERTE ! Tête baissée depuis {head_down_duration:.1f}s", "info")
-                        exporter.add_alert("Tête baissée", 1, head_down_duration)
-                    else:
-                        # BIP répété pour tête baissée
-                        if (now - last_head_down_beep) >= HEAD_DOWN_BEEP_INTERVAL:
-                            alert_system.beep(2200, 200)
-                            last_head_down_beep = now
-                            print(f"🔔 [TÊTE BAISSÉE] Bip ! {head_down_duration:.1f}s")
-                        
-                        # VOIX répétée toutes les 5 secondes
-                        if (now - last_head_down_voice) >= ALERT_REPEAT_INTERVAL:
-                            print(f"🔔 [TÊTE BAISSÉE] Alerte vocale ! {head_down_duration:.1f}s")
-                            alert_system.say_async("Relève ta tête ! Tu t'endors !", force=True)
-                            last_head_down_voice = now
-
-                # ===== MISE À JOUR STATUT =====
-                if eyes_alert_active and head_alert_active:
-                    status_text = "🚨🚨 DANGER CRITIQUE"
-                elif eyes_alert_active and head_down_alert_active:
-                    status_text = "🚨🚨 DANGER - Yeux + Tête baissée"
-                elif eyes_alert_active:
-                    status_text = f"🚨 ALERTE YEUX ({closed_duration:.1f}s)"
-                elif head_alert_active:
-                    changes, duration = head_detector.get_stats()
-                    status_text = f"🚨 ALERTE TÊTE ({changes}mvts)"
-                elif head_down_alert_active:
-                    status_text = f"⚠️ TÊTE BAISSÉE ({head_down_duration:.1f}s)"
-                elif eye_closed:
-                    status_text = f"⚠️ Yeux... {closed_duration:.1f}s"
-                elif head_is_down:
-                    status_text = f"⚠️ Tête baissée... {head_down_duration:.1f}s"
-                elif head_detector.direction_changes > 0:
-                    changes, _ = head_detector.get_stats()
-                    status_text = f"⚠️ Tête... {changes}mvts"
-                else:
-                    status_text = "✓ OK"
-
-                # ===== AFFICHAGE HUD =====
-                cv2.putText(frame, f"EAR: {ear:.3f}", (10, 30),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 255), 2)
-                color = (0, 0, 255) if ear < EAR_THRESHOLD else (0, 200, 0)
-                bar_width = int(min(max(ear, 0.0), 0.5) * 400)
-                cv2.rectangle(frame, (10, 40), (10 + bar_width, 60), color, -1)
-
-                cv2.putText(frame, f"Seuil: {EAR_THRESHOLD:.2f}", (10, 85),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (200, 200, 200), 2)
-
-                cv2.putText(frame, f"Fermes: {closed_duration:.1f}s", (10, 110),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 200, 0), 2)
-
-                cv2.putText(frame, f"PERCLOS: {perclos.perclos()*100:.1f}%", (10, 135),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 200, 0), 2)
-
-                cv2.putText(frame, f"Pitch:{pitch:+5.1f}° Yaw:{yaw:+5.1f}°", (10, 160),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
-                
-                # Indicateur tête baissée
-                if head_is_down:
-                    head_down_color = (0, 0, 255) if head_down_alert_active else (255, 165, 0)
-                    cv2.putText(frame, f"TETE BAISSEE ! ({head_down_duration:.1f}s)", (10, 185),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.6, head_down_color, 2)
-                    y_offset = 210
-                else:
-                    y_offset = 185
-                
-                # Mouvements
-                changes, duration = head_detector.get_stats()
-                head_color = (0, 0, 255) if head_drowsy else (255, 150, 0) if changes > 0 else (200, 200, 200)
-                head_status = "SOMNOLENCE" if head_drowsy else f"{changes}mvts" if changes > 0 else "Normal"
-                cv2.putText(frame, f"Tete: {head_status} ({duration:.1f}s)", (10, y_offset),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, head_color, 2)
-
-                st_color = (0, 0, 255) if "ALERTE" in status_text or "DANGER" in status_text else \
-                          (255, 165, 0) if "⚠️" in status_text else (0, 255, 0)
-                cv2.putText(frame, f"STATUT: {status_text}", (10, y_offset + 30),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.8, st_color, 2)
-                
-                y_pos = y_offset + 60
-                if eyes_alert_active:
-                    # Effet clignotant pour attirer l'attention
-                    blink = int(time.time() * 2) % 2
-                    color = (0, 0, 255) if blink else (0, 100, 255)
-                    cv2.putText(frame, "[ALERTE YEUX ACTIVE]", (10, y_pos),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-                    y_pos += 25
-                if head_alert_active:
-                    blink = int(time.time() * 2) % 2
-                    color = (0, 0, 255) if blink else (0, 100, 255)
-                    cv2.putText(frame, "[ALERTE TETE ACTIVE]", (10, y_pos),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-                    y_pos += 25
-                if head_down_alert_active:
-                    blink = int(time.time() * 2) % 2
-                    color = (0, 165, 255) if blink else (255, 165, 0)
-                    cv2.putText(frame, "[ALERTE TETE BAISSEE]", (10, y_pos),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-                
-                # 📊 Update temps réel dashboard
-                exporter.update_realtime(
-                    ear=ear,
-                    perclos=perclos.perclos(),
-                    status=status_text,
-                    closed_duration=closed_duration,
-                    pitch=pitch,
-                    yaw=yaw,
-                    head_movements=head_detector.direction_changes,
-                    head_down_duration=head_down_duration,
-                    head_drowsy=head_drowsy,
-                    eyes_alert_active=eyes_alert_active,
-                    head_alert_active=head_alert_active,
-                    head_down_alert_active=head_down_alert_active,
-                    eyes_continuous_mode=eyes_continuous_mode,
-                    head_continuous_mode=head_continuous_mode
-                )
-                exporter.update_session(perclos.perclos())
-
-            else:
-                perclos.update(False)
-                if eyes_alert_active or head_alert_active or head_down_alert_active:
-                    eyes_alert_active = False
-                    head_alert_active = False
-                    head_down_alert_active = False
-                    eyes_continuous_mode = False
-                    head_continuous_mode = False
-                    alert_system.stop_continuous_beep()
-                    print("😶 Visage perdu - alertes désactivées")
-                
-                cv2.putText(frame, "Visage non detecte", (10, 30),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 255), 2)
-
-            cv2.imshow("Detection Somnolence - ESC pour quitter", frame)
-            if cv2.waitKey(1) & 0xFF == 27:
-                break
-
-    # 📊 Finaliser export dashboard
-    exporter.finalize(perclos.perclos())
-    
-    cap.release()
-    cv2.destroyAllWindows()
-    print("\n✅ Système arrêté")
+                    # Frame sautée : mesures prolongées depuis les dernières inférences
+                    points = scheduler.last_points
+                    features = scheduler.interpolate(now)
+                perf.mark("features")
+
+                m, _ = engine.process(now, points, w, h, features)
+                perf.mark("alerts")
+
+                # ✅ Première frame analysée : le système peut alerter
+                if startup.ready_after is None:
+                    startup.add("first_inference", loop_start, time.perf_counter())
+                    print(f"✅ Prêt à alerter {startup.ready():.2f}s après le lancement "
+                          f"({startup.ready_at[11:19]})")
+                    exporter.update_perf({**perf.snapshot(), "audio": alert_system.get_stats(),
+                                          "startup": startup.snapshot()})
+
+                if display_mode == "window":
+                    if points is not None:
+                        draw_eye_points(frame, eye_points_px(points, w, h))
+                    draw_hud(frame, m)
+                    perf.mark("hud")
+                elif preview is not None:
+                    preview.publish(frame, points, m)
+
+                if m["face"]:
+                    # 📊 Update temps réel dashboard
+                    exporter.update_realtime(
+                        ear=m["ear"],
+                        perclos=m["perclos"],
+                        status=m["status"],
+                        closed_duration=m["closed_duration"],
+                        pitch=m["pitch"],
+                        yaw=m["yaw"],
+                        head_movements=m["head_movements"],
+                        head_down_duration=m["head_down_duration"],
+                        head_drowsy=m["head_drowsy"],
+                        eyes_alert_active=m["eyes_alert_active"],
+                        head_alert_active=m["head_alert_active"],
+                        head_down_alert_active=m["head_down_alert_active"],
+                        eyes_continuous_mode=m["eyes_continuous_mode"],
+                        head_continuous_mode=m["head_continuous_mode"],
+                        perclos_windows=engine.perclos.perclos_all()
+                    )
+                    exporter.update_session(m["perclos"])
+                    perf.mark("exporter")
+
+                if display_mode == "window":
+                    cv2.imshow(WINDOW_NAME, frame)
+                    if cv2.waitKey(1) & 0xFF == 27:
+                        break
+                    perf.mark("display")
+                elif preview is not None and preview.quit_requested:
+                    break
+                perf.end_frame(grabber.get_stats()[1])
+
+                # 📊 Temps par étape vers le dashboard
+                if perf.enabled and now - last_perf_export >= PERF_EXPORT_INTERVAL:
+                    exporter.update_perf({**perf.snapshot(), "audio": alert_system.get_stats(),
+                                          "startup": startup.snapshot()})
+                    last_perf_export = now
+        except KeyboardInterrupt:
+            print("\n⚠️  Interruption (Ctrl+C)")
+
+        inferred, skipped = scheduler.get_stats()
+        print(f"🧠 Inférences FaceMesh: {inferred}, frames sautées (état stable): {skipped}")
+        full_frames, cropped_frames, roi_misses = face_mesh.get_stats()
+        print(f"🎯 FaceMesh: {cropped_frames} frames recadrées, {full_frames} images complètes "
+              f"({roi_misses} pertes dans la ROI)")
+        audio = alert_system.get_stats()
+        played = audio["played"]
+        print(f"🔊 Audio ({audio['backend']}): {played['beep']} bips, {played['voice']} phrases, "
+              f"{audio['dropped']} sons abandonnés (trop en retard), {audio['merged']} phrases fusionnées")
+        cache = audio["tts_cache"]
+        if cache["phrases"]:
+            print(f"🔊 Cache vocal: {cache['phrases']} phrases ({cache['loaded']} relues du disque, "
+                  f"{cache['synthesized']} synthétisées), {cache['hits']} alertes jouées depuis le cache")
+        for kind, latency in audio["latency_ms"].items():
+            print(f"🔊 Délai demande -> lecture ({kind}): moyenne {latency['mean']:.0f} ms, "
+                  f"p95 {latency['p95']:.0f} ms, max {latency['max']:.0f} ms")
+        captured, dropped = grabber.get_stats()
+        print(f"🎥 Frames capturées: {captured}, ignorées (traitement en retard): {dropped}")
+        if preview is not None:
+            print(f"🖥️  HUD: {preview.frames_rendered} frames affichées à {preview_fps:.0f} fps max")
+        return exit_code
+    finally:
+        # Libération dans tous les cas (fin normale, caméra absente ou exception)
+        alert_system.close()
+        if grabber is not None:
+            grabber.stop()
+        if cap is not None:
+            cap.release()
+        if face_mesh is not None:
+            face_mesh.close()
+        if recorder is not None:
+            recorder.close()
+            print(f"💾 Landmarks enregistrés: {recorder.path} ({recorder.frames} frames)")
+        # 📊 Finaliser export dashboard (ferme la mémoire partagée et la socket d'événements)
+        if exporter is not None:
+            exporter.finalize(engine.perclos.perclos() if engine is not None else 0.0)
+        if preview is not None:
+            preview.stop()
+        elif display_mode == "window" and engine is not None:
+            cv2.destroyAllWindows()
+        print("\n✅ Système arrêté")
 
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    import argparse
+    from cli_args import positive_fps
+
+    parser = argparse.ArgumentParser(description="Détection de somnolence en direct")
+    display = parser.add_mutually_exclusive_group()
+    display.add_argument("--headless", action="store_true",
+                         help="Aucun dessin ni fenêtre (arrêt avec Ctrl+C)")
+    display.add_argument("--preview", nargs="?", type=positive_fps, const=PREVIEW_FPS, metavar="FPS",
+                         help=f"HUD sur un thread séparé, à FPS images/s (défaut: {PREVIEW_FPS:.0f})")
+    parser.add_argument("--dashboard-url", default=DASHBOARD_URL,
+                        help="Adresse du dashboard affichée au démarrage")
+    args = parser.parse_args()
+
+    if args.headless:
+        sys.exit(main("headless", dashboard_url=args.dashboard_url))
+    elif args.preview is not None:
+        sys.exit(main("preview", args.preview, dashboard_url=args.dashboard_url))
+    else:
+        sys.exit(main(dashboard_url=args.dashboard_url))
@@ -0,0 +1,312 @@
+"""
+Superviseur multi-caméras : un processus de détection par flux
+Pour les véhicules avec plusieurs caméras (conducteur, habitacle) ou les bancs de test
+
+Chaque flux tourne dans son propre processus (capture + FaceMesh + alertes),
+ce qui permet d'utiliser tous les coeurs. Le superviseur redémarre les
+workers qui plantent et fusionne les métriques de chaque flux (étiquetées
+par identifiant) dans un seul export pour le dashboard.
+
+Usage :
+    python multi_camera.py 0 1 rtsp://192.168.1.20/stream --ids conducteur habitacle banc
+"""
+
+import argparse
+import multiprocessing
+import os
+import queue
+import time
+
+from dashboard_exporter import DashboardExporter
+
+
+RESTART_DELAY = 2.0        # attente avant de relancer un worker mort
+MAX_RESTART_DELAY = 30.0   # attente max (doublée à chaque échec consécutif)
+STABLE_RUN_SECONDS = 60.0  # un worker qui a tourné plus longtemps repart de RESTART_DELAY
+METRICS_INTERVAL = 0.2     # fréquence d'envoi des métriques par worker (secondes)
+EXPORT_INTERVAL = 0.5      # fréquence d'écriture de l'export fusionné (secondes)
+STOP_TIMEOUT = 3.0         # attente max de l'arrêt propre d'un worker
+
+SEVERITY_BY_LEVEL = {1: "info", 2: "warning", 3: "critical"}
+
+
+def parse_source(source):
+    """'0' -> index de webcam, sinon chemin de fichier / URL"""
+    return int(source) if source.isdigit() else source
+
+
+def _send(events, message):
+    """Envoi non bloquant vers le superviseur (message perdu si la file est pleine)"""
+    try:
+        events.put_nowait(message)
+    except queue.Full:
+        pass
+
+
+def stream_worker(stream_id, source, events, stop_event):
+    """Boucle de détection d'un flux, exécutée dans un processus dédié.
+
+    Code de sortie 0 : fin normale (fichier local terminé ou arrêt demandé).
+    Code de sortie 1 : source inaccessible ou flux interrompu (caméra, RTSP,
+    HTTP) -> redémarrage.
+    """
+    # Imports lourds dans le processus worker uniquement
+    import cv2
+    from capture import FrameGrabber
+    from face_roi import ROI_ENABLED, RoiFaceMesh, create_face_mesh
+    from drowsiness_engine import DrowsinessEngine
+
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        _send(events, ("error", stream_id, f"Impossible d'ouvrir la source {source!r}"))
+        raise SystemExit(1)
+
+    grabber = FrameGrabber(cap).start()
+    engine = DrowsinessEngine(perclos_extra_windows=())
+
+    def forward_alert(event):
+        if event["kind"] == "alert":
+            _send(events, ("alert", stream_id, {
+                "time": round(event["time"], 3),
+                "type": event["type"],
+                "level": event["level"],
+                "duration": round(event["duration"], 1)
+            }))
+
+    engine.subscribe(forward_alert)
+    last_sent = 0.0
+    frames = 0
+    fps_start = time.time()
+    fps = 0.0
+    exit_code = 0
+
+    with RoiFaceMesh(create_face_mesh, enabled=ROI_ENABLED) as face_mesh:
+        while not stop_event.is_set():
+            ret, frame, now = grabber.read()
+            if not ret:
+                # Un fichier vidéo qui se termine n'est pas une panne
+                # Seul un fichier local a une vraie fin ; une caméra réseau qui décroche est relancée
+                exit_code = 0 if grabber.ended and isinstance(source, str) and os.path.isfile(source) else 1
+                break
+
+            h, w = frame.shape[:2]
+            points = face_mesh.process(frame)
+            m, _ = engine.process(now, points, w, h)
+
+            frames += 1
+            if now - fps_start >= 1.0:
+                fps = frames / (now - fps_start)
+                frames = 0
+                fps_start = now
+
+            if now - last_sent >= METRICS_INTERVAL:
+                captured, dropped = grabber.get_stats()
+                face = m["face"]
+                metrics = {
+                    "ear": m["ear"] if face else 0.0,
+                    "perclos": m["perclos"],
+                    "status": m["status"],
+                    "closed_duration": m["closed_duration"] if face else 0.0,
+                    "pitch": m["pitch"] if face else 0.0,
+                    "yaw": m["yaw"] if face else 0.0,
+                    "head_movements": m["head_movements"] if face else 0,
+                    "head_down_duration": m["head_down_duration"] if face else 0.0,
+                    "head_drowsy": m["head_drowsy"] if face else False,
+                    "eyes_alert_active": engine.eyes_alert_active,
+                    "head_alert_active": engine.head_alert_active,
+                    "head_down_alert_active": engine.head_down_alert_active,
+                    "eyes_continuous_mode": engine.eyes_continuous_mode,
+                    "head_continuous_mode": engine.head_continuous_mode
+                }
+                info = {
+                    "alert_level": m["alert_level"],
+                    "face_detected": face,
+                    "fps": round(fps, 1),
+                    "frames_captured": captured,
+                    "frames_dropped": dropped
+                }
+                _send(events, ("metrics", stream_id, (metrics, info)))
+                last_sent = now
+
+    grabber.stop()
+    cap.release()
+    raise SystemExit(exit_code)
+
+
+class StreamSupervisor:
+    """Lance un worker par flux, les relance s'ils meurent et fusionne leurs métriques"""
+
+    def __init__(self, sources, output_dir=".", restart_delay=RESTART_DELAY):
+        # 'spawn' : pas de fork d'un processus qui a déjà des threads / MediaPipe
+        self.ctx = multiprocessing.get_context("spawn")
+        self.events = self.ctx.Queue(maxsize=1000)
+        self.stop_event = self.ctx.Event()
+        self.restart_delay = restart_delay
+        self.exporter = DashboardExporter(output_dir)
+
+        self.workers = {}
+        self.streams = {}
+        for stream_id, source in sources.items():
+            self.workers[stream_id] = {
+                "source": source,
+                "process": None,
+                "restarts": 0,
+                "failures": 0,     # échecs rapprochés (délai de relance)
+                "started": 0.0,
+                "next_start": 0.0,
+                "finished": False
+            }
+            self.streams[stream_id] = {
+                "source": str(source),
+                "alive": False,
+                "restarts": 0,
+                "last_seen": None,
+                "alert_level": 0,
+                "metrics": None
+            }
+
+    def _start_worker(self, stream_id):
+        worker = self.workers[stream_id]
+        process = self.ctx.Process(
+            target=stream_worker,
+            args=(stream_id, worker["source"], self.events, self.stop_event),
+            name=f"detection-{stream_id}",
+            daemon=True
+        )
+        process.start()
+        worker["process"] = process
+        worker["started"] = time.time()
+        self.streams[stream_id]["alive"] = True
+        print(f"▶️  [{stream_id}] worker démarré (pid {process.pid})")
+
+    def _check_workers(self, now):
+        """Relance les workers morts (code de sortie non nul)"""
+        for stream_id, worker in self.workers.items():
+            process = worker["process"]
+            if worker["finished"]:
+                continue
+            if process is None:
+                if now >= worker["next_start"]:
+                    self._start_worker(stream_id)
+                continue
+            if process.is_alive():
+                continue
+
+            process.join()
+            self.streams[stream_id]["alive"] = False
+            worker["process"] = None
+            if process.exitcode == 0:
+                worker["finished"] = True
+                print(f"⏹️  [{stream_id}] flux terminé")
+                continue
+
+            # Après une longue période sans incident, le délai repart du minimum
+            if now - worker["started"] >= STABLE_RUN_SECONDS:
+                worker["failures"] = 0
+            worker["restarts"] += 1
+            worker["failures"] += 1
+            delay = min(self.restart_delay * 2 ** (worker["failures"] - 1), MAX_RESTART_DELAY)
+            worker["next_start"] = now + delay
+            self.streams[stream_id]["restarts"] = worker["restarts"]
+            print(f"💥 [{stream_id}] worker mort (code {process.exitcode}), "
+                  f"redémarrage dans {delay:.0f}s")
+            self.exporter.add_message(
+                f"Flux {stream_id} interrompu, redémarrage (#{worker['restarts']})",
+                "warning", stream_id=stream_id
+            )
+
+    def _drain_events(self):
+        """Récupère les messages des workers"""
+        while True:
+            try:
+                kind, stream_id, payload = self.events.get_nowait()
+            except queue.Empty:
+                return
+
+            stream = self.streams[stream_id]
+            stream["last_seen"] = time.time()
+            if kind == "metrics":
+                metrics, info = payload
+                stream["metrics"] = metrics
+                stream.update(info)
+            elif kind == "alert":
+                print(f"🚨 [{stream_id}] {payload['type']} ({payload['duration']:.1f}s)")
+                self.exporter.add_message(
+                    f"[{stream_id}] ALERTE {payload['type']} ({payload['duration']:.1f}s)",
+                    SEVERITY_BY_LEVEL.get(payload["level"], "info"), stream_id=stream_id
+                )
+                self.exporter.add_alert(payload["type"], payload["level"],
+                                        payload["duration"], stream_id=stream_id)
+            elif kind == "error":
+                print(f"❌ [{stream_id}] {payload}")
+
+    def _export(self):
+        """Écrit l'export fusionné : état de chaque flux + flux le plus critique en temps réel"""
+        self.exporter.update_streams(self.streams)
+
+        active = [(sid, s) for sid, s in self.streams.items() if s["metrics"]]
+        if not active:
+            return
+        stream_id, worst = max(active, key=lambda item: item[1]["alert_level"])
+        metrics = dict(worst["metrics"])
+        metrics["status"] = f"[{stream_id}] {metrics['status']}"
+        self.exporter.update_realtime(**metrics)
+
+        perclos_values = [s["metrics"]["perclos"] for _, s in active]
+        self.exporter.update_session(sum(perclos_values) / len(perclos_values))
+
+    def run(self):
+        """Boucle du superviseur (Ctrl+C pour arrêter)"""
+        print(f"🎥 Superviseur multi-caméras : {len(self.workers)} flux")
+        last_export = 0.0
+        try:
+            while not all(w["finished"] for w in self.workers.values()):
+                now = time.time()
+                self._check_workers(now)
+                self._drain_events()
+                if now - last_export >= EXPORT_INTERVAL:
+                    self._export()
+                    last_export = now
+                time.sleep(0.05)
+        except KeyboardInterrupt:
+            print("\n⚠️  Interruption par l'utilisateur")
+        finally:
+            self.stop()
+
+    def stop(self):
+        """Arrête proprement tous les workers"""
+        self.stop_event.set()
+        deadline = time.time() + STOP_TIMEOUT
+        for worker in self.workers.values():
+            process = worker["process"]
+            if process is None:
+                continue
+            process.join(timeout=max(0.0, deadline - time.time()))
+            if process.is_alive():
+                process.terminate()
+        self._drain_events()
+        self._export()
+        perclos_values = [s["metrics"]["perclos"] for s in self.streams.values() if s["metrics"]]
+        self.exporter.finalize(sum(perclos_values) / len(perclos_values) if perclos_values else 0.0)
+        print("✅ Superviseur arrêté")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Détection de somnolence multi-caméras")
+    parser.add_argument("sources", nargs="+", help="Index de webcam, fichier vidéo ou URL")
+    parser.add_argument("--ids", nargs="+", default=None,
+                        help="Identifiants des flux (défaut: stream0, stream1, ...)")
+    parser.add_argument("-o", "--output", default=".",
+                        help="Dossier de l'export fusionné (défaut: dossier courant)")
+    args = parser.parse_args()
+
+    ids = args.ids or [f"stream{i}" for i in range(len(args.sources))]
+    if len(ids) != len(args.sources) or len(set(ids)) != len(ids):
+        parser.error("--ids doit donner un identifiant unique par source")
+
+    sources = {sid: parse_source(src) for sid, src in zip(ids, args.sources)}
+    StreamSupervisor(sources, args.output).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Chronométrage des étapes de la boucle de détection
+Pour voir où passe le temps d'une frame et repérer les régressions sur le terrain
+
+La boucle pose un repère (mark) à la fin de chaque étape : le temps écoulé
+depuis le repère précédent est attribué à l'étape. Un seul appel à
+perf_counter par étape, aucun calcul pendant la frame. Les durées sont
+gardées sur les WINDOW_FRAMES dernières frames (tampon circulaire par
+étape) ; les percentiles ne sont calculés qu'à l'export (snapshot).
+
+StartupTimer mesure le démarrage : durée de chaque étape d'initialisation
+(plusieurs tournent en parallèle) et instant où le système est prêt à
+alerter, depuis le lancement du processus.
+"""
+
+import time
+from datetime import datetime
+from array import array
+
+import numpy as np
+
+
+WINDOW_FRAMES = 300        # ~10 s à 30 fps
+PERCENTILES = (50, 95, 99)
+
+
+class _StageBuffer:
+    """Durées (ms) d'une étape sur les dernières frames"""
+
+    __slots__ = ("values", "index", "filled")
+
+    def __init__(self, size):
+        self.values = array("d", bytes(8 * size))
+        self.index = 0
+        self.filled = 0
+
+    def push(self, value):
+        self.values[self.index] = value
+        self.index = (self.index + 1) % len(self.values)
+        if self.filled < len(self.values):
+            self.filled += 1
+
+    def array(self):
+        return np.frombuffer(self.values, dtype=np.float64)[:self.filled]
+
+
+class PerfTimer:
+    """Temps par étape, fps et frames perdues (enabled=False : aucun coût)"""
+
+    def __init__(self, enabled=True, window=WINDOW_FRAMES):
+        self.enabled = enabled
+        self.window = window
+        self.stages = {}          # nom -> _StageBuffer, dans l'ordre d'apparition
+        self.current = {}         # durées de la frame en cours (s)
+        self.frame_start = 0.0
+        self.last_mark = 0.0
+
+        self.frames = 0
+        self.fps = 0.0
+        self.fps_frames = 0
+        self.fps_start = None
+        self.frames_dropped = 0
+
+    def start_frame(self):
+        if not self.enabled:
+            return
+        self.frame_start = self.last_mark = time.perf_counter()
+
+    def mark(self, stage):
+        """Fin de l'étape `stage` : temps écoulé depuis le repère précédent"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        # Une étape peut être rencontrée deux fois (ex. repli plein cadre de FaceMesh)
+        self.current[stage] = self.current.get(stage, 0.0) + now - self.last_mark
+        self.last_mark = now
+
+    def end_frame(self, frames_dropped=None):
+        """Range les temps de la frame (frames_dropped : total fourni par la capture)"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.current["total"] = now - self.frame_start
+        for stage, seconds in self.current.items():
+            buffer = self.stages.get(stage)
+            if buffer is None:
+                buffer = self.stages[stage] = _StageBuffer(self.window)
+            buffer.push(seconds * 1000.0)
+        self.current = {}
+
+        self.frames += 1
+        self.fps_frames += 1
+        if self.fps_start is None:
+            self.fps_start = now
+        elif now - self.fps_start >= 1.0:
+            self.fps = self.fps_frames / (now - self.fps_start)
+            self.fps_frames = 0
+            self.fps_start = now
+        if frames_dropped is not None:
+            self.frames_dropped = frames_dropped
+
+    def snapshot(self):
+        """Statistiques par étape (ms) : p50 / p95 / p99 / moyenne / max sur la fenêtre"""
+        stages = {}
+        for stage, buffer in self.stages.items():
+            values = buffer.array()
+            if len(values) == 0:
+                continue
+            p50, p95, p99 = np.percentile(values, PERCENTILES)
+            stages[stage] = {
+                "p50": round(float(p50), 3),
+                "p95": round(float(p95), 3),
+                "p99": round(float(p99), 3),
+                "mean": round(float(values.mean()), 3),
+                "max": round(float(values.max()), 3),
+                "samples": int(len(values))
+            }
+        return {
+            "enabled": self.enabled,
+            "fps": round(self.fps, 1),
+            "frames": self.frames,
+            "frames_dropped": self.frames_dropped,
+            "window_frames": self.window,
+            "stages": stages
+        }
+
+
+STARTUP_LABELS = {
+    "imports": "imports",
+    "camera": "caméra",
+    "face_mesh": "FaceMesh",
+    "audio": "audio",
+    "dashboard": "dashboard",
+    "first_frame": "1re frame",
+    "first_inference": "1re inférence",
+}
+
+
+class StartupTimer:
+    """Étapes du démarrage (début / fin depuis l'origine) et instant "prêt à alerter"
+
+    origin : perf_counter du lancement (par défaut : création du timer).
+    timed() peut être appelé depuis plusieurs threads à la fois.
+    """
+
+    def __init__(self, origin=None):
+        self.origin = origin if origin is not None else time.perf_counter()
+        self.steps = {}           # nom -> (début, fin) en s depuis l'origine
+        self.ready_after = None   # s depuis l'origine
+        self.ready_at = None      # date (ISO)
+
+    def add(self, name, start, end):
+        """Étape mesurée ailleurs (instants perf_counter)"""
+        self.steps[name] = (start - self.origin, end - self.origin)
+
+    def timed(self, name, func, *args, **kwargs):
+        """Appelle func(*args, **kwargs) en chronométrant l'étape `name`"""
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.add(name, start, time.perf_counter())
+
+    def ready(self):
+        """Le système peut alerter : fixe le temps de démarrage"""
+        if self.ready_after is None:
+            self.ready_after = time.perf_counter() - self.origin
+            self.ready_at = datetime.now().isoformat()
+        return self.ready_after
+
+    def summary(self):
+        """Ligne lisible : "caméra 1.20s, FaceMesh 0.95s, ..." dans l'ordre de fin"""
+        steps = sorted(self.steps.items(), key=lambda item: item[1][1])
+        return ", ".join(f"{STARTUP_LABELS.get(name, name)} {end - start:.2f}s"
+                         for name, (start, end) in steps)
+
+    def snapshot(self):
+        return {
+            "ready_after": None if self.ready_after is None else round(self.ready_after, 3),
+            "ready_at": self.ready_at,
+            "steps": {
+                name: {"start": round(start, 3), "end": round(end, 3),
+                       "duration": round(end - start, 3)}
+                for name, (start, end) in self.steps.items()
+            }
+        }
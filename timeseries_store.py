@@ -0,0 +1,270 @@
+"""
+Historique par frame des métriques (EAR, PERCLOS, pitch, yaw, niveau d'alerte)
+Pour afficher et analyser des heures de conduite sans garder de JSON géants
+
+Chaque frame exportée ajoute un enregistrement de taille fixe dans un
+fichier « chunk » projeté en mémoire (np.memmap) : pas de sérialisation,
+pas d'appel système par frame. Un chunk contient CHUNK_RECORDS
+enregistrements, son en-tête donne le nombre d'enregistrements valides
+(mis à jour après l'écriture de l'enregistrement : un lecteur ne voit
+jamais d'enregistrement incomplet). Le nom du fichier est la date de
+début du chunk en millisecondes (décalée d'une milliseconde si un chunk
+porte déjà ce nom : un chunk existant n'est jamais écrasé) : ses
+enregistrements sont tous à cette date ou après. Le chunk suivant est
+créé à l'avance, hors de la boucle de détection : les derniers
+enregistrements d'un chunk peuvent dépasser de quelques millisecondes le
+début du suivant, jamais celui du chunk d'après.
+
+La lecture (serveur du dashboard) ne projette que les chunks de
+l'intervalle demandé et agrège par intervalles de temps (min / max /
+moyenne) avec NumPy, chunk par chunk, directement sur la projection :
+les enregistrements ne sont jamais copiés, seuls les agrégats partiels
+(min, max, somme, nombre par intervalle) sont fusionnés.
+"""
+
+import math
+import os
+import struct
+import time
+
+import numpy as np
+
+
+HISTORY_DIR = "history"
+CHUNK_RECORDS = 65536           # ~36 min à 30 fps, 2 Mo par chunk
+SPARE_MARGIN = 1024             # chunk suivant préparé quand il reste ~34 s à 30 fps
+RETENTION_SECONDS = 7 * 86400   # chunks plus anciens supprimés
+MAX_BUCKETS = 2000              # au-delà, la résolution demandée est élargie
+DEFAULT_BUCKETS = 500
+
+MAGIC = b"DFTS"
+FORMAT_VERSION = 1
+HEADER_SIZE = 64                # magic, version, taille d'enregistrement, nombre valide
+_HEADER = struct.Struct("<4sII")
+_COUNT_OFFSET = 16
+CHUNK_SUFFIX = ".tsd"
+
+RECORD_DTYPE = np.dtype([
+    ("t", "<f8"),               # epoch (secondes)
+    ("ear", "<f4"),
+    ("perclos", "<f4"),         # en %
+    ("pitch", "<f4"),
+    ("yaw", "<f4"),
+    ("alert_level", "<i1"),
+    ("_pad", "V7"),             # enregistrements alignés sur 32 octets
+])
+METRICS = ("ear", "perclos", "pitch", "yaw", "alert_level")
+
+
+def _chunk_paths(directory):
+    """[(début en secondes, chemin)] triés par date"""
+    chunks = []
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return chunks
+    for name in names:
+        stem, ext = os.path.splitext(name)
+        if ext == CHUNK_SUFFIX and stem.isdigit():
+            chunks.append((int(stem) / 1000.0, os.path.join(directory, name)))
+    chunks.sort()
+    return chunks
+
+
+class _Chunk:
+    """Chunk ouvert en écriture (projection en mémoire)"""
+
+    def __init__(self, directory, t, chunk_records):
+        size = HEADER_SIZE + chunk_records * RECORD_DTYPE.itemsize
+        stamp = int(t * 1000)
+        while True:
+            path = os.path.join(directory, f"{stamp}{CHUNK_SUFFIX}")
+            try:
+                f = open(path, "xb")
+            except FileExistsError:
+                stamp += 1   # chunk ouvert dans la même milliseconde : on ne l'écrase pas
+                continue
+            break
+        with f:
+            f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, RECORD_DTYPE.itemsize))
+            f.truncate(size)
+        self.start = stamp / 1000.0
+        self.records = np.memmap(path, dtype=RECORD_DTYPE, mode="r+",
+                                 offset=HEADER_SIZE, shape=(chunk_records,))
+        self.count_view = np.memmap(path, dtype="<u8", mode="r+",
+                                    offset=_COUNT_OFFSET, shape=(1,))
+        self.count = 0
+
+    def close(self):
+        self.records.flush()
+        self.count_view.flush()
+
+
+class TimeSeriesWriter:
+    """Ajout d'un enregistrement par frame (côté détection).
+
+    append() n'écrit que dans un chunk déjà projeté. Le chunk suivant est
+    préparé à l'avance par `schedule(tâche)` (le thread d'écriture du
+    dashboard), quand il reste SPARE_MARGIN enregistrements : création du
+    fichier, projection, fermeture du chunk plein et suppression des
+    chunks périmés ne bloquent jamais la boucle de détection. Sans
+    `schedule`, ces tâches sont faites sur place.
+    """
+
+    def __init__(self, directory=HISTORY_DIR, chunk_records=CHUNK_RECORDS,
+                 retention_seconds=RETENTION_SECONDS, schedule=None):
+        self.directory = directory
+        self.chunk_records = chunk_records
+        self.retention_seconds = retention_seconds
+        self.schedule = schedule or (lambda task: task())
+        self.spare_margin = min(SPARE_MARGIN, max(chunk_records // 2, 1))
+        os.makedirs(directory, exist_ok=True)
+        # Premier chunk ouvert tout de suite (démarrage, pas encore de frame)
+        self.chunk = _Chunk(directory, time.time(), chunk_records)
+        self.spare = None             # chunk suivant, posé par la tâche de préparation
+        self.spare_requested = False
+        self.total_records = 0
+        self.dropped = 0              # enregistrements perdus (chunk plein, suivant pas prêt)
+
+    def _prepare_spare(self):
+        now = time.time()
+        self.spare = _Chunk(self.directory, now, self.chunk_records)
+        self._remove_expired(now)
+
+    def _remove_expired(self, now):
+        chunks = _chunk_paths(self.directory)
+        # Un chunk est périmé quand le suivant commence avant la limite
+        for (start, path), (next_start, _) in zip(chunks, chunks[1:]):
+            if next_start < now - self.retention_seconds:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def append(self, t, ear, perclos, pitch, yaw, alert_level):
+        """Ajoute les métriques d'une frame (t en epoch, perclos en %)"""
+        chunk, spare = self.chunk, self.spare
+        # Bascule dès que le chunk suivant est prêt et que t entre dans son intervalle
+        if spare is not None and (t >= spare.start or chunk.count >= self.chunk_records):
+            self.chunk, self.spare, self.spare_requested = spare, None, False
+            self.schedule(chunk.close)
+            chunk = spare
+        if chunk.count >= self.chunk_records:
+            self.dropped += 1
+            return
+        chunk.records[chunk.count] = (t, ear, perclos, pitch, yaw, alert_level, b"")
+        chunk.count += 1
+        # Nombre valide publié après l'enregistrement
+        chunk.count_view[0] = chunk.count
+        self.total_records += 1
+        if not self.spare_requested and chunk.count >= self.chunk_records - self.spare_margin:
+            self.spare_requested = True
+            self.schedule(self._prepare_spare)
+
+    def close(self):
+        self.chunk.close()
+        if self.spare is not None:
+            self.spare.close()
+
+
+def _read_chunk(path):
+    """Enregistrements valides d'un chunk (projection en lecture seule), None si invalide"""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+        magic, version, record_size = _HEADER.unpack_from(header)
+        count = struct.unpack_from("<Q", header, _COUNT_OFFSET)[0]
+    except (OSError, struct.error):
+        return None
+    if magic != MAGIC or version != FORMAT_VERSION or record_size != RECORD_DTYPE.itemsize:
+        return None
+    if count == 0:
+        return np.empty(0, dtype=RECORD_DTYPE)
+    return np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=HEADER_SIZE, shape=(count,))
+
+
+def _range_views(start, end, directory=HISTORY_DIR):
+    """Tranches (projections, sans copie) des enregistrements avec start <= t < end, par chunk"""
+    chunks = _chunk_paths(directory)
+    for i, (chunk_start, path) in enumerate(chunks):
+        # Le chunk suivant est créé à l'avance : quelques enregistrements peuvent
+        # dépasser son début, mais jamais celui du chunk d'après
+        after_next = chunks[i + 2][0] if i + 2 < len(chunks) else float("inf")
+        if chunk_start >= end or after_next <= start:
+            continue
+        records = _read_chunk(path)
+        if records is None or len(records) == 0:
+            continue
+        lo, hi = np.searchsorted(records["t"], [start, end])
+        if hi > lo:
+            yield records[lo:hi]
+
+
+def read_range(start, end, directory=HISTORY_DIR):
+    """Enregistrements avec start <= t < end, tous chunks confondus (copie)"""
+    parts = [np.array(view) for view in _range_views(start, end, directory)]
+    if not parts:
+        return np.empty(0, dtype=RECORD_DTYPE)
+    return np.concatenate(parts)
+
+
+def _chunk_aggregates(view, start, resolution):
+    """Agrégats partiels d'une tranche : (intervalles, nombres, {métrique: (min, max, somme)})"""
+    # t trié : les indices d'intervalle sont croissants, reduceat sur chaque groupe
+    bucket = ((view["t"] - start) // resolution).astype(np.int64)
+    first = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    counts = np.diff(np.r_[first, len(view)])
+    partial = {}
+    for name in METRICS:
+        values = view[name]
+        partial[name] = (np.minimum.reduceat(values, first).astype(np.float64),
+                         np.maximum.reduceat(values, first).astype(np.float64),
+                         np.add.reduceat(values, first, dtype=np.float64))
+    return bucket[first], counts, partial
+
+
+def query(start=None, end=None, resolution=None, directory=HISTORY_DIR):
+    """Agrégats min / max / moyenne par intervalle de `resolution` secondes.
+
+    Retourne un dict en colonnes (t = début de chaque intervalle non vide).
+    Par défaut : la dernière heure, découpée en DEFAULT_BUCKETS intervalles.
+    ValueError si les bornes ou la résolution sont invalides.
+    """
+    end = time.time() if end is None else float(end)
+    start = end - 3600.0 if start is None else float(start)
+    if not (math.isfinite(start) and math.isfinite(end)):
+        raise ValueError("bornes from/to invalides (nombres finis attendus)")
+    if start >= end:
+        raise ValueError("from doit être antérieur à to")
+    span = end - start
+    if resolution is None:
+        resolution = span / DEFAULT_BUCKETS
+    elif not (math.isfinite(resolution) and resolution > 0):
+        raise ValueError("resolution doit être un nombre de secondes > 0")
+    resolution = max(float(resolution), span / MAX_BUCKETS)
+
+    parts = [_chunk_aggregates(view, start, resolution)
+             for view in _range_views(start, end, directory)]
+    result = {"from": start, "to": end, "resolution": resolution,
+              "records": 0, "t": [], "count": []}
+    for name in METRICS:
+        result[name] = {"min": [], "max": [], "mean": []}
+    if not parts:
+        return result
+
+    # Fusion des agrégats partiels : un intervalle peut être à cheval sur deux chunks
+    bucket = np.concatenate([p[0] for p in parts])
+    first = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    counts = np.add.reduceat(np.concatenate([p[1] for p in parts]), first)
+
+    result["records"] = int(counts.sum())
+    result["t"] = (start + bucket[first] * resolution).tolist()
+    result["count"] = counts.tolist()
+    for name in METRICS:
+        mins, maxs, sums = (np.concatenate([p[2][name][k] for p in parts]) for k in range(3))
+        result[name] = {
+            "min": np.round(np.minimum.reduceat(mins, first), 4).tolist(),
+            "max": np.round(np.maximum.reduceat(maxs, first), 4).tolist(),
+            "mean": np.round(np.add.reduceat(sums, first) / counts, 4).tolist(),
+        }
+    return result